@@ -0,0 +1,31 @@
+# Maze generator benchmark: python -m bench.bench_maze [size ...]
+import statistics
+import sys
+import time
+import numpy as np
+from src.maze import generate_maze_level, verify_order
+
+SIZES = (101, 501, 1000)
+SEEDS = range(5)
+
+def run(size):
+    times = []
+    for seed in SEEDS:
+        start = time.perf_counter()
+        level = generate_maze_level(size, size, seed)
+        times.append((time.perf_counter() - start) * 1000)
+
+        # Check the result independently of the generator
+        walls = np.array([[tile == '#' for tile in row] for row in level['tiles']])
+        assert verify_order(walls, level['player'], level['keys'][0], level['chests'][0], level['monsters'][0])
+    return times
+
+def main(args):
+    sizes = [int(arg) for arg in args] or SIZES
+    for size in sizes:
+        times = run(size)
+        print(f"{size}x{size}: median {statistics.median(times):.1f} ms, "
+              f"min {min(times):.1f} ms, max {max(times):.1f} ms over {len(times)} seeds")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,179 @@
+# Frame time per screen, from scripted sessions of the real game loop.
+# Usage: python -m bench.bench_screens [--frames N] [--output results.json|-]
+#                                      [--baseline path] [--update-baseline]
+# Prints the results as JSON to stdout unless --output names a file.
+# Runs under SDL's dummy video and audio drivers. Frames are not paced (no
+# clock.tick), and every frame advances the logic by exactly one tick, so each
+# run does the same work.
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+# Always the dummy drivers, whatever is exported, so runs compare with the baseline
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+from src.constants import LOGIC_TICK_MS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline_screens.json')
+FRAMES = 600
+WARMUP_FRAMES = 30  # Images, chunks and texts are built in these, they are not measured
+REGRESSION_TOLERANCE = 0.2  # Slower than the baseline by more than this is a regression
+
+def click(button):
+    return pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=button.rect.center, button=1)
+
+def press(game, action):
+    key = game.game_state.get_key_for_action(action)
+    return pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode=chr(key), scancode=0)
+
+def start_level(game, number, variant=None):
+    # Levels after the first are loaded directly instead of being played to
+    game.update([click(game.start_button)])
+    if number > 1:
+        game.game_state.load_level(number, variant)
+
+def walk(*actions):
+    # Input script: one key press per frame, cycling through the actions
+    return lambda game, frame: [press(game, actions[frame % len(actions)])]
+
+def redraw_menu(game, frame):
+    # Menus are only drawn when they change, draw them every frame instead
+    game.menu_signature = None
+    return []
+
+def show_message(game):
+    start_level(game, 1)
+    game.game_state.show_message("A message long enough to be wrapped over both of its lines")
+    game.game_state.message_timer = 10 ** 9
+
+def defeat(game):
+    # Walk into the level 1 monster without its sword
+    start_level(game, 1)
+    for _ in range(8):
+        game.update([press(game, 'right')])
+        game.timestep.add_time(LOGIC_TICK_MS)
+    game.update([])
+    assert game.game_state.game_over and not game.game_state.victory
+
+def victory(game):
+    start_level(game, 3)
+    game.game_state.game_over = True
+    game.game_state.victory = True
+
+# Screen name -> (setup, input script)
+SCREENS = {
+    'start': (lambda game: None, redraw_menu),
+    'options': (lambda game: game.update([click(game.options_button)]), redraw_menu),
+    'level_1': (lambda game: start_level(game, 1), walk('down', 'up')),
+    'level_2': (lambda game: start_level(game, 2, 'left'), walk('down', 'up')),
+    'level_3': (lambda game: start_level(game, 3), walk('down', 'up')),
+    'message': (show_message, walk('down', 'up')),
+    'victory': (victory, redraw_menu),
+    'defeat': (defeat, redraw_menu),
+}
+
+def reset(game):
+    # Back to the start screen, as if the game was just launched
+    game_state = game.game_state
+    game_state.reset_game()
+    game_state.show_options = False
+    game_state.remapping_key = None
+    game.input_queue.clear()
+    game.menu_signature = None
+    if game.renderer:
+        game.renderer.invalidate()
+
+def run_screen(game, name, frames):
+    setup, script = SCREENS[name]
+    reset(game)
+    setup(game)
+    times = []
+    for frame in range(WARMUP_FRAMES + frames):
+        events = script(game, frame)
+        start = time.perf_counter_ns()
+        game.update(events)
+        elapsed = time.perf_counter_ns() - start
+        game.timestep.add_time(LOGIC_TICK_MS)
+        if frame >= WARMUP_FRAMES:
+            times.append(elapsed / 1e6)
+
+    ordered = sorted(times)
+    return {
+        'frames': frames,
+        'p50_ms': statistics.median(ordered),
+        'p99_ms': ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)],
+        'mean_ms': statistics.fmean(ordered),
+        'fps': 1000 * len(ordered) / sum(ordered),
+    }
+
+def compare(results, baseline):
+    """Lines describing each screen against the baseline, and whether any regressed"""
+    lines = []
+    regressed = False
+    for name, result in results['screens'].items():
+        base = baseline['screens'].get(name)
+        if base is None:
+            lines.append(f"{name}: not in the baseline")
+            continue
+        change = result['p50_ms'] / base['p50_ms'] - 1
+        slower = change > REGRESSION_TOLERANCE
+        regressed |= slower
+        lines.append(f"{name}: p50 {base['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms "
+                     f"({change:+.0%}){' REGRESSION' if slower else ''}")
+    return lines, regressed
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Frame time per screen of scripted game sessions")
+    parser.add_argument('--frames', type=int, default=FRAMES)
+    parser.add_argument('--output', default='-', help="write the results as JSON to this file (stdout by default)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help="store these results as the baseline")
+    parser.add_argument('screens', nargs='*', help=f"screens to run, all by default: {', '.join(SCREENS)}")
+    options = parser.parse_args(args)
+    unknown = set(options.screens) - set(SCREENS)
+    if unknown:
+        parser.error(f"unknown screens: {', '.join(sorted(unknown))}")
+
+    # Progress and the game's own output go to stderr, stdout is kept for the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        from main import Game
+        game = Game()
+        game.assets.preload_game_images()  # Measure drawing, not the background loading
+
+        results = {'frames': options.frames, 'screens': {}}
+        for name in options.screens or SCREENS:
+            result = run_screen(game, name, options.frames)
+            results['screens'][name] = result
+            print(f"{name}: p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms, "
+                  f"{result['fps']:.0f} frames/s")
+        pygame.quit()
+
+    if options.output == '-':
+        print(json.dumps(results, indent=2))
+    else:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if options.update_baseline:
+        with open(options.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {options.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(options.baseline):
+        print(f"No baseline at {options.baseline}, run with --update-baseline", file=sys.stderr)
+        return 0
+    with open(options.baseline) as f:
+        lines, regressed = compare(results, json.load(f))
+    for line in lines:
+        print(line, file=sys.stderr)
+    return 1 if regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,235 @@
+# Load generator for the game server: many client sessions walking at random,
+# with the throughput, latency and server CPU they cost.
+# Usage: python -m bench.bench_server [--sessions N] [--rate R] [--duration S] [--workers W]
+#                                     [--hunting] [--connect HOST:PORT] [--output FILE|-]
+# Starts the server as a child process unless --connect is given, and runs the
+# clients in W more processes. The server's CPU time comes from /proc, so the
+# numbers per core hold even when clients and server share the cores.
+# --rate 0 sends the next input as soon as the last one was answered, to find
+# the most the server can handle.
+import argparse
+import asyncio
+import collections
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from src.replay import START, RESET
+from src.server import GameClient, DEFEAT, VICTORY
+
+SESSIONS = 2000
+RATE = 10  # Inputs per second per session
+DURATION = 10  # Seconds measured, after every session connected
+CONNECT_BATCH = 100  # Connections opened at once
+SEND_SLOTS = 20  # Sessions are split in groups whose inputs are spread over each interval
+
+class LoadClient(GameClient):
+    # Random walk; a finished game is reset and started again
+    def __init__(self, results, rng, closed_loop):
+        super().__init__()
+        self.results = results
+        self.rng = rng
+        self.closed_loop = closed_loop
+        self.sent = collections.deque()  # Send time of each unanswered input
+        self.snapshot = True  # The first frame answers the connection, not an input
+        self.finished = False
+
+    def on_frame(self, frame):
+        results = self.results
+        results.frames += 1
+        results.records += len(frame)
+        if self.snapshot:
+            self.snapshot = False
+            return
+        if results.measuring:
+            results.latencies.append(time.perf_counter() - self.sent.popleft())
+            results.answered += 1
+        else:
+            self.sent.popleft()
+        if any(delta[0] in (DEFEAT, VICTORY) for delta in frame):
+            self.finished = True
+        if self.closed_loop and not self.sent:
+            self.send_input()
+
+    def send_input(self):
+        if self.finished:
+            self.finished = False
+            codes = (RESET, START)
+        else:
+            codes = (self.rng.randrange(4),)
+        now = time.perf_counter()
+        self.sent.extend(now for _ in codes)
+        self.send(*codes)
+
+class Results:
+    def __init__(self):
+        self.measuring = False
+        self.answered = 0
+        self.frames = 0
+        self.records = 0
+        self.latencies = []
+        self.elapsed = 0.0
+        self.server_cpu_s = None  # While measuring, when the server is a child process
+
+def start_server(hunting):
+    command = [sys.executable, '-m', 'src.server', '--port', '0', '--seed', '1']
+    if hunting:
+        command.append('--hunting')
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # Listening on host:port
+    host, port = line.split()[-1].rsplit(':', 1)
+    return process, host, int(port)
+
+def get_cpu_seconds(pid):
+    # CPU time of a process so far, from /proc (None where there is no /proc)
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def stop_server(process):
+    # The server prints its stats as the last line when it stops
+    process.send_signal(signal.SIGINT)
+    output, _ = process.communicate(timeout=30)
+    return json.loads(output.strip().splitlines()[-1])
+
+async def run_load(host, port, sessions, options, seed, barrier):
+    # One worker's share of the sessions; all workers start measuring together
+    results = Results()
+    rng = random.Random(seed)
+    closed_loop = options.rate == 0
+    clients = []
+    for start in range(0, sessions, CONNECT_BATCH):
+        batch = range(start, min(start + CONNECT_BATCH, sessions))
+        clients += await asyncio.gather(*(LoadClient.connect(host, port, results, random.Random(rng.random()), closed_loop)
+                                          for _ in batch))
+    for client in clients:
+        client.send(START)
+        client.sent.append(time.perf_counter())
+    await asyncio.sleep(0.5)
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    results.measuring = True
+    start = time.perf_counter()
+    if closed_loop:
+        for client in clients:
+            client.send_input()
+        await asyncio.sleep(options.duration)
+    else:
+        # Every session sends one input per interval, the groups at staggered times
+        interval = 1 / options.rate
+        groups = [clients[slot::SEND_SLOTS] for slot in range(SEND_SLOTS)]
+        next_time = start
+        while next_time - start < options.duration:
+            for group in groups:
+                for client in group:
+                    client.send_input()
+                next_time += interval / SEND_SLOTS
+                await asyncio.sleep(max(0.0, next_time - time.perf_counter()))
+    results.elapsed = time.perf_counter() - start
+    results.measuring = False
+    await asyncio.sleep(0.5)  # Let the last answers arrive
+    for client in clients:
+        client.close()
+    return results
+
+def run_worker(host, port, sessions, options, seed, barrier, queue):
+    queue.put(asyncio.run(run_load(host, port, sessions, options, seed, barrier)))
+
+def run_workers(host, port, options, server_pid=None):
+    """Results of all workers merged, with the server's CPU time while they measured"""
+    barrier = multiprocessing.Barrier(options.workers + 1)
+    queue = multiprocessing.Queue()
+    shares = [options.sessions // options.workers + (i < options.sessions % options.workers)
+              for i in range(options.workers)]
+    workers = [multiprocessing.Process(target=run_worker, args=(host, port, share, options, seed, barrier, queue))
+               for seed, share in enumerate(shares)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()  # Every session is connected
+    cpu_start = get_cpu_seconds(server_pid) if server_pid else None
+    time.sleep(options.duration)
+    cpu_end = get_cpu_seconds(server_pid) if server_pid else None
+
+    merged = Results()
+    for _ in workers:
+        results = queue.get()
+        merged.answered += results.answered
+        merged.frames += results.frames
+        merged.records += results.records
+        merged.latencies += results.latencies
+        merged.elapsed = max(merged.elapsed, results.elapsed)
+    for worker in workers:
+        worker.join()
+    if cpu_start is not None and cpu_end is not None:
+        merged.server_cpu_s = cpu_end - cpu_start
+    return merged
+
+def summarize(results, server_stats, options):
+    elapsed = results.elapsed
+    latencies = sorted(results.latencies) or [0.0]
+    summary = {
+        'sessions': options.sessions,
+        'workers': options.workers,
+        'rate': options.rate,
+        'hunting': options.hunting,
+        'duration_s': elapsed,
+        'inputs_per_s': results.answered / elapsed,
+        'latency_p50_ms': latencies[len(latencies) // 2] * 1000,
+        'latency_p99_ms': latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000,
+        'latency_max_ms': latencies[-1] * 1000,
+        'bytes_per_frame': 2 + 9 * results.records / max(results.frames, 1),
+    }
+    if server_stats:
+        summary['server_connections'] = server_stats['connections']
+        summary['server_inputs'] = server_stats['inputs']
+    if results.server_cpu_s:
+        # Share of one core the server used, and how many such sessions a full core would host
+        busy = results.server_cpu_s / elapsed
+        summary['server_cpu'] = busy
+        summary['server_inputs_per_cpu_s'] = results.answered / results.server_cpu_s
+        if options.rate:
+            # From the inputs actually answered, in case the clients fell behind the rate
+            summary['sessions_per_core'] = summary['server_inputs_per_cpu_s'] / options.rate
+    return summary
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Load generator for python -m src.server")
+    parser.add_argument('--sessions', type=int, default=SESSIONS)
+    parser.add_argument('--rate', type=float, default=RATE, help="inputs per second per session, 0 for as fast as answered")
+    parser.add_argument('--duration', type=float, default=DURATION)
+    parser.add_argument('--workers', type=int, default=1, help="client processes")
+    parser.add_argument('--hunting', action='store_true', help="monsters chase the player (spawned server only)")
+    parser.add_argument('--connect', help="HOST:PORT of a running server instead of starting one")
+    parser.add_argument('--output', help="write the results as JSON to this file ('-' for stdout)")
+    options = parser.parse_args(args)
+
+    process = None
+    if options.connect:
+        host, port = options.connect.rsplit(':', 1)
+        port = int(port)
+    else:
+        process, host, port = start_server(options.hunting)
+    try:
+        results = run_workers(host, port, options, process and process.pid)
+    finally:
+        server_stats = stop_server(process) if process else None
+
+    summary = summarize(results, server_stats, options)
+    for name, value in summary.items():
+        print(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}", file=sys.stderr)
+    if options.output == '-':
+        print(json.dumps(summary, indent=2))
+    elif options.output:
+        with open(options.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,419 +1,359 @@
-import os
+import time
+STARTUP_TIME = time.perf_counter()  # Taken first so the imports count towards startup
+
 import pygame
 import sys
 from src.constants import (
-    BROWN, WINDOW_SIZE, CELL_SIZE, GRID_SIZE,
-    WHITE, BLACK, GRAY, YELLOW, GREEN, BLUE, ORANGE
+    WINDOW_SIZE, WHITE, GRAY,
+    DIRTY_RECT_RENDERING, LOGIC_TICK_MS, MAX_TICKS_PER_FRAME, RENDER_FPS,
+    MENU_IDLE_TIMEOUT_MS, LOADING_POLL_MS
 )
 from src.button import Button
+from src.renderer import GameRenderer
+from src.assets import AssetManager, buffer_to_surface
+from src.fonts import font
 from src.game_state import GameState
-from src.utils import load_image
+from src.audio import Soundtrack, MUSIC_END_EVENT
+from src.avatar import AvatarLoader, AVATAR_LOADED_EVENT
 from src.screens import (
     draw_start_screen,
     draw_game_over_screen,
-    draw_message,
     draw_options_screen,
+    draw_loading_bar,
     get_key_name
 )
-from src.game_data import (
-    get_monster_info, get_sword_info, get_item_info,
-    get_monster_description, get_sword_description, get_defeat_message
-)
+from src.simulation import step
+from src.game_loop import FixedTimestep, InputQueue
+from src.profiler import FrameProfiler, CountingSurface, install_hooks
+from src.replay import Recorder
 
-# Initialize Pygame
-pygame.init()
-
-# Create the window
-screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
-pygame.display.set_caption("The Bad Elementals")
-
-# Initialize fonts
-game_font = pygame.font.SysFont('segoeuisymbol', CELL_SIZE)
-title_font = pygame.font.SysFont('Arial', 48, bold=True)
-message_font = pygame.font.SysFont('Arial', 24)
-controls_font = pygame.font.SysFont('Arial', 20)
-
-# Load images
-def load_image(name, size=(CELL_SIZE, CELL_SIZE)):
-    try:
-        image = pygame.image.load(os.path.join('assets', name))
-        return pygame.transform.scale(image, size)
-    except:
-        print(f"Error loading image: {name}")
-        return None
-
-# Load game assets
-key_img = load_image('key.png')
-grass_sword_img = load_image('Grass Sword.png')
-fire_sword_img = load_image('Fire Sword.png')
-water_sword_img = load_image('Water Sword.png')
-grass_monster_img = load_image('Grass Monster.png')
-fire_monster_img = load_image('Fire Monster.png')
-water_monster_img = load_image('Water Monster.png')
-player_img = load_image('Player.png')
-chest_img = load_image('Chest.png')
-door_img = load_image('Door.png')
-floor_img = load_image('Floor.png')
-wall_img = load_image('Wall.png')
-button_img = load_image('Button.png')
-
-# Create buttons
-try_again_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 50, 200, 50, "Try Again", GRAY)
-exit_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 120, 200, 50, "Exit", GRAY)
-start_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 50, 200, 50, "Start Game", GRAY)
-upload_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 120, 200, 50, "Upload Character", GRAY)
-options_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 190, 200, 50, "Options", GRAY)
-
-# Options screen buttons
-back_button = Button(0, 0, 120, 30, "Back", GRAY)
-volume_up_button = Button(0, 0, 30, 30, "+", GRAY)
-volume_down_button = Button(0, 0, 30, 30, "-", GRAY)
-
-# Key mapping buttons
-key_buttons = [
-    Button(0, 0, 160, 35, "Up: W", GRAY),
-    Button(0, 0, 160, 35, "Down: S", GRAY),
-    Button(0, 0, 160, 35, "Left: A", GRAY),
-    Button(0, 0, 160, 35, "Right: D", GRAY)
-]
-
-# Initialize game state
-game_state = GameState()
-game_state.show_options = False
-game_state.remapping_key = None
-
-def handle_image_upload():
-    try:
-        import tkinter as tk
-        from tkinter import filedialog
-        
-        # Create and hide the main tkinter window
-        root = tk.Tk()
-        root.withdraw()
-        
-        # Open file dialog for PNG files
-        file_path = filedialog.askopenfilename(
-            title="Select Character Image",
-            filetypes=[("PNG files", "*.png")]
-        )
-        
-        if file_path:
-            # Load and scale the image
-            custom_image = load_image(file_path)
-            if custom_image:
-                game_state.set_custom_player_image(custom_image)
-                game_state.show_message("Custom character image loaded successfully!")
-                game_state.message_timer = 2000
-            else:
-                game_state.show_message("Failed to load custom image. Using default character.")
-                game_state.message_timer = 2000
-    except Exception as e:
-        game_state.show_message("Error loading custom image. Using default character.")
-        game_state.message_timer = 2000
-
-def handle_key_remap(event):
-    if game_state.remapping_key:
-        if event.key != pygame.K_ESCAPE:  # Don't allow ESC key
-            game_state.remap_key(game_state.remapping_key, event.key)
-            # Update button text
-            key_name = get_key_name(event.key)
-            for button in key_buttons:
-                if button.text.startswith(game_state.remapping_key.capitalize()):
-                    button.text = f"{game_state.remapping_key.capitalize()}: {key_name}"
-                    break
-        game_state.remapping_key = None
-
-# Main game loop
-running = True
-clock = pygame.time.Clock()
-
-while running:
-    # Handle events
-    for event in pygame.event.get():
+class Game:
+    # Window, menus and the main loop. Only what the start screen needs is set up
+    # before the first frame; gameplay assets and music come after it.
+    def __init__(self, profile=False, record_path=None):
+        # Only the subsystems the game uses (the mixer is started by the soundtrack)
+        pygame.display.init()
+        pygame.font.init()
+
+        # Create the window
+        self.screen = pygame.display.set_mode((WINDOW_SIZE, WINDOW_SIZE))
+        pygame.display.set_caption("The Bad Elementals")
+
+        # Frame profiler (--profile); blits are counted by a stand-in for the screen
+        self.profiler = None
+        if profile:
+            install_hooks()
+            self.profiler = FrameProfiler()
+            self.screen = CountingSurface(self.screen)
+
+        # Fonts come from the shared registry, each one is created once
+        self.title_font = font('title')
+        self.message_font = font('message')
+        self.controls_font = font('controls')
+
+        # The menus only need the floor tile; the rest is loaded on first use
+        self.assets = AssetManager()
+        self.floor_img = self.assets.image('floor')
+        self.renderer = None  # Gameplay renderer, see get_renderer()
+
+        # Create buttons
+        self.try_again_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 50, 200, 50, "Try Again", GRAY)
+        self.exit_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 120, 200, 50, "Exit", GRAY)
+        self.start_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 50, 200, 50, "Start Game", GRAY)
+        self.upload_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 120, 200, 50, "Upload Character", GRAY)
+        self.options_button = Button(WINDOW_SIZE // 2 - 100, WINDOW_SIZE // 2 + 190, 200, 50, "Options", GRAY)
+
+        # Options screen buttons
+        self.back_button = Button(0, 0, 120, 30, "Back", GRAY)
+        self.volume_up_button = Button(0, 0, 30, 30, "+", GRAY)
+        self.volume_down_button = Button(0, 0, 30, 30, "-", GRAY)
+
+        # Key mapping buttons
+        self.key_buttons = [
+            Button(0, 0, 160, 35, "Up: W", GRAY),
+            Button(0, 0, 160, 35, "Down: S", GRAY),
+            Button(0, 0, 160, 35, "Left: A", GRAY),
+            Button(0, 0, 160, 35, "Right: D", GRAY)
+        ]
+
+        # Fixed logic tick, paced separately from rendering
+        self.timestep = FixedTimestep(LOGIC_TICK_MS, MAX_TICKS_PER_FRAME)
+        self.input_queue = InputQueue()
+
+        # Initialize game state (messages are timed in logic ticks); the
+        # soundtrack is attached once the first frame is on screen
+        self.game_state = GameState(time_source=self.timestep.now)
+        self.game_state.show_options = False
+        self.game_state.remapping_key = None
+
+        # Session recording (--record FILE), played again with python -m src.replay
+        self.record_path = record_path
+        self.recorder = Recorder(self.game_state) if record_path else None
+
+        # Custom character upload, runs next to the main loop
+        self.avatar_loader = AvatarLoader()
+
+        self.menu_signature = None  # What the menu currently on screen shows
+        self.first_frame_ms = None  # Time from startup to the first presented frame
+
+    def get_renderer(self):
+        # Gameplay images and fonts are only needed once a game is running
+        if self.renderer is None:
+            self.assets.preload_game_images()
+            self.renderer = GameRenderer(self.assets, font('game'), self.controls_font, self.message_font)
+        return self.renderer
+
+    def mark(self, phase):
+        # End a phase of the frame for the profiler
+        if self.profiler:
+            self.profiler.mark(phase)
+
+    def finish_startup(self):
+        # Runs right after the first frame was presented
+        self.first_frame_ms = (time.perf_counter() - STARTUP_TIME) * 1000
+        print(f"Time to first frame: {self.first_frame_ms:.1f} ms")
+        self.game_state.set_audio(Soundtrack())
+        # Gameplay images are decoded in the background while the menu is up
+        self.assets.load_game_images_async()
+
+    def handle_avatar_loaded(self, event):
+        # Result of the upload started from the start screen
+        game_state = self.game_state
+        if event.pixels is not None:
+            game_state.set_custom_player_image(buffer_to_surface(event.pixels, event.size))
+            game_state.show_message("Custom character image loaded successfully!")
+            game_state.message_timer = 2000
+        elif event.error == 'decode':
+            game_state.show_message("Failed to load custom image. Using default character.")
+            game_state.message_timer = 2000
+        elif event.error:
+            game_state.show_message("Error loading custom image. Using default character.")
+            game_state.message_timer = 2000
+
+    def handle_key_remap(self, event):
+        game_state = self.game_state
+        if game_state.remapping_key:
+            if event.key != pygame.K_ESCAPE:  # Don't allow ESC key
+                game_state.remap_key(game_state.remapping_key, event.key)
+                # Update button text
+                key_name = get_key_name(event.key)
+                for button in self.key_buttons:
+                    if button.text.startswith(game_state.remapping_key.capitalize()):
+                        button.text = f"{game_state.remapping_key.capitalize()}: {key_name}"
+                        break
+            game_state.remapping_key = None
+
+    def is_menu_showing(self):
+        game_state = self.game_state
+        return game_state.show_options or not game_state.game_started or game_state.game_over
+
+    def get_menu_signature(self):
+        # Everything that changes how the current menu screen looks
+        game_state = self.game_state
+        if game_state.show_options:
+            buttons = [self.back_button, self.volume_up_button, self.volume_down_button] + self.key_buttons
+            signature = ('options', game_state.volume, tuple(button.text for button in self.key_buttons))
+        elif not game_state.game_started:
+            buttons = [self.start_button, self.upload_button, self.options_button]
+            signature = ('start',)
+        else:
+            buttons = [self.try_again_button, self.exit_button]
+            signature = ('game_over', game_state.victory)
+        if self.assets.is_loading():
+            signature += (self.assets.progress(),)
+        mouse_pos = pygame.mouse.get_pos()
+        return signature + tuple(button.rect.collidepoint(mouse_pos) for button in buttons)
+
+    def handle_event(self, event):
+        # Returns False when the game should quit
+        game_state = self.game_state
         if event.type == pygame.QUIT:
-            running = False
+            return False
+        elif event.type == MUSIC_END_EVENT:
+            # The soundtrack finished, start it over
+            game_state.check_sound_status()
+        elif event.type == AVATAR_LOADED_EVENT:
+            self.handle_avatar_loaded(event)
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+            # Window contents were lost, draw everything again
+            self.menu_signature = None
+            if self.renderer:
+                self.renderer.invalidate()
         elif event.type == pygame.MOUSEBUTTONDOWN:
             if game_state.show_options:
-                if back_button.is_clicked(event.pos):
+                if self.back_button.is_clicked(event.pos):
                     game_state.show_options = False
-                elif volume_up_button.is_clicked(event.pos):
+                elif self.volume_up_button.is_clicked(event.pos):
                     game_state.set_volume(min(1.0, game_state.volume + 0.1))
-                elif volume_down_button.is_clicked(event.pos):
+                elif self.volume_down_button.is_clicked(event.pos):
                     game_state.set_volume(max(0.0, game_state.volume - 0.1))
                 else:
                     # Check key mapping buttons
-                    for i, button in enumerate(key_buttons):
+                    for i, button in enumerate(self.key_buttons):
                         if button.is_clicked(event.pos):
                             game_state.remapping_key = ['up', 'down', 'left', 'right'][i]
                             button.text = f"{game_state.remapping_key.capitalize()}: Press any key..."
                             break
             elif game_state.game_started:
                 if game_state.game_over:
-                    if try_again_button.is_clicked(event.pos):
+                    if self.try_again_button.is_clicked(event.pos):
                         game_state.reset_game()
-                    elif exit_button.is_clicked(event.pos):
-                        running = False
+                        if self.recorder:
+                            self.recorder.command('reset')
+                    elif self.exit_button.is_clicked(event.pos):
+                        return False
             else:
-                if start_button.is_clicked(event.pos):
+                if self.start_button.is_clicked(event.pos):
                     game_state.game_started = True
-                elif upload_button.is_clicked(event.pos):
-                    handle_image_upload()
-                elif options_button.is_clicked(event.pos):
+                    if self.recorder:
+                        self.recorder.command('start')
+                elif self.upload_button.is_clicked(event.pos):
+                    self.avatar_loader.start()
+                elif self.options_button.is_clicked(event.pos):
                     game_state.show_options = True
-        elif event.type == pygame.KEYDOWN and game_state.remapping_key:
-            handle_key_remap(event)
-    
-    # Clear screen
-    screen.fill(WHITE)
-
-    if game_state.show_options:
-        draw_options_screen(screen, back_button, volume_up_button, volume_down_button, key_buttons, title_font, message_font, game_state.volume, floor_img)
-    elif not game_state.game_started:
-        draw_start_screen(screen, start_button, upload_button, options_button, title_font, controls_font, floor_img)
-    elif game_state.game_over:
-        draw_game_over_screen(screen, game_state.victory, try_again_button, exit_button, floor_img, title_font, message_font)
-    else:
-        # Handle player movement with remapped keys
-        keys = pygame.key.get_pressed()
-        if keys[game_state.get_key_for_action('up')] and not game_state.prev_keys[game_state.get_key_for_action('up')]:
-            game_state.player_y = max(0, game_state.player_y - 1)
-        if keys[game_state.get_key_for_action('down')] and not game_state.prev_keys[game_state.get_key_for_action('down')]:
-            game_state.player_y = min(GRID_SIZE - 1, game_state.player_y + 1)
-        if keys[game_state.get_key_for_action('left')] and not game_state.prev_keys[game_state.get_key_for_action('left')]:
-            game_state.player_x = max(0, game_state.player_x - 1)
-        if keys[game_state.get_key_for_action('right')] and not game_state.prev_keys[game_state.get_key_for_action('right')]:
-            game_state.player_x = min(GRID_SIZE - 1, game_state.player_x + 1)
-        
-        # Update previous key states
-        game_state.prev_keys[game_state.get_key_for_action('up')] = keys[game_state.get_key_for_action('up')]
-        game_state.prev_keys[game_state.get_key_for_action('down')] = keys[game_state.get_key_for_action('down')]
-        game_state.prev_keys[game_state.get_key_for_action('left')] = keys[game_state.get_key_for_action('left')]
-        game_state.prev_keys[game_state.get_key_for_action('right')] = keys[game_state.get_key_for_action('right')]
-        
-        # Check if player collects key
-        if not game_state.has_key and game_state.player_x == game_state.key_x and game_state.player_y == game_state.key_y:
-            key_info = get_item_info('key')
-            game_state.has_key = True
-            game_state.key_x = -1  # Remove key from map
-            game_state.show_message(f"You found the {key_info['name']}! {key_info['description']}")
-            game_state.message_timer = 3000  # Set message display time to 3 seconds
-
-        # Check if player opens chest
-        if not game_state.chest_opened and game_state.player_x == game_state.chest_x and game_state.player_y == game_state.chest_y:
-            chest_info = get_item_info('chest')
-            if not game_state.has_key:
-                game_state.show_message(f"You need a key to open the {chest_info['name']}!")
-                game_state.message_timer = 2000  # Set message display time to 2 seconds
-            else:
-                game_state.chest_opened = True
-                if game_state.current_level == 1:
-                    game_state.has_grass_sword = True
-                    sword_info = get_sword_info('grass_sword')
-                    game_state.show_message(f"You got the {sword_info['name']}! {sword_info['description']}")
-                elif game_state.current_level == 2:
-                    game_state.has_fire_sword = True
-                    sword_info = get_sword_info('fire_sword')
-                    game_state.show_message(f"You got the {sword_info['name']}! {sword_info['description']}")
-                else:
-                    game_state.has_water_sword = True
-                    sword_info = get_sword_info('water_sword')
-                    game_state.show_message(f"You got the {sword_info['name']}! {sword_info['description']}")
-                game_state.message_timer = 3000  # Set message display time to 3 seconds
-        
-        # Check if player encounters enemy
-        if game_state.player_x == game_state.enemy_x and game_state.player_y == game_state.enemy_y:
-            monster_info = get_monster_info(game_state.current_level)
-            if game_state.current_level == 1:  # Grass monster
-                if not game_state.has_grass_sword:
-                    game_state.show_message(f"{monster_info['description']}. You need the right sword!")
-                    game_state.message_timer = 2000
-                    game_state.game_over = True
-                    game_state.victory = False
-                else:
-                    game_state.enemy_x = -1  # Remove enemy when defeated
-                    game_state.show_message(monster_info['defeat_message'])
-                    game_state.message_timer = 2000
-            elif game_state.current_level == 2:  # Fire monster
-                if not game_state.has_fire_sword:
-                    game_state.show_message(f"{monster_info['description']}. Your grass sword is ineffective!")
-                    game_state.message_timer = 2000
-                    game_state.game_over = True
-                    game_state.victory = False
-                else:
-                    game_state.enemy_x = -1
-                    game_state.show_message(monster_info['defeat_message'])
-                    game_state.message_timer = 2000
-            else:  # Water monster
-                if not game_state.has_water_sword:
-                    game_state.show_message(f"{monster_info['description']}. Find the water sword!")
-                    game_state.message_timer = 2000
-                    game_state.game_over = True
-                    game_state.victory = False
-                else:
-                    game_state.enemy_x = -1
-                    game_state.show_message(monster_info['defeat_message'])
-                    game_state.message_timer = 2000
-                    game_state.show_message("Good Job! You have defeated all 3 elemental monsters! GG!")
-                    game_state.message_timer = 2000
-                    game_state.game_over = True
-                    game_state.victory = True
-        
-        # Check if player reaches the door
-        if game_state.player_x == game_state.door_x and game_state.player_y == game_state.door_y:
-            door_info = get_item_info('door')
-            if game_state.enemy_x >= 0:  # Enemy still alive
-                game_state.show_message(f"Defeat the monster before using the {door_info['name']}!")
-                game_state.message_timer = 2000
-            else:  # Enemy defeated
-                game_state.show_message(f"{door_info['name']} activated! {door_info['description']}")
-                game_state.message_timer = 3000
-                game_state.next_level()
-        
-        # Draw floor tiles and grid
-        for x in range(GRID_SIZE):
-            for y in range(GRID_SIZE):
-                if floor_img:
-                    screen.blit(floor_img, (x * CELL_SIZE, y * CELL_SIZE))
-                pygame.draw.rect(screen, GRAY, 
-                               (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
-
-        # Draw wall and button in level 2
-        if game_state.current_level == 2:
-            wall_x = GRID_SIZE // 2  # Center wall position
-
-            # Draw button at its fixed position
-            screen.blit(button_img, (game_state.button_x * CELL_SIZE, game_state.button_y * CELL_SIZE))
-            
-            # Check if player is on button
-            if game_state.player_x == game_state.button_x and game_state.player_y == game_state.button_y:
-                if game_state.wall_active:
-                    game_state.wall_active = False
-                    game_state.show_message("The wall disappears!")
-                    game_state.message_timer = 2000
-            
-            # Draw wall if active
-            if game_state.wall_active:
-                # Draw vertical wall in center for entire height
-                for y in range(GRID_SIZE):  # Full height wall
-                    screen.blit(wall_img, (wall_x * CELL_SIZE, y * CELL_SIZE))
-                    
-                    # Block player movement through wall
-                    if game_state.player_x == wall_x and game_state.player_y == y:
-                        # Push player back to previous position
-                        if game_state.player_x > game_state.prev_player_x:
-                            game_state.player_x = game_state.prev_player_x
-                        else:
-                            game_state.player_x = game_state.prev_player_x
-
-        # Draw maze walls in level 3
-        elif game_state.current_level == 3:
-            # Draw all maze walls
-            for wall_x, wall_y in game_state.maze_walls:
-                screen.blit(wall_img, (wall_x * CELL_SIZE, wall_y * CELL_SIZE))
-                
-                # Block player movement through maze walls
-                if game_state.player_x == wall_x and game_state.player_y == wall_y:
-                    # Push player back to previous position
-                    game_state.player_x = game_state.prev_player_x
-                    game_state.player_y = game_state.prev_player_y
-                    game_state.show_message("You can't walk through walls!")
-                    game_state.message_timer = 1000
-
-        # Draw chest if not opened
-        if not game_state.chest_opened:
-            screen.blit(chest_img, (game_state.chest_x * CELL_SIZE, game_state.chest_y * CELL_SIZE))
-        
-        # Draw key if not collected
-        if not game_state.has_key:
-            screen.blit(key_img, (game_state.key_x * CELL_SIZE, game_state.key_y * CELL_SIZE))
-        
-        # Draw door
-        screen.blit(door_img, (game_state.door_x * CELL_SIZE, game_state.door_y * CELL_SIZE))
-        
-        # Draw enemy if not defeated
-        if game_state.enemy_x >= 0:
-            if game_state.current_level == 1:
-                if grass_monster_img:
-                    screen.blit(grass_monster_img, (game_state.enemy_x * CELL_SIZE, game_state.enemy_y * CELL_SIZE))
-                else:
-                    enemy_text = game_font.render('🌿', True, GREEN)
-                    screen.blit(enemy_text, (game_state.enemy_x * CELL_SIZE, game_state.enemy_y * CELL_SIZE))
-            elif game_state.current_level == 2:
-                if fire_monster_img:
-                    screen.blit(fire_monster_img, (game_state.enemy_x * CELL_SIZE, game_state.enemy_y * CELL_SIZE))
-                else:
-                    enemy_text = game_font.render('🔥', True, ORANGE)
-                    screen.blit(enemy_text, (game_state.enemy_x * CELL_SIZE, game_state.enemy_y * CELL_SIZE))
-            else:
-                if water_monster_img:
-                    screen.blit(water_monster_img, (game_state.enemy_x * CELL_SIZE, game_state.enemy_y * CELL_SIZE))
-                else:
-                    enemy_text = game_font.render('💧', True, BLUE)
-                    screen.blit(enemy_text, (game_state.enemy_x * CELL_SIZE, game_state.enemy_y * CELL_SIZE))
-        
-        # Draw player
-        player_img_to_use = game_state.custom_player_image if game_state.custom_player_image else player_img
-        screen.blit(player_img_to_use, (game_state.player_x * CELL_SIZE, game_state.player_y * CELL_SIZE))
-        
-        # Store previous position for wall collision
-        game_state.prev_player_x = game_state.player_x
-        game_state.prev_player_y = game_state.player_y
-        
-        # Draw inventory
-        inventory_x = 10
-        if game_state.has_key:
-            if key_img:
-                scaled_key = pygame.transform.scale(key_img, (30, 30))
-                screen.blit(scaled_key, (inventory_x, 10))
-            else:
-                inventory_text = game_font.render('🔑', True, YELLOW)
-                screen.blit(inventory_text, (inventory_x, 10))
-            inventory_x += 40
-        
-        # Draw swords in inventory
-        if game_state.has_grass_sword:
-            if grass_sword_img:
-                scaled_sword = pygame.transform.scale(grass_sword_img, (30, 30))
-                screen.blit(scaled_sword, (inventory_x, 10))
-            else:
-                sword_text = game_font.render('🌿', True, GREEN)
-                screen.blit(sword_text, (inventory_x, 10))
-            inventory_x += 40
-        
-        if game_state.has_fire_sword:
-            if fire_sword_img:
-                scaled_sword = pygame.transform.scale(fire_sword_img, (30, 30))
-                screen.blit(scaled_sword, (inventory_x, 10))
-            else:
-                sword_text = game_font.render('🔥', True, ORANGE)
-                screen.blit(sword_text, (inventory_x, 10))
-            inventory_x += 40
-        
-        if game_state.has_water_sword:
-            if water_sword_img:
-                scaled_sword = pygame.transform.scale(water_sword_img, (30, 30))
-                screen.blit(scaled_sword, (inventory_x, 10))
-            else:
-                sword_text = game_font.render('💧', True, BLUE)
-                screen.blit(sword_text, (inventory_x, 10))
-        
-        # Draw level number
-        level_text = controls_font.render(f'Level {game_state.current_level}', True, BLACK)
-        screen.blit(level_text, (WINDOW_SIZE - 80, 10))
-        
-        # Draw message if active
-        if game_state.is_message_active():
-            draw_message(screen, game_state.message, message_font)
-    
-    # Update display
-    pygame.display.flip()
-    
-    # Check sound status
-    game_state.check_sound_status()
-    
-    # Control frame rate
-    clock.tick(60)
-
-# Quit game
-pygame.quit()
-sys.exit() 
\ No newline at end of file
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F3 and self.profiler:
+                # Show or hide the profiler overlay, the screen under it is drawn again
+                self.profiler.toggle_overlay()
+                self.menu_signature = None
+                if self.renderer:
+                    self.renderer.invalidate()
+            elif game_state.remapping_key:
+                self.handle_key_remap(event)
+            elif game_state.game_started and not game_state.game_over and not game_state.show_options:
+                # Every key press is queued and applied exactly once
+                action = game_state.get_action_for_key(event.key)
+                if action:
+                    self.input_queue.push(action)
+        return True
+
+    def draw_menu(self):
+        # Menus are only drawn again when something on them changed
+        game_state = self.game_state
+        screen = self.screen
+        signature = self.get_menu_signature()
+        if signature == self.menu_signature:
+            return
+
+        # Clear screen
+        screen.fill(WHITE)
+
+        if game_state.show_options:
+            draw_options_screen(screen, self.back_button, self.volume_up_button, self.volume_down_button, self.key_buttons, self.title_font, self.message_font, game_state.volume, self.floor_img)
+        elif not game_state.game_started:
+            draw_start_screen(screen, self.start_button, self.upload_button, self.options_button, self.title_font, self.controls_font, self.floor_img)
+            if self.assets.is_loading():
+                draw_loading_bar(screen, self.assets.progress())
+        else:
+            draw_game_over_screen(screen, game_state.victory, self.try_again_button, self.exit_button, self.floor_img, self.title_font, self.message_font)
+
+        # Update display
+        self.mark('draw')
+        pygame.display.flip()
+        self.mark('present')
+
+        # Buttons are positioned while drawing, so take the signature again
+        self.menu_signature = self.get_menu_signature()
+
+    def draw_gameplay(self):
+        renderer = self.get_renderer()
+        if DIRTY_RECT_RENDERING:
+            dirty_rects = renderer.draw_dirty(self.screen, self.game_state)
+            self.mark('draw')
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+        else:
+            renderer.draw(self.screen, self.game_state)
+            self.mark('draw')
+            pygame.display.flip()
+        self.mark('present')
+
+    def draw_profiler_overlay(self):
+        if self.profiler and self.profiler.show_overlay:
+            pygame.display.update(self.profiler.draw_overlay(self.screen, font('profiler')))
+        self.mark('overlay')
+
+    def update(self, events):
+        """One frame without the pacing: handle events, run the due logic ticks
+        and draw. Returns False when the game should quit."""
+        running = True
+        for event in events:
+            if not self.handle_event(event):
+                running = False
+        self.mark('events')
+
+        # Pick up images decoded in the background
+        if self.assets.is_loading():
+            self.assets.collect()
+        self.mark('assets')
+
+        # Run the game rules at a fixed rate, one queued action per tick
+        for _ in range(self.timestep.consume_ticks()):
+            action = self.input_queue.pop()
+            step(self.game_state, action)
+            if self.recorder:
+                self.recorder.tick(action)
+        self.mark('logic')
+
+        if self.is_menu_showing():
+            self.draw_menu()
+
+            # The gameplay screen has to be drawn in full when we get back to it
+            if self.renderer:
+                self.renderer.invalidate()
+            self.input_queue.clear()
+        else:
+            self.menu_signature = None
+
+            # Draw the gameplay screen
+            self.draw_gameplay()
+        self.draw_profiler_overlay()
+
+        if self.first_frame_ms is None:
+            self.finish_startup()
+            self.mark('assets')
+        return running
+
+    def run(self):
+        # Main game loop
+        running = True
+        clock = pygame.time.Clock()
+        pending_events = []  # Event that woke up an idle menu
+
+        while running:
+            events = pending_events + pygame.event.get()
+            pending_events = []
+            running = self.update(events)
+
+            if self.is_menu_showing():
+                # Nothing moves on a menu, sleep until an event arrives
+                # (or briefly, while images are still loading)
+                timeout = LOADING_POLL_MS if self.assets.is_loading() else MENU_IDLE_TIMEOUT_MS
+                event = pygame.event.wait(timeout)
+                if event.type != pygame.NOEVENT:
+                    pending_events.append(event)
+
+            # Control frame rate; the elapsed time feeds the logic ticks
+            self.timestep.add_time(clock.tick(RENDER_FPS))
+            if self.profiler:
+                self.profiler.mark('wait')
+                self.profiler.end_frame()
+
+        if self.profiler:
+            print(f"Frame profile written to {self.profiler.write_csv()}")
+        if self.recorder:
+            size = self.recorder.save(self.record_path, self.game_state)
+            print(f"Recorded {self.recorder.ticks} ticks to {self.record_path} ({size} bytes)")
+
+def main():
+    args = sys.argv[1:]
+    record_path = args[args.index('--record') + 1] if '--record' in args[:-1] else None
+    game = Game(profile='--profile' in args, record_path=record_path)
+    game.run()
+
+    # Quit game
+    pygame.quit()
+    sys.exit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+from .constants import CELL_SIZE, INVENTORY_ICON_SIZE, MAX_CACHED_IMAGES, ASSET_LOADER_THREADS
+from .game_data import MONSTERS, SWORDS, ITEMS
+
+# File names of the images the game draws, by role
+IMAGE_FILES = {
+    'player': 'Player.png',
+    'floor': 'Floor.png',
+    'wall': 'Wall.png',
+    'button': 'Button.png',
+    'key': ITEMS['key']['image'],
+    'chest': ITEMS['chest']['image'],
+    'door': ITEMS['door']['image'],
+    'grass_monster': MONSTERS[1]['image'],
+    'fire_monster': MONSTERS[2]['image'],
+    'water_monster': MONSTERS[3]['image'],
+    'grass_sword': SWORDS['grass_sword']['image'],
+    'fire_sword': SWORDS['fire_sword']['image'],
+    'water_sword': SWORDS['water_sword']['image'],
+}
+
+# Roles that are also shown as small icons in the inventory
+INVENTORY_IMAGES = ['key', 'grass_sword', 'fire_sword', 'water_sword']
+
+def decode_image(path, size=None):
+    """Decode and scale an image into an RGBA pixel buffer, returns (pixels, size).
+
+    Only touches pygame functions that release the GIL and never the display,
+    so it can run on a worker thread.
+    """
+    image = pygame.image.load(path)
+    if size is not None and image.get_size() != size:
+        image = pygame.transform.scale(image, size)
+    return pygame.image.tobytes(image, 'RGBA'), image.get_size()
+
+def buffer_to_surface(pixels, size):
+    # Main thread only: the conversion needs the display
+    image = pygame.image.frombytes(pixels, size, 'RGBA')
+    if pygame.display.get_surface() is None:
+        return image  # Headless runs keep the loaded format
+    return image.convert_alpha()
+
+class AssetManager:
+    # Images keyed by (name, size), converted to the display format once
+    # and kept in a least recently used cache. Images can also be decoded on a
+    # thread pool with load_async() and picked up on the main thread by collect().
+    def __init__(self, asset_dir='assets', max_images=MAX_CACHED_IMAGES, threads=ASSET_LOADER_THREADS):
+        self.asset_dir = asset_dir
+        self.max_images = max_images
+        self.threads = threads
+        self.images = OrderedDict()
+        self.missing = set()
+        self.executor = None
+        self.pending = {}  # key -> Future with the decoded pixel buffer
+        self.requested = 0  # Images asked for since the last completed batch
+        self.finished = 0
+
+    def store(self, key, image):
+        self.images[key] = image
+        while len(self.images) > self.max_images:
+            self.images.popitem(last=False)
+
+    def finish(self, key, future):
+        # Turn a decoded buffer into a Surface and cache it
+        del self.pending[key]
+        self.finished += 1
+        try:
+            image = buffer_to_surface(*future.result())
+        except Exception:
+            print(f"Error loading image: {key[0]}")
+            self.missing.add(key[0])
+            return None
+        self.store(key, image)
+        return image
+
+    def build(self, name, size):
+        try:
+            return buffer_to_surface(*decode_image(os.path.join(self.asset_dir, name), size))
+        except Exception:
+            print(f"Error loading image: {name}")
+            return None
+
+    def get(self, name, size=(CELL_SIZE, CELL_SIZE)):
+        """Get an image by file name, scaled to size (None keeps the original size)"""
+        key = (name, size)
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+            return image
+        if name in self.missing:
+            return None
+        if key in self.pending:
+            # Already being decoded, wait for just this one
+            return self.finish(key, self.pending[key])
+
+        image = self.build(name, size)
+        if image is None:
+            self.missing.add(name)
+            return None
+        self.store(key, image)
+        return image
+
+    def load_async(self, keys):
+        """Start decoding (name, size) keys on the thread pool"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.threads)
+        for key in keys:
+            if key in self.images or key in self.pending or key[0] in self.missing:
+                continue
+            name, size = key
+            self.pending[key] = self.executor.submit(decode_image, os.path.join(self.asset_dir, name), size)
+            self.requested += 1
+
+    def collect(self, wait=False):
+        """Convert the images that finished decoding (all of them if wait) and return the progress"""
+        for key, future in list(self.pending.items()):
+            if wait or future.done():
+                self.finish(key, future)
+        if not self.pending and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        return self.progress()
+
+    def progress(self):
+        """Fraction of the requested images that are ready, 1.0 when idle"""
+        if not self.pending:
+            self.requested = self.finished = 0
+            return 1.0
+        return self.finished / self.requested
+
+    def is_loading(self):
+        return bool(self.pending)
+
+    def preload(self, names, size=(CELL_SIZE, CELL_SIZE)):
+        self.load_async([(name, size) for name in names])
+        self.collect(wait=True)
+
+    def image(self, role, size=(CELL_SIZE, CELL_SIZE)):
+        """Get one of the game images by role (see IMAGE_FILES)"""
+        return self.get(IMAGE_FILES[role], size)
+
+    def get_game_image_keys(self):
+        # Every cell sized image plus the inventory icons, so no frame has to scale
+        cell = (CELL_SIZE, CELL_SIZE)
+        keys = [(name, cell) for name in IMAGE_FILES.values()]
+        keys += [(IMAGE_FILES[role], INVENTORY_ICON_SIZE) for role in INVENTORY_IMAGES]
+        return keys
+
+    def load_game_images_async(self):
+        self.load_async(self.get_game_image_keys())
+
+    def preload_game_images(self):
+        self.load_async(self.get_game_image_keys())
+        self.collect(wait=True)
+
+    def clear(self):
+        self.collect(wait=True)
+        self.images.clear()
+        self.missing.clear()
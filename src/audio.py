@@ -0,0 +1,32 @@
+import pygame
+
+# Posted by the mixer when the track reaches its end
+MUSIC_END_EVENT = pygame.event.custom_type()
+
+class Soundtrack:
+    # Background music, kept out of GameState so the rules never touch the mixer.
+    # The track is streamed from disk with pygame.mixer.music instead of being
+    # decoded into memory, and restarted when the mixer reports its end.
+    def __init__(self, path='assets/soundTrack.MP3'):
+        self.path = path
+        self.loaded = False
+
+    def start(self, volume):
+        try:
+            pygame.mixer.init()
+            pygame.mixer.music.load(self.path)
+            pygame.mixer.music.set_volume(volume)
+            pygame.mixer.music.set_endevent(MUSIC_END_EVENT)
+            pygame.mixer.music.play()
+            self.loaded = True
+        except Exception as e:
+            print(f"Error loading soundtrack: {e}")
+
+    def set_volume(self, volume):
+        if self.loaded:
+            pygame.mixer.music.set_volume(volume)
+
+    def check_status(self):
+        # Called on MUSIC_END_EVENT: play the track again from the start
+        if self.loaded and not pygame.mixer.music.get_busy():
+            pygame.mixer.music.play()
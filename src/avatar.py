@@ -0,0 +1,81 @@
+import hashlib
+import os
+import subprocess
+import sys
+import threading
+import pygame
+from .constants import CELL_SIZE, AVATAR_CACHE_DIR
+from .assets import decode_image
+
+# Posted when a custom character image was picked (or the picking failed).
+# Attributes: pixels and size of the RGBA buffer (None if nothing was loaded)
+# and error ('dialog' or 'decode' when something went wrong, else None).
+AVATAR_LOADED_EVENT = pygame.event.custom_type()
+
+def ask_for_file():
+    """Run the file dialog in a child process and return the chosen path ('' if cancelled)"""
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-m', 'src.file_dialog'], cwd=project_dir,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "file dialog failed")
+    return result.stdout.strip()
+
+def get_cache_path(data, size, cache_dir=AVATAR_CACHE_DIR):
+    # Same image file, same processed avatar
+    digest = hashlib.sha256(data).hexdigest()
+    return os.path.join(cache_dir, f"{digest}_{size[0]}x{size[1]}.rgba")
+
+def load_avatar(file_path, size=(CELL_SIZE, CELL_SIZE), cache_dir=AVATAR_CACHE_DIR):
+    """Decode and scale an avatar into an RGBA buffer, using the disk cache if possible"""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    cache_path = get_cache_path(data, size, cache_dir)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            pixels = f.read()
+        if len(pixels) == size[0] * size[1] * 4:
+            return pixels, size
+
+    pixels, size = decode_image(file_path, size)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path, 'wb') as f:
+            f.write(pixels)
+    except OSError:
+        pass  # The cache only saves time, the avatar is still usable
+    return pixels, size
+
+class AvatarLoader:
+    # Picks and decodes a custom character image on a worker thread, so the
+    # game keeps running while the file dialog is open. The thread only waits
+    # for the dialog, which runs in its own process (see file_dialog.py)
+    def __init__(self, cache_dir=AVATAR_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.thread = None
+
+    def is_busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        if self.is_busy():
+            return False  # A dialog is already open
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return True
+
+    def run(self):
+        pixels = size = error = None
+        try:
+            file_path = ask_for_file()
+        except Exception as e:
+            print(f"Error opening file dialog: {e}")
+            file_path = None
+            error = 'dialog'
+        if file_path:
+            try:
+                pixels, size = load_avatar(file_path, cache_dir=self.cache_dir)
+            except Exception as e:
+                print(f"Error loading custom image: {e}")
+                error = 'decode'
+        pygame.event.post(pygame.event.Event(AVATAR_LOADED_EVENT, pixels=pixels, size=size, error=error))
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+import pygame
+from .constants import CELL_SIZE, WHITE, GRAY, CHUNK_CELLS, MAX_CACHED_CHUNKS, CHUNK_EVICT_DISTANCE
+from .grid_index import WALL, BUTTON
+
+class BackgroundLayer:
+    # Floor tiles, grid lines and static walls baked into cached chunk surfaces.
+    # Only the chunks overlapping the camera are blitted, so the cost per frame
+    # does not depend on the size of the level.
+    def __init__(self, floor_img, wall_img, button_img):
+        self.floor_img = floor_img
+        self.wall_img = wall_img
+        self.button_img = button_img
+        self.chunks = OrderedDict()  # (chunk_x, chunk_y) -> Surface, least recently used first
+        self.blank_chunk = None
+        self.signature = None
+
+    def get_signature(self, game_state):
+        # Anything that changes the static part of the level must be in here
+        return (game_state.layout_id, game_state.current_level, game_state.wall_active)
+
+    def get_blank_chunk(self):
+        # Floor and grid lines for a full chunk, copied for every new chunk
+        if self.blank_chunk is None:
+            size = CHUNK_CELLS * CELL_SIZE
+            self.blank_chunk = pygame.Surface((size, size))
+            self.blank_chunk.fill(WHITE)
+            for x in range(CHUNK_CELLS):
+                for y in range(CHUNK_CELLS):
+                    if self.floor_img:
+                        self.blank_chunk.blit(self.floor_img, (x * CELL_SIZE, y * CELL_SIZE))
+                    pygame.draw.rect(self.blank_chunk, GRAY,
+                                   (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
+        return self.blank_chunk
+
+    def bake_chunk(self, game_state, chunk_x, chunk_y):
+        grid = game_state.grid
+        first_x = chunk_x * CHUNK_CELLS
+        first_y = chunk_y * CHUNK_CELLS
+        width = min(CHUNK_CELLS, grid.width - first_x)
+        height = min(CHUNK_CELLS, grid.height - first_y)
+        surface = pygame.Surface((width * CELL_SIZE, height * CELL_SIZE))
+        surface.blit(self.get_blank_chunk(), (0, 0))
+
+        # Buttons and walls come straight from the occupancy grid
+        flags = grid.flags
+        for y in range(first_y, first_y + height):
+            row = y * grid.width
+            for x in range(first_x, first_x + width):
+                cell = flags[row + x]
+                if not cell & (WALL | BUTTON):
+                    continue
+                pos = ((x - first_x) * CELL_SIZE, (y - first_y) * CELL_SIZE)
+                if cell & BUTTON and self.button_img:
+                    surface.blit(self.button_img, pos)
+                if cell & WALL and self.wall_img:
+                    surface.blit(self.wall_img, pos)
+        return surface
+
+    def get_chunk(self, game_state, chunk_x, chunk_y):
+        key = (chunk_x, chunk_y)
+        surface = self.chunks.get(key)
+        if surface is None:
+            surface = self.bake_chunk(game_state, chunk_x, chunk_y)
+            self.chunks[key] = surface
+        else:
+            self.chunks.move_to_end(key)
+        return surface
+
+    def update(self, game_state):
+        # Drop every chunk when the static layout changed
+        signature = self.get_signature(game_state)
+        if signature != self.signature:
+            self.chunks.clear()
+            self.signature = signature
+
+    def draw(self, screen, game_state, camera, area=None):
+        """Blit the chunks overlapping the view (or only the given screen area)"""
+        self.update(game_state)
+        grid = game_state.grid
+        chunk_px = CHUNK_CELLS * CELL_SIZE
+        view = camera.get_view_rect()
+        if area is not None:
+            view = pygame.Rect(area.x + camera.offset_x, area.y + camera.offset_y, area.width, area.height)
+        first_x = max(0, view.left // chunk_px)
+        first_y = max(0, view.top // chunk_px)
+        last_x = min((grid.width - 1) // CHUNK_CELLS, (view.right - 1) // chunk_px)
+        last_y = min((grid.height - 1) // CHUNK_CELLS, (view.bottom - 1) // chunk_px)
+        for chunk_y in range(first_y, last_y + 1):
+            for chunk_x in range(first_x, last_x + 1):
+                surface = self.get_chunk(game_state, chunk_x, chunk_y)
+                screen.blit(surface, camera.world_to_screen(chunk_x * chunk_px, chunk_y * chunk_px))
+
+        if area is None:
+            self.evict(first_x, first_y, last_x, last_y)
+
+    def evict(self, first_x, first_y, last_x, last_y):
+        # Drop chunks far away from the visible ones, then the least recently used
+        for key in list(self.chunks):
+            chunk_x, chunk_y = key
+            if (chunk_x < first_x - CHUNK_EVICT_DISTANCE or chunk_x > last_x + CHUNK_EVICT_DISTANCE or
+                    chunk_y < first_y - CHUNK_EVICT_DISTANCE or chunk_y > last_y + CHUNK_EVICT_DISTANCE):
+                del self.chunks[key]
+        while len(self.chunks) > MAX_CACHED_CHUNKS:
+            self.chunks.popitem(last=False)
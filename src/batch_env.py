@@ -0,0 +1,225 @@
+# Many games stepped at once with NumPy, following the rules in simulation.py
+import numpy as np
+from .entities import get_sword_type
+from .grid_index import WALL
+from .levels import ELEMENTS, get_default_pack
+from .simulation import RULES
+
+# Action codes for step(); 0 waits and only re-checks the current cell
+NOOP, UP, DOWN, LEFT, RIGHT = range(5)
+ACTION_NAMES = (None, 'up', 'down', 'left', 'right')
+DX = np.array([0, 0, 0, -1, 1], dtype=np.int16)
+DY = np.array([0, -1, 1, 0, 0], dtype=np.int16)
+
+# Element index of each sword type
+SWORD_INDEX = {get_sword_type(element): index for index, element in enumerate(ELEMENTS)}
+
+def build_layouts(level_pack):
+    """Read every level and variant of a pack into arrays indexed by layout.
+
+    Grids are padded to the largest level with walls. Keys, chests, doors and
+    buttons never change how a later visit goes, so they are cell grids; the
+    monsters of each layout are slots, sorted by cell so the ones sharing a
+    cell are next to each other in the order the game fights them."""
+    levels = [level_pack.get_level(number, variant)
+              for number in sorted(level_pack.variants) for variant in level_pack.get_variants(number)]
+    count = len(levels)
+    height = max(level.height for level in levels)
+    width = max(level.width for level in levels)
+    max_monsters = max(max(len(level.monsters) for level in levels), 1)
+
+    first_layout = {}  # Level number -> its first layout
+    for i, level in enumerate(levels):
+        first_layout.setdefault(level.number, i)
+
+    layouts = {
+        'names': [(level.number, level.variant) for level in levels],
+        'current_level': np.array([level.number for level in levels], dtype=np.int16),
+        'player_x': np.array([level.player[0] for level in levels], dtype=np.int16),
+        'player_y': np.array([level.player[1] for level in levels], dtype=np.int16),
+        'final': np.array([not level_pack.has_level(level.number + 1) for level in levels]),
+        # Layouts a door leads to: the next level's first layout and its variant count
+        'next_first': np.array([first_layout.get(level.number + 1, 0) for level in levels], dtype=np.int16),
+        'next_count': np.array([len(level_pack.get_variants(level.number + 1)) for level in levels], dtype=np.int16),
+        'monster_count': np.array([len(level.monsters) for level in levels], dtype=np.int32),
+        # Static walls, and the cells only blocked while wall_active is set
+        'walls': np.ones((count, height, width), dtype=bool),
+        'gate': np.zeros((count, height, width), dtype=bool),
+        'key': np.zeros((count, height, width), dtype=bool),
+        'chest_swords': np.zeros((count, height, width), dtype=np.uint8),  # Bit per sword element
+        'door': np.zeros((count, height, width), dtype=bool),
+        'button': np.zeros((count, height, width), dtype=bool),
+        'monster_first': np.full((count, height, width), -1, dtype=np.int32),
+        'monsters_on_cell': np.zeros((count, height, width), dtype=np.int32),
+        'monster_weakness': np.zeros((count, max_monsters), dtype=np.intp),  # Sword element index
+    }
+    for i, level in enumerate(levels):
+        cells = np.frombuffer(level.cells, dtype=np.uint8).reshape(level.height, level.width)
+        layouts['walls'][i, :level.height, :level.width] = (cells & WALL) != 0
+        gate = layouts['gate'][i].reshape(-1)
+        for index in level.gate_cells:
+            gate[(index // level.width) * width + index % level.width] = True
+        for x, y, element in level.keys:
+            layouts['key'][i, y, x] = True
+        for x, y, element in level.chests:
+            layouts['chest_swords'][i, y, x] |= 1 << ELEMENTS.index(element)
+        for x, y, element in level.doors:
+            layouts['door'][i, y, x] = True
+        for x, y, element in level.buttons:
+            layouts['button'][i, y, x] = True
+        for slot, (x, y, element) in enumerate(sorted(level.monsters, key=lambda monster: (monster[1], monster[0]))):
+            if layouts['monster_first'][i, y, x] < 0:
+                layouts['monster_first'][i, y, x] = slot
+            layouts['monsters_on_cell'][i, y, x] += 1
+            layouts['monster_weakness'][i, slot] = SWORD_INDEX[RULES['monsters'][ELEMENTS.index(element)][0]]
+    # A door starts the next level, so a button under it is never pressed
+    layouts['button'] &= ~layouts['door']
+    layouts['start'] = first_layout[min(first_layout)]  # reset_game() loads the first variant
+    return layouts
+
+class BatchEnv:
+    # N games held as struct-of-arrays buffers and advanced by one vectorized step
+    def __init__(self, num_envs, seed=None, auto_reset=True, level_pack=None):
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.rng = np.random.default_rng(seed)
+        self.layouts = build_layouts(level_pack or get_default_pack())
+        self.envs = np.arange(num_envs)
+
+        self.layout = np.zeros(num_envs, dtype=np.int16)
+        self.current_level = np.zeros(num_envs, dtype=np.int16)
+        self.player_x = np.zeros(num_envs, dtype=np.int16)
+        self.player_y = np.zeros(num_envs, dtype=np.int16)
+        self.has_key = np.zeros(num_envs, dtype=bool)
+        self.chest_opened = np.zeros(num_envs, dtype=bool)
+        self.swords = np.zeros((num_envs, len(ELEMENTS)), dtype=bool)  # In the order of ELEMENTS
+        self.monster_alive = np.zeros((num_envs, self.layouts['monster_weakness'].shape[1]), dtype=bool)
+        self.monsters_left = np.zeros(num_envs, dtype=np.int32)
+        self.wall_active = np.zeros(num_envs, dtype=bool)
+        self.done = np.zeros(num_envs, dtype=bool)
+        self.victory = np.zeros(num_envs, dtype=bool)
+        self.reset()
+
+    def start_layout(self, mask, layout):
+        # Put the selected games at the start of a layout with an empty inventory
+        layouts = self.layouts
+        self.layout[mask] = layout[mask] if isinstance(layout, np.ndarray) else layout
+        selected = self.layout[mask]
+        self.current_level[mask] = layouts['current_level'][selected]
+        self.player_x[mask] = layouts['player_x'][selected]
+        self.player_y[mask] = layouts['player_y'][selected]
+        self.has_key[mask] = False
+        self.chest_opened[mask] = False
+        self.swords[mask] = False
+        self.monsters_left[mask] = layouts['monster_count'][selected]
+        self.monster_alive[mask] = np.arange(self.monster_alive.shape[1]) < self.monsters_left[mask, None]
+        self.wall_active[mask] = True
+
+    def reset(self, mask=None):
+        """Restart the selected games (all by default) at level 1"""
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        self.start_layout(mask, self.layouts['start'])
+        self.done[mask] = False
+        self.victory[mask] = False
+        return self.observe()
+
+    def observe(self):
+        observations = {
+            'player_x': self.player_x.copy(),
+            'player_y': self.player_y.copy(),
+            'current_level': self.current_level.copy(),
+            'has_key': self.has_key.copy(),
+            'chest_opened': self.chest_opened.copy(),
+            'enemy_alive': self.monsters_left > 0,
+            'monsters_left': self.monsters_left.copy(),
+            'wall_active': self.wall_active.copy(),
+            'done': self.done.copy(),
+            'victory': self.victory.copy(),
+        }
+        for index, element in enumerate(ELEMENTS):
+            observations[f'has_{element}_sword'] = self.swords[:, index].copy()
+        return observations
+
+    def step(self, actions):
+        """Advance every game by one action and return (observations, rewards, dones)
+
+        Rewards are 1 for a victory, -1 for a defeat and 0 otherwise. With
+        auto_reset, games that finished on the previous step restart at
+        level 1 and ignore their action for this step.
+        """
+        actions = np.asarray(actions, dtype=np.int8)
+        layouts = self.layouts
+        envs = self.envs
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+
+        if self.auto_reset and self.done.any():
+            finished = self.done.copy()
+            self.reset(finished)
+            active = ~finished
+        else:
+            active = ~self.done
+        layout = self.layout
+
+        # Movement, with walls checked before the move is applied; the padding
+        # around smaller levels is wall, and a move off the grid stays in place
+        height, width = layouts['walls'].shape[1:]
+        new_x = np.clip(self.player_x + DX[actions], 0, width - 1)
+        new_y = np.clip(self.player_y + DY[actions], 0, height - 1)
+        blocked = layouts['walls'][layout, new_y, new_x]
+        blocked |= layouts['gate'][layout, new_y, new_x] & self.wall_active
+        moved = active & ~blocked
+        self.player_x = np.where(moved, new_x, self.player_x).astype(np.int16)
+        self.player_y = np.where(moved, new_y, self.player_y).astype(np.int16)
+        cell = (layout, self.player_y, self.player_x)
+
+        # Keys, then the chests on the cell give the swords of their elements
+        self.has_key |= active & layouts['key'][cell]
+        chest_swords = layouts['chest_swords'][cell]
+        opened = active & self.has_key & (chest_swords != 0)
+        self.chest_opened |= opened
+        self.swords |= opened[:, None] & ((chest_swords[:, None] >> np.arange(len(ELEMENTS))) & 1).astype(bool)
+
+        # Monsters on the cell, one at a time in the order the game fights them
+        first = layouts['monster_first'][cell]
+        on_cell = layouts['monsters_on_cell'][cell]
+        fighting = active.copy()
+        final = layouts['final'][layout]
+        for k in range(int(on_cell[active].max(initial=0))):
+            slot = np.where(k < on_cell, first + k, 0)
+            met = fighting & (k < on_cell) & self.monster_alive[envs, slot]
+            has_sword = self.swords[envs, layouts['monster_weakness'][layout, slot]]
+            defeated = met & ~has_sword
+            killed = met & has_sword
+            self.monster_alive[envs[killed], slot[killed]] = False
+            self.monsters_left -= killed
+            won = killed & final & (self.monsters_left == 0)
+            self.victory |= won
+            self.done |= defeated | won
+            rewards[won] = 1.0
+            rewards[defeated] = -1.0
+            fighting &= ~(defeated | won)
+
+        # A door opens once every monster is defeated: the final level's wins
+        # the game, the others lead to a random variant of the next level
+        through = fighting & layouts['door'][cell] & (self.monsters_left == 0)
+        won = through & final
+        self.victory |= won
+        self.done |= won
+        rewards[won] = 1.0
+        through &= ~final
+
+        # Button removes the gate
+        pressed = fighting & self.wall_active & layouts['button'][cell]
+        self.wall_active &= ~pressed
+
+        if through.any():
+            next_layout = (layouts['next_first'][layout] +
+                           (self.rng.random(self.num_envs) * layouts['next_count'][layout]).astype(np.int16))
+            self.start_layout(through, next_layout)
+
+        return self.observe(), rewards, self.done.copy()
+
+    def encode_actions(self, names):
+        """Convert action names (as used by simulation.step) to action codes"""
+        return np.array([ACTION_NAMES.index(name) for name in names], dtype=np.int8)
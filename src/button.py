@@ -1,12 +1,14 @@
 import pygame
 from .constants import BLACK, WHITE
+from .text_cache import render_text
+from .fonts import font
 
 class Button:
     def __init__(self, x, y, width, height, text, color=WHITE):
         self.rect = pygame.Rect(x, y, width, height)
         self.text = text
         self.color = color
-        self.font = pygame.font.SysFont('Arial', 24)
+        self.font = font('button')  # Shared by all buttons
         
     def draw(self, surface):
         # Draw button with hover effect
@@ -17,7 +19,7 @@ class Button:
             pygame.draw.rect(surface, self.color, self.rect)
             
         pygame.draw.rect(surface, BLACK, self.rect, 2)
-        text_surface = self.font.render(self.text, True, BLACK)
+        text_surface = render_text(self.font, self.text, BLACK)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
         
@@ -0,0 +1,39 @@
+import pygame
+from .constants import CELL_SIZE
+
+class Camera:
+    # Scrolling view onto the level that keeps the player in the middle
+    def __init__(self, view_width, view_height):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.offset_x = 0
+        self.offset_y = 0
+
+    def follow(self, cell_x, cell_y, world_width, world_height):
+        """Center on a cell without showing anything past the edges of the level"""
+        world_px = world_width * CELL_SIZE
+        world_py = world_height * CELL_SIZE
+        target_x = cell_x * CELL_SIZE + CELL_SIZE // 2 - self.view_width // 2
+        target_y = cell_y * CELL_SIZE + CELL_SIZE // 2 - self.view_height // 2
+        self.offset_x = max(0, min(target_x, world_px - self.view_width))
+        self.offset_y = max(0, min(target_y, world_py - self.view_height))
+
+    def get_view_rect(self):
+        """Visible part of the level in world pixels"""
+        return pygame.Rect(self.offset_x, self.offset_y, self.view_width, self.view_height)
+
+    def world_to_screen(self, x, y):
+        return x - self.offset_x, y - self.offset_y
+
+    def cell_rect(self, cell_x, cell_y):
+        """Screen rect of a cell"""
+        return pygame.Rect(cell_x * CELL_SIZE - self.offset_x, cell_y * CELL_SIZE - self.offset_y,
+                           CELL_SIZE, CELL_SIZE)
+
+    def visible_cells(self, world_width, world_height):
+        """Range of cells (x0, y0, x1, y1) that overlap the view, end exclusive"""
+        x0 = self.offset_x // CELL_SIZE
+        y0 = self.offset_y // CELL_SIZE
+        x1 = min(world_width, (self.offset_x + self.view_width + CELL_SIZE - 1) // CELL_SIZE)
+        y1 = min(world_height, (self.offset_y + self.view_height + CELL_SIZE - 1) // CELL_SIZE)
+        return x0, y0, x1, y1
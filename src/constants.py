@@ -14,5 +14,51 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 ORANGE = (255, 165, 0)
 
+# Rendering settings
+DIRTY_RECT_RENDERING = True  # Only redraw and push the regions that changed
+RENDER_FPS = 60
+CHUNK_CELLS = 16  # Level background is cached in chunks of 16x16 cells
+MAX_CACHED_CHUNKS = 16
+CHUNK_EVICT_DISTANCE = 2  # Chunks further than this from the view are dropped
+MENU_IDLE_TIMEOUT_MS = 500  # Longest an idle menu sleeps without any event
+INVENTORY_ICON_SIZE = (30, 30)
+MAX_CACHED_IMAGES = 64  # Loaded and scaled images kept by the asset manager
+ASSET_LOADER_THREADS = 4  # Worker threads decoding images in the background
+LOADING_POLL_MS = 15  # How often an idle menu checks on images still loading
+AVATAR_CACHE_DIR = 'cache/avatars'  # Processed custom character images, by content hash
+MAX_CACHED_TEXTS = 128  # Rendered text surfaces kept by the text cache
+
+# Frame profiler (python main.py --profile)
+PROFILER_FRAMES = 3600  # Frames kept in the ring buffer, a minute at 60 FPS
+PROFILER_OVERLAY_MS = 250  # How often the overlay numbers are refreshed
+PROFILE_CSV_PATH = 'profile.csv'  # Written when the game exits
+
+# Game loop settings
+LOGIC_TICK_MS = 10  # Game rules run 100 times per second
+MAX_TICKS_PER_FRAME = 10  # Catch-up limit when a frame took too long
+
+# Monster settings
+HUNTING_MONSTERS = False  # Monsters chase the player instead of standing still
+MONSTER_STEP_TICKS = 50  # A hunting monster takes one step every 50 logic ticks
+HUNT_RADIUS = 64  # Monsters further than this many steps from the player wait
+
+# Game server (python -m src.server)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+
+# Balance sweep (python -m src.sweep)
+SWEEP_RESULTS_PATH = 'sweep_results.bin'
+
+# Level files
+LEVEL_SOURCE_DIR = 'levels'  # JSON level sources
+LEVEL_PACK_PATH = 'levels/levels.pack'  # Compiled by python -m src.level_compiler
+
+# Default key bindings (pygame key codes are the lowercase ASCII values)
+KEY_W = ord('w')
+KEY_S = ord('s')
+KEY_A = ord('a')
+KEY_D = ord('d')
+
 # Message settings
-MESSAGE_DURATION = 2  # seconds 
\ No newline at end of file
+MESSAGE_DURATION = 2  # seconds
+MESSAGE_LINE_CHARS = 30  # Longer messages are split over two lines 
\ No newline at end of file
@@ -0,0 +1,142 @@
+# Distance to the player over the level grid, shared by every hunting monster.
+# Plain Python so GameState stays free of NumPy and pygame.
+import heapq
+from .constants import HUNT_RADIUS
+from .grid_index import WALL
+
+UNREACHED = 1 << 30  # Further away than max_distance, or walled off
+
+class DistanceField:
+    # Steps from every cell to a target cell, kept up to date as the target moves
+    # one cell at a time and as walls open, so monsters just read their next step.
+    # Distances past max_distance are not tracked, which bounds the work per update.
+    def __init__(self, grid, max_distance=HUNT_RADIUS):
+        self.grid = grid
+        self.width = grid.width
+        self.height = grid.height
+        self.max_distance = max_distance
+        self.distances = [UNREACHED] * (self.width * self.height)
+        self.target = None
+
+    def get_neighbors(self, index):
+        # Open cells next to a cell
+        width = self.width
+        flags = self.grid.flags
+        x = index % width
+        neighbors = []
+        if index >= width and not flags[index - width] & WALL:
+            neighbors.append(index - width)
+        if index < len(flags) - width and not flags[index + width] & WALL:
+            neighbors.append(index + width)
+        if x > 0 and not flags[index - 1] & WALL:
+            neighbors.append(index - 1)
+        if x < width - 1 and not flags[index + 1] & WALL:
+            neighbors.append(index + 1)
+        return neighbors
+
+    def reset(self, x, y):
+        """Rebuild the whole field with a breadth first search from the target"""
+        distances = [UNREACHED] * (self.width * self.height)
+        target = y * self.width + x
+        distances[target] = 0
+        queue = [target]
+        for index in queue:
+            distance = distances[index] + 1
+            if distance > self.max_distance:
+                break
+            for neighbor in self.get_neighbors(index):
+                if distances[neighbor] == UNREACHED:
+                    distances[neighbor] = distance
+                    queue.append(neighbor)
+        self.distances = distances
+        self.target = (x, y)
+
+    def propagate(self, heap):
+        # Lower distances outwards from (distance, index) seeds, nearest first
+        distances = self.distances
+        while heap:
+            distance, index = heapq.heappop(heap)
+            if distance > distances[index]:
+                continue
+            distance += 1
+            if distance > self.max_distance:
+                continue
+            for neighbor in self.get_neighbors(index):
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    heapq.heappush(heap, (distance, neighbor))
+
+    def move_target(self, x, y):
+        """Follow the target to (x, y), updating only the cells whose distance changed.
+
+        A step of the target changes every distance by at most one: cells that are
+        now closer get their distance from a search out of the new target, cells
+        that only had a shortest path through the old target are one step further.
+        """
+        if self.target is None or abs(x - self.target[0]) + abs(y - self.target[1]) != 1:
+            self.reset(x, y)
+            return
+        distances = self.distances
+        max_distance = self.max_distance
+        old_target = self.target[1] * self.width + self.target[0]
+        new_target = y * self.width + x
+
+        # Add the new target: everything closer to it than to the old one drops
+        distances[new_target] = 0
+        queue = [new_target]
+        for index in queue:
+            distance = distances[index] + 1
+            if distance > max_distance:
+                break
+            for neighbor in self.get_neighbors(index):
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    queue.append(neighbor)
+
+        # Remove the old target: level by level, find the cells left without a
+        # neighbor one step closer that does not lead back to the old target
+        affected = {old_target}
+        level = [old_target]
+        while level:
+            next_level = []
+            for index in level:
+                distance = distances[index]
+                for child in self.get_neighbors(index):
+                    if distances[child] != distance + 1 or child in affected:
+                        continue
+                    if not any(distances[neighbor] == distance and neighbor not in affected
+                               for neighbor in self.get_neighbors(child)):
+                        affected.add(child)
+                        next_level.append(child)
+            level = next_level
+        for index in affected:
+            distance = distances[index] + 1
+            distances[index] = distance if distance <= max_distance else UNREACHED
+        self.target = (x, y)
+
+    def open_cells(self, cells):
+        """Walls were removed from the given (x, y) cells; distances can only drop"""
+        distances = self.distances
+        heap = []
+        for x, y in cells:
+            index = y * self.width + x
+            best = min((distances[neighbor] for neighbor in self.get_neighbors(index)), default=UNREACHED) + 1
+            if best < distances[index] and best <= self.max_distance:
+                distances[index] = best
+                heap.append((best, index))
+        heapq.heapify(heap)
+        self.propagate(heap)
+
+    def get_distance(self, x, y):
+        return self.distances[y * self.width + x]
+
+    def next_step(self, x, y):
+        """The neighboring cell one step closer to the target, None if there is none"""
+        index = y * self.width + x
+        distance = self.distances[index]
+        if distance == 0 or distance == UNREACHED:
+            return None
+        for neighbor in self.get_neighbors(index):
+            if self.distances[neighbor] == distance - 1:
+                return neighbor % self.width, neighbor // self.width
+        return None
@@ -0,0 +1,119 @@
+# Keys, chests, monsters, doors and buttons of a level, any number of each.
+# Columns of typed arrays with one slot per entity, plus an index from cell to
+# the entities on it, so thousands of entities stay small and cheap to look up.
+from array import array
+from .grid_index import KEY, CHEST, ENEMY, DOOR, BUTTON
+from .levels import ELEMENTS
+
+# The kind of an entity is its grid flag; level files list them under these names
+KIND_FLAGS = {'keys': KEY, 'chests': CHEST, 'monsters': ENEMY, 'doors': DOOR, 'buttons': BUTTON}
+
+def get_sword_type(element):
+    # The sword a chest of this element holds
+    return f"{element}_sword"
+
+class EntityStore:
+    __slots__ = ('width', 'kinds', 'xs', 'ys', 'elements', 'alive', 'cells', 'counts', 'version')
+
+    def __init__(self, width):
+        self.width = width  # Of the level, for the cell index
+        self.kinds = array('B')  # Grid flag of each entity
+        self.xs = array('i')
+        self.ys = array('i')
+        self.elements = array('B')  # Index into levels.ELEMENTS
+        self.alive = bytearray()  # 0 once collected, opened or defeated
+        self.cells = {}  # Cell index -> ids of the living entities on it
+        self.counts = dict.fromkeys(KIND_FLAGS.values(), 0)  # Living entities per kind
+        self.version = 0  # Bumped on every change, lets drawing code cache what it found
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def add(self, kind, x, y, element):
+        """Add an entity and return its id"""
+        entity = len(self.kinds)
+        self.kinds.append(kind)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.elements.append(ELEMENTS.index(element))
+        self.alive.append(1)
+        self.cells.setdefault(y * self.width + x, []).append(entity)
+        self.counts[kind] += 1
+        self.version += 1
+        return entity
+
+    def remove(self, entity):
+        if not self.alive[entity]:
+            return
+        self.alive[entity] = 0
+        self.counts[self.kinds[entity]] -= 1
+        self.unlink(entity)
+        self.version += 1
+
+    def unlink(self, entity):
+        # Take an entity out of the cell index
+        index = self.ys[entity] * self.width + self.xs[entity]
+        on_cell = self.cells[index]
+        on_cell.remove(entity)
+        if not on_cell:
+            del self.cells[index]
+
+    def move(self, entity, x, y):
+        self.unlink(entity)
+        self.xs[entity] = x
+        self.ys[entity] = y
+        self.cells.setdefault(y * self.width + x, []).append(entity)
+        self.version += 1
+
+    def at(self, x, y, kind=None):
+        """Ids of the living entities on a cell, only of one kind if given"""
+        on_cell = self.cells.get(y * self.width + x, ())
+        if kind is None:
+            return list(on_cell)
+        return [entity for entity in on_cell if self.kinds[entity] == kind]
+
+    def has(self, x, y, kind):
+        return any(self.kinds[entity] == kind for entity in self.cells.get(y * self.width + x, ()))
+
+    def of_kind(self, kind):
+        """Ids of the living entities of a kind, in the order they were added"""
+        kinds = self.kinds
+        alive = self.alive
+        return [entity for entity in range(len(kinds)) if kinds[entity] == kind and alive[entity]]
+
+    def first(self, kind):
+        # The living entity of a kind that was added first, None if none is left
+        if not self.counts[kind]:
+            return None
+        kinds = self.kinds
+        alive = self.alive
+        for entity in range(len(kinds)):
+            if kinds[entity] == kind and alive[entity]:
+                return entity
+        return None
+
+    def count(self, kind):
+        return self.counts[kind]
+
+    def get_position(self, entity):
+        return self.xs[entity], self.ys[entity]
+
+    def get_element(self, entity):
+        return ELEMENTS[self.elements[entity]]
+
+    def in_area(self, x0, y0, x1, y1):
+        """Ids of the living entities in a range of cells (end exclusive)"""
+        if (x1 - x0) * (y1 - y0) < len(self.cells):
+            # Small area (the view): look its cells up
+            found = []
+            width = self.width
+            for y in range(y0, y1):
+                for x in range(x0, x1):
+                    on_cell = self.cells.get(y * width + x)
+                    if on_cell:
+                        found.extend(on_cell)
+            return found
+        xs = self.xs
+        ys = self.ys
+        return [entity for on_cell in self.cells.values() for entity in on_cell
+                if x0 <= xs[entity] < x1 and y0 <= ys[entity] < y1]
@@ -0,0 +1,21 @@
+# Native file dialog in a process of its own. Tk has to run on the main thread
+# of the process that created it (on macOS the only thread allowed to open
+# windows), which in the game is busy with pygame; here it has the process to
+# itself. Prints the chosen path, an empty line if the dialog was cancelled.
+# Usage: python -m src.file_dialog [title]
+import sys
+
+def ask_for_file(title="Select Character Image", filetypes=(("PNG files", "*.png"),)):
+    # The dialog gets its own Tk root, which is destroyed once a file was picked
+    import tkinter as tk
+    from tkinter import filedialog
+
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        return filedialog.askopenfilename(title=title, filetypes=list(filetypes))
+    finally:
+        root.destroy()
+
+if __name__ == '__main__':
+    print(ask_for_file(*sys.argv[1:2]))
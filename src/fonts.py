@@ -0,0 +1,30 @@
+import pygame
+from .constants import CELL_SIZE
+
+# (name, size, bold) of every font the game uses, by role
+FONTS = {
+    'game': ('segoeuisymbol', CELL_SIZE, False),
+    'title': ('Arial', 48, True),
+    'message': ('Arial', 24, False),
+    'controls': ('Arial', 20, False),
+    'button': ('Arial', 24, False),
+    'profiler': ('Arial', 16, False),
+}
+
+# SysFont has to look the name up in the system fonts, so each font is only
+# created once and shared by everything that draws with it
+_font_cache = {}
+
+def get_font(name, size, bold=False):
+    key = (name, size, bold)
+    font = _font_cache.get(key)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.SysFont(name, size, bold=bold)
+        _font_cache[key] = font
+    return font
+
+def font(role):
+    """Get the shared font for a role from FONTS"""
+    return get_font(*FONTS[role])
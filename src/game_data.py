@@ -80,6 +80,13 @@ def get_monster_info(level):
     """Get monster information for a specific level"""
     return MONSTERS.get(level, None)
 
+def get_monster_by_type(monster_type):
+    """Get monster information by element type (e.g. 'fire')"""
+    for monster in MONSTERS.values():
+        if monster['type'] == monster_type:
+            return monster
+    return None
+
 def get_sword_info(sword_type):
     """Get sword information by type"""
     return SWORDS.get(sword_type, None)
@@ -0,0 +1,45 @@
+from collections import deque
+
+class FixedTimestep:
+    # Turns real elapsed time into a whole number of fixed-length logic ticks
+    def __init__(self, tick_ms, max_ticks_per_frame=5):
+        self.tick_ms = tick_ms
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.accumulator = 0
+        self.ticks = 0
+
+    def add_time(self, elapsed_ms):
+        self.accumulator += elapsed_ms
+
+    def consume_ticks(self):
+        """Return how many logic ticks are due and take them out of the accumulator"""
+        due = self.accumulator // self.tick_ms
+        if due > self.max_ticks_per_frame:
+            # Too far behind to catch up; drop the backlog instead of spiralling
+            due = self.max_ticks_per_frame
+            self.accumulator = 0
+        else:
+            self.accumulator -= due * self.tick_ms
+        self.ticks += due
+        return due
+
+    def now(self):
+        """Logical time in milliseconds, only moves forward on logic ticks"""
+        return self.ticks * self.tick_ms
+
+class InputQueue:
+    # Key presses waiting to be applied, one per logic tick
+    def __init__(self):
+        self.actions = deque()
+
+    def push(self, action):
+        self.actions.append(action)
+
+    def pop(self):
+        return self.actions.popleft() if self.actions else None
+
+    def clear(self):
+        self.actions.clear()
+
+    def __len__(self):
+        return len(self.actions)
@@ -1,52 +1,74 @@
+import random
 import time
-import pygame
-from .constants import GRID_SIZE, MESSAGE_DURATION
-from .utils import get_random_position, get_door_position
+from .constants import MESSAGE_DURATION, MESSAGE_LINE_CHARS, HUNTING_MONSTERS, KEY_W, KEY_S, KEY_A, KEY_D
+from .distance_field import DistanceField
+from .grid_index import GridIndex, WALL, KEY, CHEST, ENEMY, DOOR, BUTTON
+from .entities import EntityStore, KIND_FLAGS
+from .levels import get_default_pack
+
+def get_ticks():
+    # Milliseconds from a monotonic clock, like pygame.time.get_ticks()
+    return int(time.monotonic() * 1000)
+
+def wrap_message(message, width=MESSAGE_LINE_CHARS):
+    """Split a message into the lines of the message banner"""
+    if len(message) <= width:
+        return [message]
+
+    # Words go on the first line while they fit, everything else on the second
+    first_line = []
+    second_line = []
+    total_len = 0
+    for word in message.split():
+        if total_len + len(word) < width:
+            first_line.append(word)
+            total_len += len(word) + 1
+        else:
+            second_line.append(word)
+    return [' '.join(first_line), ' '.join(second_line)]
 
 class GameState:
-    def __init__(self):
+    def __init__(self, audio=None, time_source=get_ticks, level_pack=None, seed=None):
+        self.layout_id = 0  # Bumped whenever a new level layout is built
+        self.level_pack = level_pack or get_default_pack()
+        # Every random choice comes from this generator, so a seed and the
+        # actions of each tick are enough to play a session again
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        self.hunting_monsters = HUNTING_MONSTERS  # Monsters move towards the player
+        self.tick = 0  # Logic ticks simulated so far
         self.reset_game()
-        self.prev_keys = {pygame.K_w: False, pygame.K_s: False, pygame.K_a: False, pygame.K_d: False}
         self.message = ""
+        self.message_lines = []  # Wrapped once when the message is shown
         self.message_timer = 0
         self.message_start_time = 0
+        self.time_source = time_source  # Clock used for message timing
         self.custom_player_image = None  # Store custom player image
         self.volume = 0.2  # Changed from 1.0 to 0.2 (20%)
         self.key_mappings = {
-            'up': pygame.K_w,
-            'down': pygame.K_s,
-            'left': pygame.K_a,
-            'right': pygame.K_d
+            'up': KEY_W,
+            'down': KEY_S,
+            'left': KEY_A,
+            'right': KEY_D
         }
-        self.soundtrack = None
-        self.wall_active = True  # Track if the wall is present
-        self.button_pressed = False  # Track if button is pressed
-        self.prev_player_x = 0
-        self.prev_player_y = 4
-        self.button_x = 0  # Add button position state
-        self.button_y = 0
-        self.maze_walls = []  # List to store maze wall positions
-        self.initialize_sound()
-        
-    def initialize_sound(self):
-        try:
-            pygame.mixer.init()
-            self.soundtrack = pygame.mixer.Sound('assets/soundTrack.MP3')
-            self.soundtrack.set_volume(self.volume)
-            # Start playing with infinite loops (-1)
-            self.soundtrack.play(-1)
-        except Exception as e:
-            print(f"Error loading soundtrack: {e}")
+        self.audio = audio  # Soundtrack player, None when running headless
+        if self.audio:
+            self.audio.start(self.volume)
+
+    def set_audio(self, audio):
+        # Attach the soundtrack later, e.g. once the first frame is on screen
+        self.audio = audio
+        if self.audio:
+            self.audio.start(self.volume)
 
     def set_volume(self, volume):
         self.volume = max(0.0, min(1.0, volume))  # Clamp between 0 and 1
-        if self.soundtrack:
-            self.soundtrack.set_volume(self.volume)
+        if self.audio:
+            self.audio.set_volume(self.volume)
 
     def check_sound_status(self):
-        if self.soundtrack and not pygame.mixer.get_busy():
-            # If sound stopped, restart it
-            self.soundtrack.play(-1)
+        if self.audio:
+            self.audio.check_status()
 
     def remap_key(self, action, new_key):
         self.key_mappings[action] = new_key
@@ -54,175 +76,169 @@ class GameState:
     def get_key_for_action(self, action):
         return self.key_mappings.get(action)
 
+    def get_action_for_key(self, key):
+        for action, mapped_key in self.key_mappings.items():
+            if mapped_key == key:
+                return action
+        return None
+
     def set_custom_player_image(self, image):
         self.custom_player_image = image
 
     def reset_game(self):
         # Reset all game state variables
-        self.player_x = 0
-        self.player_y = 4
-        self.prev_player_x = 0
-        self.prev_player_y = 4
-        self.enemy_x = 8
-        self.enemy_y = 4
-        self.key_x = 2
-        self.key_y = 2
-        self.chest_x = 4
-        self.chest_y = 7
-        self.door_x = 9
-        self.door_y = 4
-        self.button_x = 0
-        self.button_y = 0
-        self.maze_walls = []  # Reset maze walls
         self.has_key = False
         self.chest_opened = False
-        self.has_grass_sword = False
-        self.has_fire_sword = False
-        self.has_water_sword = False
+        self.swords = set()  # Sword types the player holds, e.g. 'fire_sword'
         self.current_level = 1
         self.game_over = False
         self.victory = False
         self.game_started = False
-        self.wall_active = True
-        self.button_pressed = False
+        self.load_level(1)
         
         # Message system
         self.message = ""
+        self.message_lines = []
         self.message_time = 0
     
-    def next_level(self):
+    def next_level(self, left_side=None, variant=None):
+        """Advance to the next level; the variant (e.g. left_side picks 'left' or 'right') is random if not given"""
         self.current_level += 1
         # Clear inventory when changing levels
         self.has_key = False
         self.chest_opened = False
-        self.has_grass_sword = False
-        self.has_fire_sword = False
-        self.has_water_sword = False
-        self.wall_active = True
-        self.button_pressed = False
-        self.maze_walls = []  # Clear maze walls
-        
-        if self.current_level == 2:
-            # Level 2 setup - Fire level with wall and button
-            import random
-            wall_x = 5  # Center wall position
-            left_side = random.choice([True, False])  # Randomly choose left or right side
-            
-            if left_side:
-                self.player_x = 0  # Left side
-                self.enemy_x = 8   # Enemy on right side
-                self.key_x = 2     # Key on left side
-                self.chest_x = 7   # Chest on right side
-                self.button_x = 3  # Button on left side
-            else:
-                self.player_x = 9  # Right side
-                self.enemy_x = 1   # Enemy on left side
-                self.key_x = 7     # Key on right side
-                self.chest_x = 2   # Chest on left side
-                self.button_x = 7  # Button on right side
-            
-            self.player_y = 4  # Middle height
-            self.enemy_y = 4   # Middle height
-            self.key_y = 2
-            self.chest_y = 6
-            self.button_y = 8  # Button near bottom
-            self.door_x = 9 if left_side else 0  # Door opposite to player
-            self.door_y = 4
-        
-        elif self.current_level == 3:
-            # Level 3 setup - Water level with maze
-            # Player starts at bottom left (10,1)
-            self.player_x = 9  # 10-1 for 0-based
-            self.player_y = 0  # 1-1 for 0-based
-            
-            # Enemy position (2,9)
-            self.enemy_x = 1   # 2-1 for 0-based
-            self.enemy_y = 8   # 9-1 for 0-based
-            
-            # Key position (6,2)
-            self.key_x = 5    # 6-1 for 0-based
-            self.key_y = 1    # 2-1 for 0-based
-            
-            # Chest position (5,8)
-            self.chest_x = 4   # 5-1 for 0-based
-            self.chest_y = 7   # 8-1 for 0-based
-            
-            # No door on final level
-            self.door_x = -1
-            self.door_y = -1
-            
-            # Define maze walls based on provided coordinates (converted to 0-based grid)
-            self.maze_walls = []
-            
-            # 1,1 - 1,6
-            for y in range(0, 6):
-                self.maze_walls.append((0, y))  # x=0 for 1-1
-            
-            # 2,1 - 9,1
-            for x in range(1, 9):  # 2-1 to 9-1
-                self.maze_walls.append((x, 0))  # y=0 for 1-1
-            
-            # 8,1 - 8,8
-            for y in range(0, 8):
-                self.maze_walls.append((7, y))  # x=7 for 8-1
-            
-            # 9,1 - 9,8 (excluding 9,4)
-            for y in range(0, 8):
-                if y != 3:  # Skip 4th position
-                    self.maze_walls.append((8, y))  # x=8 for 9-1
-            
-            # 10,10 - 6,10
-            for x in range(9, 4, -1):  # 10-1 to 6-1
-                self.maze_walls.append((x, 9))  # y=9 for 10-1
-            
-            # 6,10 - 6,3
-            for y in range(9, 2, -1):  # 10-1 to 3-1
-                self.maze_walls.append((5, y))  # x=5 for 6-1
-            
-            # 6,3 - 2,3
-            for x in range(5, 4, -1):  # Stop before 5 (5,3)
-                self.maze_walls.append((x, 2))  # y=2 for 3-1
-            for x in range(2, 0, -1):  # Start after 5 (5,3)
-                self.maze_walls.append((x, 2))  # y=2 for 3-1
-            
-            # 2,4 - 5,4
-            for x in range(1, 4):  # Stop at 4 (5-1) to skip position 5,4
-                self.maze_walls.append((x, 3))  # y=3 for 4-1
-            
-            # 5,4 - 4,10
-            for y in range(5, 8):  # Start from 6-1 and stop before 9 to skip 4,9
-                self.maze_walls.append((3, y))  # x=3 for 4-1
-            self.maze_walls.append((3, 9))  # Add back the wall at 4,10
-            
-            # 4,10 - 1,10
-            for x in range(3, -1, -1):  # 4-1 to 1-1
-                self.maze_walls.append((x, 9))  # y=9 for 10-1
-            
-            # 1,6 - 3,6
-            for x in range(0, 3):  # 1-1 to 3-1
-                self.maze_walls.append((x, 5))  # y=5 for 6-1
-            
-            # 3,6 - 3,8
-            for y in range(5, 8):  # 6-1 to 8-1
-                self.maze_walls.append((2, y))  # x=2 for 3-1
-            
-            # 3,8 - 1,8
-            for x in range(2, -1, -1):  # 3-1 to 1-1
-                self.maze_walls.append((x, 7))  # y=7 for 8-1
+        self.swords = set()
         
+        if variant is None and left_side is not None:
+            variant = 'left' if left_side else 'right'
+        if variant is None:
+            variant = self.rng.choice(self.level_pack.get_variants(self.current_level))
+        self.load_level(self.current_level, variant)
         self.message = ""
+        self.message_lines = []
         self.message_time = 0
     
+    def is_final_level(self):
+        return not self.level_pack.has_level(self.current_level + 1)
+    
+    def load_level(self, number, variant=None):
+        # Everything about the layout comes from the compiled level
+        level = self.level_pack.get_level(number, variant)
+        self.level = level
+        self.current_level = number
+        self.grid_width = level.width  # Size of the level in cells
+        self.grid_height = level.height
+        self.element = level.element  # Default type of the monsters and swords of this level
+        self.player_x, self.player_y = level.player
+        self.prev_player_x, self.prev_player_y = level.player
+        self.entities = EntityStore(level.width)
+        for kind, flag in KIND_FLAGS.items():
+            for x, y, element in getattr(level, kind):
+                self.entities.add(flag, x, y, element)
+        self.wall_active = True
+        self.button_pressed = False
+        self.distance_field = None  # Built when a monster first hunts on this level
+        self.layout_id += 1
+        self.build_grid()
+    
+    def build_grid(self):
+        # Occupancy index of the level, kept in sync as entities are removed.
+        # Walls and buttons are copied in one go from the compiled level.
+        self.grid = GridIndex(self.grid_width, self.grid_height)
+        self.grid.load_cells(self.level.cells)
+        if self.wall_active:
+            for index in self.level.gate_cells:
+                self.grid.flags[index] |= WALL
+        entities = self.entities
+        for entity in range(len(entities)):
+            if entities.alive[entity] and entities.kinds[entity] != BUTTON:  # Button flags came with the cells
+                self.grid.add(entities.xs[entity], entities.ys[entity], entities.kinds[entity])
+
+    def remove_entity(self, entity):
+        # A key was collected, a chest opened or a monster defeated
+        x, y = self.entities.get_position(entity)
+        kind = self.entities.kinds[entity]
+        self.entities.remove(entity)
+        if not self.entities.has(x, y, kind):
+            self.grid.remove(x, y, kind)
+
+    def move_entity(self, entity, x, y):
+        old_x, old_y = self.entities.get_position(entity)
+        kind = self.entities.kinds[entity]
+        self.entities.move(entity, x, y)
+        if not self.entities.has(old_x, old_y, kind):
+            self.grid.remove(old_x, old_y, kind)
+        self.grid.add(x, y, kind)
+
+    def get_first_position(self, kind):
+        # Where the first remaining entity of a kind is, (-1, -1) if none is left
+        entity = self.entities.first(kind)
+        return self.entities.get_position(entity) if entity is not None else (-1, -1)
+
+    # Single entity view of the level, as before levels could hold any number of each
+    key_x = property(lambda self: self.get_first_position(KEY)[0])
+    key_y = property(lambda self: self.get_first_position(KEY)[1])
+    chest_x = property(lambda self: self.get_first_position(CHEST)[0])
+    chest_y = property(lambda self: self.get_first_position(CHEST)[1])
+    enemy_x = property(lambda self: self.get_first_position(ENEMY)[0])
+    enemy_y = property(lambda self: self.get_first_position(ENEMY)[1])
+    door_x = property(lambda self: self.get_first_position(DOOR)[0])
+    door_y = property(lambda self: self.get_first_position(DOOR)[1])
+    button_x = property(lambda self: self.get_first_position(BUTTON)[0])
+    button_y = property(lambda self: self.get_first_position(BUTTON)[1])
+
+    def has_sword(self, sword_type):
+        return sword_type in self.swords
+
+    def set_sword(self, sword_type, held):
+        if held:
+            self.swords.add(sword_type)
+        else:
+            self.swords.discard(sword_type)
+
+    has_grass_sword = property(lambda self: self.has_sword('grass_sword'),
+                               lambda self, held: self.set_sword('grass_sword', held))
+    has_fire_sword = property(lambda self: self.has_sword('fire_sword'),
+                              lambda self, held: self.set_sword('fire_sword', held))
+    has_water_sword = property(lambda self: self.has_sword('water_sword'),
+                               lambda self, held: self.set_sword('water_sword', held))
+    
+    def set_wall_active(self, active):
+        # Turn the gate (the level 2 center wall) on or off
+        self.wall_active = active
+        for index in self.level.gate_cells:
+            x, y = index % self.grid_width, index // self.grid_width
+            if active:
+                self.grid.add(x, y, WALL)
+            else:
+                self.grid.remove(x, y, WALL)
+        if self.distance_field:
+            if active:
+                self.distance_field.reset(self.player_x, self.player_y)
+            else:
+                self.distance_field.open_cells(
+                    (index % self.grid_width, index // self.grid_width) for index in self.level.gate_cells)
+
+    def get_distance_field(self):
+        """Distances to the player, shared by all monsters and updated as the player moves"""
+        if self.distance_field is None:
+            self.distance_field = DistanceField(self.grid)
+        if self.distance_field.target != (self.player_x, self.player_y):
+            self.distance_field.move_target(self.player_x, self.player_y)
+        return self.distance_field
+    
     def show_message(self, message):
         self.message = message
-        self.message_start_time = pygame.time.get_ticks()
+        self.message_lines = wrap_message(message)
+        self.message_start_time = self.time_source()
     
     def is_message_active(self):
         if self.message_timer > 0:
-            current_time = pygame.time.get_ticks()
+            current_time = self.time_source()
             if current_time - self.message_start_time >= self.message_timer:
                 self.message_timer = 0
                 self.message = ""
+                self.message_lines = []
                 return False
             return True
         return False 
\ No newline at end of file
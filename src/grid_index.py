@@ -0,0 +1,40 @@
+# Cell flags
+WALL = 1
+KEY = 2
+CHEST = 4
+ENEMY = 8
+DOOR = 16
+BUTTON = 32
+
+class GridIndex:
+    # One byte of flags per cell; which entities are on a cell is kept by EntityStore
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.flags = bytearray(width * height)
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def add(self, x, y, flag):
+        if not self.in_bounds(x, y):
+            return  # Entities parked off the map (e.g. no door on level 3)
+        self.flags[y * self.width + x] |= flag
+
+    def load_cells(self, cells):
+        """Copy the static flags (walls, buttons) of a compiled level in one go"""
+        self.flags[:] = cells
+
+    def remove(self, x, y, flag):
+        if not self.in_bounds(x, y):
+            return
+        self.flags[y * self.width + x] &= ~flag
+
+    def get_flags(self, x, y):
+        return self.flags[y * self.width + x]
+
+    def is_blocked(self, x, y):
+        """Check if a move onto the cell is not allowed"""
+        if not self.in_bounds(x, y):
+            return True
+        return self.flags[y * self.width + x] & WALL != 0
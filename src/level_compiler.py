@@ -0,0 +1,108 @@
+# Compiles the JSON level sources into the binary pack the game loads.
+# Usage: python -m src.level_compiler [source_dir] [pack_path]
+import sys
+import numpy as np
+from .constants import LEVEL_SOURCE_DIR, LEVEL_PACK_PATH
+from .grid_index import WALL, BUTTON
+from .levels import (
+    PACK_MAGIC, PACK_VERSION, PACK_HEADER, INDEX_ENTRY, LEVEL_HEADER, ENTITY,
+    ENTITY_KINDS, ELEMENTS, LEVEL_WALL_HINT, REACHABLE_CLOSED, REACHABLE_OPEN,
+    FLOOR_TILE, WALL_TILE, GATE_TILE, get_source_paths, load_source
+)
+from .pathfinding import bfs_distances
+
+def compile_level(source):
+    """Turn a level source (parsed JSON) into its binary record and a list of problems"""
+    width = source['width']
+    height = source['height']
+    tiles = source['tiles']
+    name = f"Level {source['level']} ({source.get('variant', 'default')})"
+    if len(tiles) != height or any(len(row) != width for row in tiles):
+        raise ValueError(f"{name}: tiles do not match {width}x{height}")
+    if source['element'] not in ELEMENTS:
+        raise ValueError(f"{name}: unknown element {source['element']!r}")
+
+    codes = np.frombuffer(''.join(tiles).encode('ascii'), dtype=np.uint8).reshape(height, width)
+    known = np.isin(codes, [ord(FLOOR_TILE), ord(WALL_TILE), ord(GATE_TILE)])
+    if not known.all():
+        y, x = np.argwhere(~known)[0]
+        raise ValueError(f"{name}: unknown tile {chr(codes[y, x])!r} at {x},{y}")
+    walls = codes == ord(WALL_TILE)
+    gate = codes == ord(GATE_TILE)
+
+    # Entities are [x, y] or [x, y, element]; the element defaults to the level's
+    entities = {kind: [(entry[0], entry[1], entry[2] if len(entry) > 2 else source['element'])
+                       for entry in source.get(kind, [])]
+                for kind in ENTITY_KINDS}
+    for kind, entities_of_kind in entities.items():
+        for x, y, element in entities_of_kind:
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"{name}: {kind} at {x},{y} is outside of the level")
+            if element not in ELEMENTS:
+                raise ValueError(f"{name}: {kind} at {x},{y} has unknown element {element!r}")
+
+    # Static cell flags: walls and buttons (gates are added while they are closed)
+    cells = np.where(walls, WALL, 0).astype(np.uint8)
+    for x, y, element in entities['buttons']:
+        cells[y, x] |= BUTTON
+    gate_cells = np.flatnonzero(gate).astype('<u4')
+
+    # Reachability from the player start with the gate closed and with it open
+    player = tuple(source['player'])
+    reachable_open = bfs_distances(walls, player) >= 0
+    reachable_closed = bfs_distances(walls | gate, player) >= 0
+    reachability = (reachable_closed * REACHABLE_CLOSED | reachable_open * REACHABLE_OPEN).astype(np.uint8)
+
+    problems = []
+    for kind in ENTITY_KINDS:
+        for x, y, element in entities[kind]:
+            if not reachable_open[y, x]:
+                problems.append(f"{name}: {kind} at {x},{y} can not be reached")
+
+    record = bytearray(LEVEL_HEADER.pack(
+        width, height, ELEMENTS.index(source['element']),
+        LEVEL_WALL_HINT if source.get('wall_hint') else 0, player[0], player[1],
+        *(len(entities[kind]) for kind in ENTITY_KINDS), len(gate_cells)))
+    for kind in ENTITY_KINDS:
+        for x, y, element in entities[kind]:
+            record += ENTITY.pack(x, y, ELEMENTS.index(element))
+    record += gate_cells.tobytes()
+    record += cells.tobytes()
+    record += reachability.tobytes()
+    return bytes(record), problems
+
+def compile_pack(sources):
+    """Compile level sources into the bytes of a pack, returns (pack, problems)"""
+    sources = sorted(sources, key=lambda source: (source['level'], source.get('variant', 'default')))
+    records = []
+    problems = []
+    for source in sources:
+        record, level_problems = compile_level(source)
+        records.append(record)
+        problems.extend(level_problems)
+
+    offset = PACK_HEADER.size + INDEX_ENTRY.size * len(sources)
+    pack = bytearray(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(sources)))
+    for source, record in zip(sources, records):
+        variant = source.get('variant', 'default').encode('ascii')
+        pack += INDEX_ENTRY.pack(source['level'], variant, offset, len(record))
+        offset += len(record)
+    for record in records:
+        pack += record
+    return bytes(pack), problems
+
+def main(args):
+    source_dir = args[0] if len(args) > 0 else LEVEL_SOURCE_DIR
+    pack_path = args[1] if len(args) > 1 else LEVEL_PACK_PATH
+
+    paths = get_source_paths(source_dir)
+    pack, problems = compile_pack([load_source(path) for path in paths])
+    for problem in problems:
+        print(f"Warning: {problem}")
+    with open(pack_path, 'wb') as f:
+        f.write(pack)
+    print(f"Compiled {len(paths)} levels into {pack_path} ({len(pack)} bytes)")
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,154 @@
+# Level files: JSON sources compiled into one binary pack that is read through mmap.
+# No pygame (or NumPy) in here, GameState loads its levels through this module;
+# the compiler lives in level_compiler.py.
+import json
+import mmap
+import os
+import struct
+from .constants import LEVEL_SOURCE_DIR, LEVEL_PACK_PATH
+from .game_data import MONSTERS
+
+PACK_MAGIC = b'BELP'
+PACK_VERSION = 3
+
+# Pack header, then one index entry per level
+PACK_HEADER = struct.Struct('<4sHH')  # magic, version, level count
+INDEX_ENTRY = struct.Struct('<H16sII')  # level number, variant, offset, size
+
+# Level record header: width, height, element, LEVEL_* flags, player x/y and the number of
+# keys, chests, monsters, doors, buttons and gate cells. It is followed by the
+# entities (x, y and element), the gate cell indices (uint32), the static cell
+# flags (one byte per cell) and the reachability map (one byte per cell).
+LEVEL_HEADER = struct.Struct('<HHBBhhIIIIII')
+ENTITY = struct.Struct('<hhB')
+ENTITY_KINDS = ('keys', 'chests', 'monsters', 'doors', 'buttons')
+
+# Monster/sword element of a level, stored as its index in here
+ELEMENTS = tuple(monster['type'] for monster in MONSTERS.values())
+
+# Level flags
+LEVEL_WALL_HINT = 1  # Walking into a wall tells the player they can't ("wall_hint" in the source)
+
+# Reachability bits: from the player start with the gate closed / open
+REACHABLE_CLOSED = 1
+REACHABLE_OPEN = 2
+
+# Tile characters of the source format
+FLOOR_TILE = '.'
+WALL_TILE = '#'
+GATE_TILE = 'G'  # Wall that is removed when a button is pressed
+
+class Level:
+    # One compiled level, a view onto the pack without copying the cell data.
+    # Each entity kind is a list of (x, y, element) tuples.
+    __slots__ = ('number', 'variant', 'width', 'height', 'element', 'wall_hint', 'player',
+                 'keys', 'chests', 'monsters', 'doors', 'buttons', 'gate_cells',
+                 'cells', 'reachability')
+
+    def __init__(self, number, variant, buffer, offset):
+        self.number = number
+        self.variant = variant
+        (self.width, self.height, element, flags, player_x, player_y,
+         *counts, gate_count) = LEVEL_HEADER.unpack_from(buffer, offset)
+        self.element = ELEMENTS[element]
+        self.wall_hint = bool(flags & LEVEL_WALL_HINT)
+        self.player = (player_x, player_y)
+        offset += LEVEL_HEADER.size
+        view = memoryview(buffer)
+
+        for kind, count in zip(ENTITY_KINDS, counts):
+            entities = []
+            for x, y, entity_element in ENTITY.iter_unpack(view[offset:offset + count * ENTITY.size]):
+                entities.append((x, y, ELEMENTS[entity_element]))
+            setattr(self, kind, entities)
+            offset += count * ENTITY.size
+
+        self.gate_cells = struct.unpack_from(f'<{gate_count}I', buffer, offset)
+        offset += gate_count * 4
+
+        cell_count = self.width * self.height
+        self.cells = view[offset:offset + cell_count]
+        self.reachability = view[offset + cell_count:offset + 2 * cell_count]
+
+    def is_reachable(self, x, y, gate_open=False):
+        """Check if a cell can be walked to from the player start"""
+        bit = REACHABLE_OPEN if gate_open else REACHABLE_CLOSED
+        return self.reachability[y * self.width + x] & bit != 0
+
+class LevelPack:
+    # All levels of a game, by number and variant
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, version, count = PACK_HEADER.unpack_from(buffer, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError("Not a level pack of a supported version")
+        self.entries = {}  # (number, variant) -> offset
+        self.variants = {}  # number -> variant names
+        for i in range(count):
+            number, variant, offset, size = INDEX_ENTRY.unpack_from(buffer, PACK_HEADER.size + i * INDEX_ENTRY.size)
+            variant = variant.rstrip(b'\0').decode('ascii')
+            self.entries[(number, variant)] = offset
+            self.variants.setdefault(number, []).append(variant)
+        self.levels = {}  # Parsed headers, only for levels that were loaded
+
+    @classmethod
+    def open(cls, path):
+        """Map a compiled pack file into memory"""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def get_variants(self, number):
+        return self.variants.get(number, [])
+
+    def has_level(self, number):
+        return number in self.variants
+
+    def get_level(self, number, variant=None):
+        if variant is None:
+            variant = self.variants[number][0]
+        key = (number, variant)
+        level = self.levels.get(key)
+        if level is None:
+            level = Level(number, variant, self.buffer, self.entries[key])
+            self.levels[key] = level
+        return level
+
+def load_source(path):
+    with open(path) as f:
+        return json.load(f)
+
+def get_source_paths(source_dir=LEVEL_SOURCE_DIR):
+    return sorted(os.path.join(source_dir, name) for name in os.listdir(source_dir) if name.endswith('.json'))
+
+def is_pack_stale(pack_path=LEVEL_PACK_PATH, source_dir=LEVEL_SOURCE_DIR):
+    if not os.path.exists(pack_path):
+        return True
+    if not os.path.isdir(source_dir):
+        return False
+    pack_time = os.path.getmtime(pack_path)
+    return any(os.path.getmtime(path) > pack_time for path in get_source_paths(source_dir))
+
+_default_pack = None
+
+def compile_default_pack(source_dir=LEVEL_SOURCE_DIR):
+    # Build the pack from the sources in memory, when the file is out of date.
+    # The game's own levels must be sound, so problems are errors here.
+    from .level_compiler import compile_pack
+    pack, problems = compile_pack([load_source(path) for path in get_source_paths(source_dir)])
+    if problems:
+        raise ValueError("Broken level sources:\n" + '\n'.join(problems))
+    return LevelPack(pack)
+
+def get_default_pack():
+    """The game's level pack, mapped once and shared by every GameState"""
+    global _default_pack
+    if _default_pack is None:
+        if is_pack_stale():
+            _default_pack = compile_default_pack()  # Sources were edited since the last compile
+        else:
+            try:
+                _default_pack = LevelPack.open(LEVEL_PACK_PATH)
+            except ValueError:
+                _default_pack = compile_default_pack()  # Compiled by an older version
+    return _default_pack
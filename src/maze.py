@@ -0,0 +1,114 @@
+# Seeded maze levels, generated and checked with NumPy so large mazes stay fast
+import numpy as np
+from .constants import LEVEL_SOURCE_DIR
+from .levels import LevelPack, get_source_paths, load_source
+from .pathfinding import bfs_distances
+
+def generate_maze_grid(width, height, rng):
+    """Return a (height, width) bool array of walls holding a perfect maze.
+
+    Uses the sidewinder algorithm, which works row by row and so can be done
+    for the whole grid at once. Maze cells sit on odd coordinates; with an
+    even width or height the last column or row stays wall.
+    """
+    cells_x = (width - 1) // 2
+    cells_y = (height - 1) // 2
+    if cells_x < 2 or cells_y < 2:
+        raise ValueError("A maze needs to be at least 5x5")
+
+    # Passages east of each cell and north of each cell
+    east = np.zeros((cells_y, cells_x), dtype=bool)
+    north = np.zeros((cells_y, cells_x), dtype=bool)
+
+    # The top row is one long corridor
+    east[0, :-1] = True
+
+    # Every other row is split into runs; each run carves north from one random cell
+    close = rng.random((cells_y - 1, cells_x)) < 0.5
+    close[:, -1] = True
+    east[1:] = ~close
+    run_start = np.ones_like(close)
+    run_start[:, 1:] = close[:, :-1]
+    run_ids = np.cumsum(run_start.ravel()) - 1
+    # Random member of each run: the one holding the largest random number
+    picks = rng.random(run_ids.size)
+    run_max = np.maximum.reduceat(picks, np.flatnonzero(run_start.ravel()))
+    north[1:].ravel()[picks == run_max[run_ids]] = True
+
+    walls = np.ones((height, width), dtype=bool)
+    walls[1:2 * cells_y:2, 1:2 * cells_x:2] = False
+    walls[1:2 * cells_y:2, 2:2 * cells_x - 1:2] = ~east[:, :-1]
+    walls[2:2 * cells_y - 1:2, 1:2 * cells_x:2] = ~north[1:]
+    return walls
+
+def verify_order(walls, player, key, chest, monster):
+    """Check that the key and the chest can be reached without meeting the monster,
+    and that the monster can be reached afterwards"""
+    blocked = walls.copy()
+    blocked[monster[1], monster[0]] = True
+    reached = bfs_distances(blocked, player) >= 0
+    if not reached[key[1], key[0]] or not reached[chest[1], chest[0]]:
+        return False
+    # The monster can be reached if one of its neighbors can
+    height, width = walls.shape
+    x, y = monster
+    return any(0 <= nx < width and 0 <= ny < height and reached[ny, nx]
+               for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)))
+
+def place_entities(walls, rng, attempts=100):
+    # Player and monster anywhere; the key and the chest where the player can
+    # get to them without passing the monster
+    cell_ys, cell_xs = np.nonzero(~walls)
+    for _ in range(attempts):
+        player_i, monster_i = rng.choice(cell_xs.size, 2, replace=False)
+        player = (int(cell_xs[player_i]), int(cell_ys[player_i]))
+        monster = (int(cell_xs[monster_i]), int(cell_ys[monster_i]))
+
+        blocked = walls.copy()
+        blocked[monster[1], monster[0]] = True
+        reached = bfs_distances(blocked, player) > 0
+        candidate_ys, candidate_xs = np.nonzero(reached)
+        if candidate_xs.size < 2:
+            continue  # The monster cuts the player off, try another spot
+        key_i, chest_i = rng.choice(candidate_xs.size, 2, replace=False)
+        key = (int(candidate_xs[key_i]), int(candidate_ys[key_i]))
+        chest = (int(candidate_xs[chest_i]), int(candidate_ys[chest_i]))
+        if verify_order(walls, player, key, chest, monster):
+            return player, key, chest, monster
+    raise ValueError("Could not place the entities in a solvable order")
+
+def walls_to_tiles(walls):
+    # Rows of the level source format, '#' for walls and '.' for floor
+    codes = np.where(walls, ord('#'), ord('.')).astype(np.uint8)
+    width = walls.shape[1]
+    text = codes.tobytes().decode('ascii')
+    return [text[i:i + width] for i in range(0, len(text), width)]
+
+def generate_maze_level(width, height, seed, level=3, element='water'):
+    """Generate a maze level as a level source (see levels.py), same seed same level"""
+    rng = np.random.default_rng(seed)
+    walls = generate_maze_grid(width, height, rng)
+    player, key, chest, monster = place_entities(walls, rng)
+    return {
+        'level': level,
+        'variant': f'maze-{seed}',
+        'element': element,
+        'width': width,
+        'height': height,
+        'player': list(player),
+        'keys': [list(key)],
+        'chests': [list(chest)],
+        'monsters': [list(monster)],
+        'doors': [],
+        'buttons': [],
+        'tiles': walls_to_tiles(walls),
+    }
+
+def build_maze_pack(seed, width, height, level=3, source_dir=LEVEL_SOURCE_DIR):
+    """The game's levels with a generated maze in place of the given level,
+    for GameState(level_pack=...), and the problems the compiler found in them"""
+    from .level_compiler import compile_pack
+    sources = [source for source in map(load_source, get_source_paths(source_dir)) if source['level'] != level]
+    sources.append(generate_maze_level(width, height, seed, level))
+    pack, problems = compile_pack(sources)
+    return LevelPack(pack), problems
@@ -0,0 +1,33 @@
+# Distances over the occupancy grid, with NumPy
+import numpy as np
+
+def bfs_distances(walls, start):
+    """Steps from start to every cell (-1 where it can not be reached).
+
+    Only the frontier is expanded each round, so the cost follows the number
+    of open cells and not the size of the grid times the path length.
+    """
+    height, width = walls.shape
+    # A wall border around the grid saves the bounds checks on every step
+    padded_width = width + 2
+    open_cells = np.zeros((height + 2, padded_width), dtype=bool)
+    open_cells[1:-1, 1:-1] = ~walls
+    open_cells = open_cells.ravel()
+    distances = np.full(open_cells.size, -1, dtype=np.int32)
+    start_index = (start[1] + 1) * padded_width + start[0] + 1
+    distances[start_index] = 0
+    frontier = np.array([start_index], dtype=np.int64)
+    offsets = np.array([-1, 1, -padded_width, padded_width], dtype=np.int64)
+    owner = np.empty(open_cells.size, dtype=np.int64)
+    step = 0
+    while frontier.size:
+        step += 1
+        neighbors = (frontier[:, None] + offsets).ravel()
+        neighbors = neighbors[open_cells[neighbors] & (distances[neighbors] < 0)]
+        # Drop cells reached from two sides at once, without sorting
+        slots = np.arange(neighbors.size)
+        owner[neighbors] = slots
+        neighbors = neighbors[owner[neighbors] == slots]
+        distances[neighbors] = step
+        frontier = neighbors
+    return distances.reshape(height + 2, padded_width)[1:-1, 1:-1]
@@ -0,0 +1,175 @@
+# Per-phase frame timing and draw call counts, to see where frame time goes.
+# Only used when the game runs with --profile; F3 toggles the overlay.
+import csv
+import time
+from array import array
+import pygame
+from .constants import WINDOW_SIZE, WHITE, BLACK, PROFILER_FRAMES, PROFILER_OVERLAY_MS, PROFILE_CSV_PATH
+
+# Phases of a frame, in the order main.py runs them ('wait' is idle time)
+PHASES = ('events', 'assets', 'logic', 'draw', 'present', 'overlay', 'wait')
+COUNTERS = ('blits', 'rects', 'texts', 'surfaces')
+
+class FrameCounters:
+    # Draw calls of the frame in progress
+    __slots__ = COUNTERS
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.blits = 0
+        self.rects = 0
+        self.texts = 0
+        self.surfaces = 0
+
+# Shared by the hooks below and text_cache, which counts its font renders
+counters = FrameCounters()
+
+class CountingSurface:
+    # Stands in for the screen while profiling and counts what is blitted onto it
+    # (pygame's Surface methods can not be wrapped, the type is built in)
+    def __init__(self, surface):
+        self.surface = surface
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        counters.blits += 1
+        return self.surface.blit(source, dest, area, special_flags)
+
+    def __getattr__(self, name):
+        return getattr(self.surface, name)
+
+_draw_rect = pygame.draw.rect
+_Surface = pygame.Surface
+
+def count_rect(surface, *args, **kwargs):
+    counters.rects += 1
+    if isinstance(surface, CountingSurface):
+        surface = surface.surface
+    return _draw_rect(surface, *args, **kwargs)
+
+class CountedSurface(_Surface):
+    # pygame.Surface while profiling, counts every allocation
+    def __init__(self, *args, **kwargs):
+        counters.surfaces += 1
+        super().__init__(*args, **kwargs)
+
+def install_hooks():
+    """Count pygame.draw.rect calls and pygame.Surface allocations everywhere"""
+    pygame.draw.rect = count_rect
+    pygame.Surface = CountedSurface
+
+def remove_hooks():
+    pygame.draw.rect = _draw_rect
+    pygame.Surface = _Surface
+
+def percentile(values, percent):
+    # Nearest rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, len(ordered) * percent // 100)]
+
+class FrameProfiler:
+    # Keeps the last `capacity` frames in a ring buffer: nanoseconds per phase
+    # and the draw call counts, one typed array per column
+    def __init__(self, capacity=PROFILER_FRAMES):
+        self.capacity = capacity
+        self.phase_times = {phase: array('q', bytes(8 * capacity)) for phase in PHASES}
+        self.counts = {name: array('q', bytes(8 * capacity)) for name in COUNTERS}
+        self.frames = 0  # Frames recorded so far, only the last `capacity` are kept
+        self.current = dict.fromkeys(PHASES, 0)
+        self.last_mark = time.perf_counter_ns()
+        self.show_overlay = False
+        self.overlay = None  # Last overlay surface, rebuilt every PROFILER_OVERLAY_MS
+        self.overlay_time = 0
+
+    def mark(self, phase):
+        """End a phase: the time since the previous mark is added to it"""
+        now = time.perf_counter_ns()
+        self.current[phase] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        slot = self.frames % self.capacity
+        for phase in PHASES:
+            self.phase_times[phase][slot] = self.current[phase]
+            self.current[phase] = 0
+        for name in COUNTERS:
+            self.counts[name][slot] = getattr(counters, name)
+        counters.reset()
+        self.frames += 1
+
+    def get_slots(self):
+        # Ring buffer slots from the oldest to the newest frame
+        if self.frames <= self.capacity:
+            return range(self.frames)
+        start = self.frames % self.capacity
+        return [(start + i) % self.capacity for i in range(self.capacity)]
+
+    def get_frame_times(self, phases=PHASES):
+        """Nanoseconds of each recorded frame spent in the given phases"""
+        columns = [self.phase_times[phase] for phase in phases]
+        return [sum(column[slot] for column in columns) for slot in self.get_slots()]
+
+    def get_summary(self):
+        # Frame time includes waiting for the next frame, work time does not
+        frame_times = self.get_frame_times()
+        if not frame_times:
+            return None
+        work_times = self.get_frame_times(PHASES[:-1])
+        last = (self.frames - 1) % self.capacity
+        return {
+            'fps': len(frame_times) * 1e9 / max(1, sum(frame_times)),
+            'frame_p50': percentile(frame_times, 50) / 1e6,
+            'frame_p99': percentile(frame_times, 99) / 1e6,
+            'work_p50': percentile(work_times, 50) / 1e6,
+            'work_p99': percentile(work_times, 99) / 1e6,
+            **{name: self.counts[name][last] for name in COUNTERS},
+        }
+
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+        self.overlay = None
+
+    def draw_overlay(self, screen, font):
+        """Draw the stats box in the top right corner and return its rect"""
+        now = time.perf_counter_ns()
+        if self.overlay is None or now - self.overlay_time >= PROFILER_OVERLAY_MS * 1_000_000:
+            self.overlay = self.build_overlay(font)
+            self.overlay_time = now
+        rect = self.overlay.get_rect(topright=(WINDOW_SIZE - 10, 40))
+        screen.blit(self.overlay, rect)
+        return rect
+
+    def build_overlay(self, font):
+        summary = self.get_summary()
+        if summary is None:
+            lines = ["No frames yet"]
+        else:
+            lines = [
+                f"FPS {summary['fps']:.1f}",
+                f"frame p50 {summary['frame_p50']:.2f} p99 {summary['frame_p99']:.2f} ms",
+                f"work p50 {summary['work_p50']:.2f} p99 {summary['work_p99']:.2f} ms",
+                f"blits {summary['blits']} rects {summary['rects']} "
+                f"texts {summary['texts']} surfaces {summary['surfaces']}",
+            ]
+        # The numbers change on every refresh, so they skip the text cache
+        texts = [font.render(line, True, WHITE) for line in lines]
+        counters.texts += len(texts)
+        line_height = font.get_linesize()
+        surface = pygame.Surface((max(text.get_width() for text in texts) + 10, line_height * len(texts) + 10))
+        surface.fill(BLACK)
+        for i, text in enumerate(texts):
+            surface.blit(text, (5, 5 + i * line_height))
+        return surface
+
+    def write_csv(self, path=PROFILE_CSV_PATH):
+        """Write the recorded frames, oldest first: microseconds per phase and the counts"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', *(f'{phase}_us' for phase in PHASES), *COUNTERS])
+            first = self.frames - len(self.get_slots())
+            for i, slot in enumerate(self.get_slots()):
+                writer.writerow([first + i,
+                                 *(self.phase_times[phase][slot] // 1000 for phase in PHASES),
+                                 *(self.counts[name][slot] for name in COUNTERS)])
+        return path
@@ -0,0 +1,246 @@
+import pygame
+from .constants import CELL_SIZE, WINDOW_SIZE, INVENTORY_ICON_SIZE, WHITE, BLACK, YELLOW, GREEN, BLUE, ORANGE
+from .background import BackgroundLayer
+from .camera import Camera
+from .screens import layout_message, blit_message
+from .text_cache import render_text
+from .game_data import get_monster_by_type
+from .grid_index import KEY, CHEST, ENEMY, DOOR
+from .levels import ELEMENTS
+
+# Inventory slots start at (10, 10) and are 40 pixels apart
+INVENTORY_RECT = pygame.Rect(10, 10, 160, CELL_SIZE)
+LEVEL_LABEL_POS = (WINDOW_SIZE - 80, 10)
+
+# Color of the emoji drawn when an image of an element is missing
+ELEMENT_COLORS = {'grass': GREEN, 'fire': ORANGE, 'water': BLUE}
+
+# Entities drawn on top of the background, bottom first (buttons are part of the background)
+DRAW_ORDER = (CHEST, KEY, DOOR, ENEMY)
+ENTITY_IMAGES = {CHEST: 'chest', KEY: 'key', DOOR: 'door'}
+
+class GameRenderer:
+    # Draws the gameplay screen, either in full or only the regions that changed
+    def __init__(self, assets, game_font, controls_font, message_font):
+        self.assets = assets
+        self.game_font = game_font
+        self.controls_font = controls_font
+        self.message_font = message_font
+        self.background = BackgroundLayer(assets.image('floor'), assets.image('wall'), assets.image('button'))
+        self.camera = Camera(WINDOW_SIZE, WINDOW_SIZE)
+        self.message_lines = None
+        self.message_layout = None
+        self.prev_message_rect = None
+        self.prev_snapshot = None
+        self.prev_background = None
+        self.visible_entities = None  # (store, version, view cells, entities in view)
+
+    def invalidate(self):
+        # Force a full redraw on the next dirty frame (e.g. after a menu was shown)
+        self.prev_snapshot = None
+
+    def image(self, role):
+        return self.assets.image(role)
+
+    def icon(self, role):
+        # Pre-scaled inventory variant, never scaled while drawing
+        return self.assets.image(role, INVENTORY_ICON_SIZE)
+
+    def get_level_label(self, level):
+        return render_text(self.controls_font, f'Level {level}', BLACK)
+
+    def get_message_layout(self, lines):
+        # Lines are laid out once per message, not once per frame
+        if lines != self.message_lines:
+            self.message_lines = lines
+            self.message_layout = layout_message(lines, self.message_font) if lines else None
+        return self.message_layout
+
+    def get_message_rect(self, lines):
+        layout = self.get_message_layout(lines)
+        return layout[1] if layout else None
+
+    def cell_rect(self, x, y):
+        # Screen rect of a level cell
+        return self.camera.cell_rect(x, y)
+
+    def get_visible_entities(self, game_state):
+        # (draw order, x, y, element) of the entities in view, in drawing order;
+        # only looked up again when an entity changed or the view moved
+        entities = game_state.entities
+        view = self.camera.visible_cells(game_state.grid.width, game_state.grid.height)
+        cached = self.visible_entities
+        if cached and cached[0] is entities and cached[1] == entities.version and cached[2] == view:
+            return cached[3]
+        visible = []
+        for entity in entities.in_area(*view):
+            kind = entities.kinds[entity]
+            if kind in DRAW_ORDER:
+                visible.append((DRAW_ORDER.index(kind), entities.xs[entity], entities.ys[entity],
+                                entities.elements[entity]))
+        visible.sort()
+        visible = tuple(visible)
+        self.visible_entities = (entities, entities.version, view, visible)
+        return visible
+
+    def take_snapshot(self, game_state):
+        # Everything drawn on top of the background, keyed by what it occupies
+        player_img = game_state.custom_player_image if game_state.custom_player_image else self.image('player')
+        message = tuple(game_state.message_lines) if game_state.is_message_active() else ()
+        return {
+            'entities': self.get_visible_entities(game_state),
+            'player': (game_state.player_x, game_state.player_y, id(player_img)),
+            'inventory': (game_state.has_key, game_state.has_grass_sword,
+                          game_state.has_fire_sword, game_state.has_water_sword),
+            'level': game_state.current_level,
+            'message': message,
+            'camera': (self.camera.offset_x, self.camera.offset_y),
+        }
+
+    def get_item_rect(self, name, value):
+        if value is None:
+            return None
+        if name == 'inventory':
+            return INVENTORY_RECT
+        if name == 'level':
+            return self.get_level_label(value).get_rect(topleft=LEVEL_LABEL_POS)
+        return self.cell_rect(value[0], value[1])
+
+    def draw_scene(self, screen, game_state, snapshot, area=None):
+        # Draw the scene; when an area is given, parts outside of it are skipped
+        if area is None:
+            area = screen.get_rect()
+            if game_state.grid.width * CELL_SIZE < area.width or game_state.grid.height * CELL_SIZE < area.height:
+                screen.fill(WHITE)  # Level smaller than the window
+        self.background.draw(screen, game_state, self.camera, area)
+
+        def visible(rect):
+            return rect is not None and area.colliderect(rect)
+
+        # Draw chests, keys, doors and monsters that are still there
+        for order, x, y, element in snapshot['entities']:
+            rect = self.cell_rect(x, y)
+            if visible(rect):
+                kind = DRAW_ORDER[order]
+                if kind == ENEMY:
+                    self.draw_enemy(screen, ELEMENTS[element], rect.topleft)
+                else:
+                    screen.blit(self.image(ENTITY_IMAGES[kind]), rect)
+
+        # Draw player
+        if visible(self.cell_rect(game_state.player_x, game_state.player_y)):
+            player_img_to_use = game_state.custom_player_image if game_state.custom_player_image else self.image('player')
+            screen.blit(player_img_to_use, self.cell_rect(game_state.player_x, game_state.player_y))
+
+        if visible(INVENTORY_RECT):
+            self.draw_inventory(screen, game_state)
+
+        # Draw level number
+        level_text = self.get_level_label(game_state.current_level)
+        if visible(level_text.get_rect(topleft=LEVEL_LABEL_POS)):
+            screen.blit(level_text, LEVEL_LABEL_POS)
+
+        # Draw message if active
+        layout = self.get_message_layout(snapshot['message'])
+        if layout and visible(layout[1]):
+            blit_message(screen, *layout)
+
+    def draw_enemy(self, screen, element, pos):
+        # Each monster is drawn as the monster of its element
+        monster_img = self.image(f'{element}_monster')
+        if monster_img:
+            screen.blit(monster_img, pos)
+        else:
+            monster_info = get_monster_by_type(element)
+            enemy_text = render_text(self.game_font, monster_info['emoji_fallback'], ELEMENT_COLORS[element])
+            screen.blit(enemy_text, pos)
+
+    def draw_inventory(self, screen, game_state):
+        inventory_x = 10
+        if game_state.has_key:
+            icon = self.icon('key')
+            if icon:
+                screen.blit(icon, (inventory_x, 10))
+            else:
+                inventory_text = render_text(self.game_font, '🔑', YELLOW)
+                screen.blit(inventory_text, (inventory_x, 10))
+            inventory_x += 40
+
+        # Draw swords in inventory
+        if game_state.has_grass_sword:
+            icon = self.icon('grass_sword')
+            if icon:
+                screen.blit(icon, (inventory_x, 10))
+            else:
+                sword_text = render_text(self.game_font, '🌿', GREEN)
+                screen.blit(sword_text, (inventory_x, 10))
+            inventory_x += 40
+
+        if game_state.has_fire_sword:
+            icon = self.icon('fire_sword')
+            if icon:
+                screen.blit(icon, (inventory_x, 10))
+            else:
+                sword_text = render_text(self.game_font, '🔥', ORANGE)
+                screen.blit(sword_text, (inventory_x, 10))
+            inventory_x += 40
+
+        if game_state.has_water_sword:
+            icon = self.icon('water_sword')
+            if icon:
+                screen.blit(icon, (inventory_x, 10))
+            else:
+                sword_text = render_text(self.game_font, '💧', BLUE)
+                screen.blit(sword_text, (inventory_x, 10))
+
+    def follow_player(self, game_state):
+        self.camera.follow(game_state.player_x, game_state.player_y,
+                           game_state.grid.width, game_state.grid.height)
+
+    def draw(self, screen, game_state):
+        # Full redraw of the gameplay screen
+        self.follow_player(game_state)
+        snapshot = self.take_snapshot(game_state)
+        self.draw_scene(screen, game_state, snapshot)
+        self.prev_snapshot = snapshot
+        self.prev_background = self.background.signature
+        self.prev_message_rect = self.get_message_rect(snapshot['message'])
+        return [screen.get_rect()]
+
+    def draw_dirty(self, screen, game_state):
+        # Redraw only the regions that changed since the last frame and return them
+        self.follow_player(game_state)
+        if self.prev_snapshot is None or self.background.get_signature(game_state) != self.prev_background:
+            return self.draw(screen, game_state)
+
+        snapshot = self.take_snapshot(game_state)
+        if snapshot['camera'] != self.prev_snapshot['camera']:
+            # The whole level scrolled
+            return self.draw(screen, game_state)
+        dirty = []
+        for name, value in snapshot.items():
+            old_value = self.prev_snapshot[name]
+            if value == old_value:
+                continue
+            # Both where the item was and where it is now
+            if name == 'message':
+                rects = (self.prev_message_rect, self.get_message_rect(value))
+            elif name == 'entities':
+                # Only the cells whose entities changed
+                rects = [self.cell_rect(x, y) for order, x, y, element in set(value).symmetric_difference(old_value)]
+            else:
+                rects = (self.get_item_rect(name, old_value), self.get_item_rect(name, value))
+            for rect in rects:
+                if rect is not None and rect not in dirty:
+                    dirty.append(rect)
+
+        screen_rect = screen.get_rect()
+        dirty = [rect.clip(screen_rect) for rect in dirty]
+        for rect in dirty:
+            screen.set_clip(rect)
+            self.draw_scene(screen, game_state, snapshot, rect)
+        screen.set_clip(None)
+
+        self.prev_snapshot = snapshot
+        self.prev_message_rect = self.get_message_rect(snapshot['message'])
+        return dirty
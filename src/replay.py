@@ -0,0 +1,174 @@
+# Recorded sessions: the seed plus what happened on every logic tick, enough to
+# play a session again exactly. Replays run headless (no pygame) and unpaced.
+# Usage: python -m src.replay session.rec
+import struct
+import sys
+import time
+import zlib
+from .constants import LOGIC_TICK_MS, MONSTER_STEP_TICKS
+from .game_state import GameState
+from .levels import get_default_pack
+from .simulation import ACTIONS, step
+
+RECORDING_MAGIC = b'BERC'
+RECORDING_VERSION = 2
+
+# Header: magic, version, RNG seed, CRC-32 of the level pack, then the rule
+# settings the simulation depends on: RULE_* flags and MONSTER_STEP_TICKS
+RECORDING_HEADER = struct.Struct('<4sHQIBH')
+# Trailer: total logic ticks and the digest of the final state
+RECORDING_TRAILER = struct.Struct('<QI')
+
+# After the header the log is a list of (idle ticks, code) pairs: the number of
+# ticks without an action as a varint, then one byte. Codes below START are a
+# tick with that action (index into ACTIONS); the others are menu commands,
+# which take no tick.
+START = len(ACTIONS)  # Start button
+RESET = START + 1  # Try again button
+END = 255  # Only the idle ticks before the end of the recording follow
+
+COMMANDS = {'start': START, 'reset': RESET}
+
+# Rule flags of the header
+RULE_HUNTING_MONSTERS = 1
+
+def write_varint(data, value):
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+
+def read_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def get_pack_crc(level_pack):
+    return zlib.crc32(level_pack.buffer)
+
+def get_state_digest(game_state):
+    """CRC-32 of everything the rules decide, to check that a replay matched"""
+    entities = game_state.entities
+    state = (game_state.current_level, game_state.level.variant, game_state.player_x, game_state.player_y,
+             bytes(entities.alive), entities.xs.tobytes(), entities.ys.tobytes(),
+             game_state.has_key, game_state.chest_opened, sorted(game_state.swords), game_state.wall_active,
+             game_state.game_started, game_state.game_over, game_state.victory,
+             game_state.tick, game_state.rng.getstate())
+    return zlib.crc32(repr(state).encode())
+
+def apply_command(game_state, code):
+    # Same as the buttons in main.py
+    if code == START:
+        game_state.game_started = True
+    elif code == RESET:
+        game_state.reset_game()
+
+class Recorder:
+    # Collects the log while the game runs; main.py calls tick() for every
+    # logic tick and command() for the buttons that change the game
+    def __init__(self, game_state):
+        self.seed = game_state.seed
+        self.pack_crc = get_pack_crc(game_state.level_pack)
+        self.rules = RULE_HUNTING_MONSTERS if game_state.hunting_monsters else 0
+        self.log = bytearray()
+        self.idle = 0  # Ticks without an action since the last entry
+        self.ticks = 0
+
+    def add(self, code):
+        write_varint(self.log, self.idle)
+        self.log.append(code)
+        self.idle = 0
+
+    def tick(self, action):
+        self.ticks += 1
+        if action is None:
+            self.idle += 1
+        else:
+            self.add(ACTIONS.index(action))
+
+    def command(self, name):
+        self.add(COMMANDS[name])
+
+    def save(self, path, game_state):
+        data = bytearray(RECORDING_HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, self.seed, self.pack_crc,
+                                               self.rules, MONSTER_STEP_TICKS))
+        data += self.log
+        write_varint(data, self.idle)
+        data.append(END)
+        data += RECORDING_TRAILER.pack(self.ticks, get_state_digest(game_state))
+        with open(path, 'wb') as f:
+            f.write(data)
+        return len(data)
+
+class Recording:
+    # A recorded session read back from its file
+    def __init__(self, data):
+        (magic, version, self.seed, self.pack_crc,
+         self.rules, self.monster_step_ticks) = RECORDING_HEADER.unpack_from(data, 0)
+        if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+            raise ValueError("Not a recording of a supported version")
+        self.log = data[RECORDING_HEADER.size:-RECORDING_TRAILER.size]
+        self.ticks, self.digest = RECORDING_TRAILER.unpack_from(data, len(data) - RECORDING_TRAILER.size)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def entries(self):
+        """(idle ticks, code) pairs in order, ending with END"""
+        offset = 0
+        while offset < len(self.log):
+            idle, offset = read_varint(self.log, offset)
+            code = self.log[offset]
+            offset += 1
+            yield idle, code
+
+def replay(recording, level_pack=None):
+    """Play a recording again as fast as possible, returns the final GameState"""
+    level_pack = level_pack or get_default_pack()
+    if get_pack_crc(level_pack) != recording.pack_crc:
+        raise ValueError("The recording was made with different levels")
+    if recording.monster_step_ticks != MONSTER_STEP_TICKS:
+        raise ValueError(f"The recording was made with MONSTER_STEP_TICKS = {recording.monster_step_ticks}")
+    ticks = 0
+    game_state = GameState(time_source=lambda: ticks * LOGIC_TICK_MS, level_pack=level_pack, seed=recording.seed)
+    game_state.hunting_monsters = bool(recording.rules & RULE_HUNTING_MONSTERS)
+
+    for idle, code in recording.entries():
+        if not game_state.game_started or game_state.game_over:
+            ticks += idle  # Ticks on a menu change nothing but the clock
+        else:
+            for _ in range(idle):
+                ticks += 1
+                step(game_state)
+        if code < START:
+            ticks += 1
+            step(game_state, ACTIONS[code])
+        elif code != END:
+            apply_command(game_state, code)
+    if ticks != recording.ticks:
+        raise ValueError(f"Replayed {ticks} ticks, the recording has {recording.ticks}")
+    return game_state
+
+def main(args):
+    if not args:
+        print("Usage: python -m src.replay session.rec")
+        return 2
+    recording = Recording.load(args[0])
+    start = time.perf_counter()
+    game_state = replay(recording)
+    elapsed = time.perf_counter() - start
+    matched = get_state_digest(game_state) == recording.digest
+    print(f"Replayed {recording.ticks} ticks ({recording.ticks * LOGIC_TICK_MS / 1000:.0f} s of play) "
+          f"in {elapsed * 1000:.1f} ms, {recording.ticks / max(elapsed, 1e-9):,.0f} ticks/s")
+    print(f"Final state {'matches' if matched else 'DIFFERS FROM'} the recording")
+    return 0 if matched else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
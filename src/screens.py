@@ -1,30 +1,54 @@
 import pygame
 from .constants import (
-    WINDOW_SIZE, BLACK, WHITE, GREEN, RED, GRAY
+    WINDOW_SIZE, CELL_SIZE, BLACK, WHITE, GREEN, RED, GRAY
 )
+from .text_cache import render_text
+
+# Menus always cover exactly the window, whatever the size of the level
+WINDOW_CELLS = (WINDOW_SIZE + CELL_SIZE - 1) // CELL_SIZE
 
 def draw_floor_background(screen, floor_img):
     # Draw floor tiles as background
-    for x in range(10):
-        for y in range(10):
+    for x in range(WINDOW_CELLS):
+        for y in range(WINDOW_CELLS):
             if floor_img:
-                screen.blit(floor_img, (x * 50, y * 50))
+                screen.blit(floor_img, (x * CELL_SIZE, y * CELL_SIZE))
             else:
-                pygame.draw.rect(screen, WHITE, (x * 50, y * 50, 50, 50))
-                pygame.draw.rect(screen, GRAY, (x * 50, y * 50, 50, 50), 1)
+                pygame.draw.rect(screen, WHITE, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+                pygame.draw.rect(screen, GRAY, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE), 1)
+
+# Floor tiles with a semi-transparent overlay, built once per look
+_backdrop_cache = {}
+
+def get_backdrop(floor_img, overlay_color, alpha, outline_fallback=True):
+    key = (id(floor_img), overlay_color, alpha, outline_fallback)
+    backdrop = _backdrop_cache.get(key)
+    if backdrop is None:
+        backdrop = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+        backdrop.fill(WHITE)
+        if outline_fallback:
+            draw_floor_background(backdrop, floor_img)
+        else:
+            for x in range(WINDOW_CELLS):
+                for y in range(WINDOW_CELLS):
+                    if floor_img:
+                        backdrop.blit(floor_img, (x * CELL_SIZE, y * CELL_SIZE))
+                    else:
+                        pygame.draw.rect(backdrop, WHITE, (x * CELL_SIZE, y * CELL_SIZE, CELL_SIZE, CELL_SIZE))
+
+        overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
+        overlay.fill(overlay_color)
+        overlay.set_alpha(alpha)
+        backdrop.blit(overlay, (0, 0))
+        _backdrop_cache[key] = backdrop
+    return backdrop
 
 def draw_start_screen(screen, start_button, upload_button, options_button, title_font, controls_font, floor_img):
-    # Draw floor background
-    draw_floor_background(screen, floor_img)
-    
-    # Create semi-transparent overlay for better readability
-    overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
-    overlay.fill((255, 255, 255))
-    overlay.set_alpha(180)  # 70% opacity
-    screen.blit(overlay, (0, 0))
+    # Floor background with a semi-transparent overlay for better readability
+    screen.blit(get_backdrop(floor_img, (255, 255, 255), 180), (0, 0))  # 70% opacity
 
     # Draw title
-    title_text = title_font.render("The Bad Elementals", True, BLACK)
+    title_text = render_text(title_font, "The Bad Elementals", BLACK)
     title_rect = title_text.get_rect(center=(WINDOW_SIZE//2, WINDOW_SIZE//4))
     screen.blit(title_text, title_rect)
     
@@ -39,7 +63,7 @@ def draw_start_screen(screen, start_button, upload_button, options_button, title
     ]
     
     for i, text in enumerate(controls):
-        text_surface = controls_font.render(text, True, BLACK)
+        text_surface = render_text(controls_font, text, BLACK)
         text_rect = text_surface.get_rect(center=(WINDOW_SIZE // 2, WINDOW_SIZE // 3 + i * 30))
         screen.blit(text_surface, text_rect)
     
@@ -48,20 +72,15 @@ def draw_start_screen(screen, start_button, upload_button, options_button, title
     upload_button.draw(screen)
     options_button.draw(screen)
 
+def draw_loading_bar(screen, progress):
+    # Thin bar along the bottom of the window while images are still loading
+    bar_rect = pygame.Rect(0, WINDOW_SIZE - 6, WINDOW_SIZE, 6)
+    pygame.draw.rect(screen, GRAY, bar_rect)
+    pygame.draw.rect(screen, GREEN, (0, bar_rect.y, int(WINDOW_SIZE * progress), bar_rect.height))
+
 def draw_game_over_screen(screen, victory, try_again_button, exit_button, floor_img, title_font, message_font):
-    # Fill background with floor tiles
-    for x in range(10):
-        for y in range(10):
-            if floor_img:
-                screen.blit(floor_img, (x * 50, y * 50))
-            else:
-                pygame.draw.rect(screen, WHITE, (x * 50, y * 50, 50, 50))
-    
-    # Create semi-transparent overlay
-    overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
-    overlay.fill((0, 0, 0))
-    overlay.set_alpha(128)  # 50% transparency
-    screen.blit(overlay, (0, 0))
+    # Floor tiles with a semi-transparent overlay
+    screen.blit(get_backdrop(floor_img, (0, 0, 0), 128, outline_fallback=False), (0, 0))  # 50% transparency
     
     # Draw main text box
     box_width = 400
@@ -75,11 +94,11 @@ def draw_game_over_screen(screen, victory, try_again_button, exit_button, floor_
     
     # Draw title
     if victory:
-        title_text = title_font.render('Victory!', True, GREEN)
-        subtitle_text = message_font.render('You have defeated all elemental monsters!', True, BLACK)
+        title_text = render_text(title_font, 'Victory!', GREEN)
+        subtitle_text = render_text(message_font, 'You have defeated all elemental monsters!', BLACK)
     else:
-        title_text = title_font.render('Game Over', True, RED)
-        subtitle_text = message_font.render('Better luck next time!', True, BLACK)
+        title_text = render_text(title_font, 'Game Over', RED)
+        subtitle_text = render_text(message_font, 'Better luck next time!', BLACK)
     
     title_rect = title_text.get_rect(center=(WINDOW_SIZE // 2, box_y + 60))
     subtitle_rect = subtitle_text.get_rect(center=(WINDOW_SIZE // 2, box_y + 100))
@@ -97,71 +116,54 @@ def draw_game_over_screen(screen, victory, try_again_button, exit_button, floor_
     try_again_button.draw(screen)
     exit_button.draw(screen)
 
-def draw_message(screen, message, message_font):
-    if not message:
-        return
+def layout_message(lines, message_font):
+    # Returns the rendered lines with their positions and the banner rect;
+    # lines come already wrapped from GameState.show_message()
+    padding = 5
     
-    # Split long messages
-    if len(message) > 30:  # If message is too long
-        words = message.split()
-        first_line = []
-        second_line = []
-        total_len = 0
-        
-        for word in words:
-            if total_len + len(word) < 30:
-                first_line.append(word)
-                total_len += len(word) + 1
-            else:
-                second_line.append(word)
-        
-        first_line_text = ' '.join(first_line)
-        second_line_text = ' '.join(second_line)
-        
+    if len(lines) > 1:
         # Render both lines
-        line1_surface = message_font.render(first_line_text, True, BLACK)
-        line2_surface = message_font.render(second_line_text, True, BLACK)
+        line1_surface = render_text(message_font, lines[0], BLACK)
+        line2_surface = render_text(message_font, lines[1], BLACK)
         
         # Position both lines
         line1_rect = line1_surface.get_rect(center=(WINDOW_SIZE // 2, 15))
         line2_rect = line2_surface.get_rect(center=(WINDOW_SIZE // 2, 35))
         
-        # Draw background for both lines
-        padding = 5
+        # Background for both lines
         combined_rect = pygame.Rect(
             min(line1_rect.left, line2_rect.left) - padding,
             line1_rect.top - padding,
             max(line1_rect.width, line2_rect.width) + (padding * 2),
             (line2_rect.bottom - line1_rect.top) + (padding * 2)
         )
-        pygame.draw.rect(screen, WHITE, combined_rect)
-        pygame.draw.rect(screen, BLACK, combined_rect, 2)
-        
-        # Draw both lines
-        screen.blit(line1_surface, line1_rect)
-        screen.blit(line2_surface, line2_rect)
+        return [(line1_surface, line1_rect), (line2_surface, line2_rect)], combined_rect
     else:
         # Original single-line rendering
-        message_surface = message_font.render(message, True, BLACK)
+        message_surface = render_text(message_font, lines[0], BLACK)
         message_rect = message_surface.get_rect(center=(WINDOW_SIZE // 2, 20))
         
-        # Draw message background with smaller padding
-        padding = 5
+        # Message background with smaller padding
         bg_rect = message_rect.inflate(padding * 2, padding * 2)
-        pygame.draw.rect(screen, WHITE, bg_rect)
-        pygame.draw.rect(screen, BLACK, bg_rect, 2)
-        
-        screen.blit(message_surface, message_rect)
+        return [(message_surface, message_rect)], bg_rect
 
-def draw_options_screen(screen, back_button, volume_up_button, volume_down_button, key_buttons, title_font, message_font, volume, floor_img):
-    # Draw floor background
-    draw_floor_background(screen, floor_img)
+def blit_message(screen, lines, bg_rect):
+    pygame.draw.rect(screen, WHITE, bg_rect)
+    pygame.draw.rect(screen, BLACK, bg_rect, 2)
+    for surface, rect in lines:
+        screen.blit(surface, rect)
+
+def draw_message(screen, lines, message_font):
+    if not lines:
+        return None
     
-    # Create semi-transparent overlay for better readability
-    overlay = pygame.Surface((WINDOW_SIZE, WINDOW_SIZE))
-    overlay.fill((255, 255, 255))
-    overlay.set_alpha(180)  # 70% opacity
-    screen.blit(overlay, (0, 0))
+    lines, bg_rect = layout_message(lines, message_font)
+    blit_message(screen, lines, bg_rect)
+    return bg_rect
+
+def draw_options_screen(screen, back_button, volume_up_button, volume_down_button, key_buttons, title_font, message_font, volume, floor_img):
+    # Floor background with a semi-transparent overlay for better readability
+    screen.blit(get_backdrop(floor_img, (255, 255, 255), 180), (0, 0))  # 70% opacity
 
     # Draw options box
     box_width = 250
@@ -173,18 +175,18 @@ def draw_options_screen(screen, back_button, volume_up_button, volume_down_butto
     pygame.draw.rect(screen, BLACK, (box_x, box_y, box_width, box_height), 2)
 
     # Draw title
-    title_text = title_font.render("Options", True, BLACK)
+    title_text = render_text(title_font, "Options", BLACK)
     title_rect = title_text.get_rect(center=(WINDOW_SIZE // 2, box_y + 30))
     screen.blit(title_text, title_rect)
 
     # Draw volume section
-    volume_text = message_font.render("Volume", True, BLACK)
+    volume_text = render_text(message_font, "Volume", BLACK)
     volume_rect = volume_text.get_rect(center=(WINDOW_SIZE // 2, box_y + 80))
     screen.blit(volume_text, volume_rect)
 
     # Draw volume percentage
     volume_percent = int(volume * 100)
-    volume_percent_text = message_font.render(f"{volume_percent}%", True, BLACK)
+    volume_percent_text = render_text(message_font, f"{volume_percent}%", BLACK)
     volume_percent_rect = volume_percent_text.get_rect(center=(WINDOW_SIZE // 2, box_y + 110))
     screen.blit(volume_percent_text, volume_percent_rect)
 
@@ -206,7 +208,7 @@ def draw_options_screen(screen, back_button, volume_up_button, volume_down_butto
     volume_up_button.rect.y = bar_y - 7
 
     # Draw key mapping section
-    key_text = message_font.render("Key Bindings", True, BLACK)
+    key_text = render_text(message_font, "Key Bindings", BLACK)
     key_rect = key_text.get_rect(center=(WINDOW_SIZE // 2, box_y + 170))
     screen.blit(key_text, key_rect)
 
@@ -0,0 +1,233 @@
+# Game server: many independent sessions in one process, each one a GameState
+# advanced by the inputs of its connection. Runs the rules only (no pygame).
+# Usage: python -m src.server [--host HOST] [--port PORT] [--hunting] [--seed N]
+#
+# Protocol, over TCP. The client sends one byte per input: an action (index
+# into ACTIONS), START, RESET or WAIT (a tick without an action). The server
+# answers every input with one frame: a record count, then that many delta
+# records of what changed. A new connection and a reset are answered with the
+# level and the player position.
+import argparse
+import asyncio
+import json
+import random
+import signal
+import struct
+import sys
+import time
+from .constants import SERVER_HOST, SERVER_PORT
+from .entities import get_sword_type
+from .game_state import GameState
+from .levels import ELEMENTS, get_default_pack
+from .replay import START, RESET
+from .simulation import ACTIONS, step
+
+WAIT = RESET + 1  # One tick without an action, lets hunting monsters move
+
+FRAME_HEADER = struct.Struct('<H')  # Number of records in the frame
+DELTA = struct.Struct('<BHHI')  # Code, x, y, value
+
+# Delta codes
+LEVEL = 0  # x: level number, y: variant index (see LevelPack.get_variants)
+PLAYER = 1  # Player moved to x, y
+KEY_TAKEN = 2
+CHEST_OPENED = 3
+SWORD = 4  # value: element index of the sword (into ELEMENTS)
+MONSTER_MOVED = 5  # value: entity id of the monster
+MONSTER_DEFEATED = 6
+WALL_REMOVED = 7  # The button at x, y was pressed
+DEFEAT = 8
+VICTORY = 9
+
+SWORD_ELEMENTS = {get_sword_type(element): index for index, element in enumerate(ELEMENTS)}
+
+# Event kind -> function giving (code, x, y, value). Events that change
+# nothing the client sees (blocked, chest_locked, door_locked) are not sent;
+# level_changed is sent as the level snapshot.
+EVENT_DELTAS = {
+    'moved': lambda data: (PLAYER, data[0], data[1], 0),
+    'enemy_moved': lambda data: (MONSTER_MOVED, data[1][0], data[1][1], data[0]),
+    'key_collected': lambda data: (KEY_TAKEN, data[0], data[1], 0),
+    'chest_opened': lambda data: (CHEST_OPENED, data[0], data[1], 0),
+    'sword_collected': lambda data: (SWORD, 0, 0, SWORD_ELEMENTS[data]),
+    'enemy_defeated': lambda data: (MONSTER_DEFEATED, data[0], data[1], 0),
+    'wall_removed': lambda data: (WALL_REMOVED, data[0], data[1], 0),
+    'player_defeated': lambda data: (DEFEAT, data[0], data[1], 0),
+    'victory': lambda data: (VICTORY, 0, 0, 0),
+}
+
+def get_level_deltas(game_state):
+    """Records that describe a freshly loaded level: which one, and the player"""
+    level = game_state.level
+    variant = game_state.level_pack.get_variants(level.number).index(level.variant)
+    return [(LEVEL, level.number, variant, 0), (PLAYER, game_state.player_x, game_state.player_y, 0)]
+
+def encode_frame(deltas, out):
+    out += FRAME_HEADER.pack(len(deltas))
+    for delta in deltas:
+        out += DELTA.pack(*delta)
+
+def decode_frames(buffer):
+    """Complete frames at the start of a buffer, as lists of delta tuples, and the bytes they took"""
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= FRAME_HEADER.size:
+        (count,) = FRAME_HEADER.unpack_from(buffer, offset)
+        end = offset + FRAME_HEADER.size + count * DELTA.size
+        if end > len(buffer):
+            break
+        frames.append([DELTA.unpack_from(buffer, record)
+                       for record in range(offset + FRAME_HEADER.size, end, DELTA.size)])
+        offset = end
+    return frames, offset
+
+class Session(asyncio.Protocol):
+    # One connection and its game
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.game_state = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        server = self.server
+        self.game_state = GameState(level_pack=server.level_pack, seed=server.rng.randrange(1 << 32))
+        self.game_state.hunting_monsters = server.hunting_monsters
+        server.sessions.add(self)
+        server.connections += 1
+        out = bytearray()
+        encode_frame(get_level_deltas(self.game_state), out)
+        transport.write(out)
+
+    def connection_lost(self, exc):
+        self.server.sessions.discard(self)
+
+    def data_received(self, data):
+        # Every input gets its frame; the frames of one read go out in one write
+        out = bytearray()
+        for code in data:
+            deltas = self.apply(code)
+            if deltas is None:
+                break  # Not a valid input
+            encode_frame(deltas, out)
+            self.server.inputs += 1
+        self.transport.write(out)
+        if deltas is None:
+            self.transport.close()
+
+    def apply(self, code):
+        game_state = self.game_state
+        if code < START or code == WAIT:
+            layout_id = game_state.layout_id
+            _, events = step(game_state, ACTIONS[code] if code < START else None)
+            deltas = [EVENT_DELTAS[kind](data) for kind, data in events if kind in EVENT_DELTAS]
+            if game_state.layout_id != layout_id:
+                deltas += get_level_deltas(game_state)
+            return deltas
+        if code == START:
+            game_state.game_started = True
+            return []
+        if code == RESET:
+            game_state.reset_game()
+            return get_level_deltas(game_state)
+        return None
+
+    # A client that stops reading is not read from either, so its unsent
+    # frames can not pile up
+    def pause_writing(self):
+        self.transport.pause_reading()
+
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+class GameServer:
+    def __init__(self, level_pack=None, hunting_monsters=False, seed=None):
+        self.level_pack = level_pack or get_default_pack()
+        self.hunting_monsters = hunting_monsters
+        self.rng = random.Random(seed)  # Seeds of the sessions
+        self.sessions = set()
+        self.connections = 0  # Sessions since the start
+        self.inputs = 0  # Inputs handled since the start
+        self.server = None
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT):
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(lambda: Session(self), host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    def close(self):
+        self.server.close()
+        for session in list(self.sessions):
+            session.transport.close()
+
+    def get_stats(self):
+        return {'sessions': len(self.sessions), 'connections': self.connections, 'inputs': self.inputs}
+
+class GameClient(asyncio.Protocol):
+    # Client stand-in: sends inputs and collects the frames the server answers with
+    def __init__(self):
+        self.transport = None
+        self.buffer = bytearray()
+        self.frames = asyncio.Queue()
+        self.closed = asyncio.get_running_loop().create_future()
+
+    @classmethod
+    async def connect(cls, host=SERVER_HOST, port=SERVER_PORT, *args):
+        """Connect a new client; args go to the constructor"""
+        _, client = await asyncio.get_running_loop().create_connection(lambda: cls(*args), host, port)
+        return client
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+    def data_received(self, data):
+        self.buffer += data
+        frames, used = decode_frames(self.buffer)
+        del self.buffer[:used]
+        for frame in frames:
+            self.on_frame(frame)
+
+    def on_frame(self, frame):
+        self.frames.put_nowait(frame)
+
+    def send(self, *codes):
+        self.transport.write(bytes(codes))
+
+    def close(self):
+        self.transport.close()
+
+async def serve(options):
+    server = GameServer(hunting_monsters=options.hunting, seed=options.seed)
+    host, port = await server.start(options.host, options.port)
+    print(f"Listening on {host}:{port}", flush=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    await stop.wait()
+    server.close()
+
+    # Last line of the output: what was handled and the CPU it took, as JSON
+    stats = server.get_stats()
+    stats['wall_s'] = time.perf_counter() - wall_start
+    stats['cpu_s'] = time.process_time() - cpu_start
+    print(json.dumps(stats), flush=True)
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Host game sessions over TCP")
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help="0 picks a free port")
+    parser.add_argument('--hunting', action='store_true', help="monsters chase the player")
+    parser.add_argument('--seed', type=int, help="seed of the session seeds")
+    asyncio.run(serve(parser.parse_args(args)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,225 @@
+# Game rules without any pygame dependency, so they can run headless
+from .game_data import MONSTERS, SWORDS, ITEMS
+from .constants import MONSTER_STEP_TICKS
+from .entities import get_sword_type
+from .grid_index import KEY, CHEST, ENEMY, DOOR, BUTTON
+from .levels import ELEMENTS
+
+# Actions understood by step(); None just re-checks the current cell
+ACTIONS = ('up', 'down', 'left', 'right')
+MOVES = {
+    'up': (0, -1),
+    'down': (0, 1),
+    'left': (-1, 0),
+    'right': (1, 0)
+}
+
+# What the player is told when meeting a monster without its sword
+ENEMY_HINTS = {
+    'grass': "You need the right sword!",
+    'fire': "Your grass sword is ineffective!",
+    'water': "Find the water sword!"
+}
+
+def compile_rules():
+    """Outcome and messages of every interaction, from MONSTERS, SWORDS and ITEMS.
+    Monster and chest rules are indexed by element (as stored in EntityStore),
+    so a handler does one lookup however many elements there are."""
+    monsters = {monster['type']: monster for monster in MONSTERS.values()}
+    monster_rules = []
+    chest_rules = []
+    for element in ELEMENTS:
+        monster = monsters[element]
+        hint = ENEMY_HINTS.get(element, ENEMY_HINTS['grass'])
+        monster_rules.append((monster['weakness'], f"{monster['description']}. {hint}", monster['defeat_message']))
+        sword_type = get_sword_type(element)
+        sword = SWORDS[sword_type]
+        chest_rules.append((sword_type, f"You got the {sword['name']}! {sword['description']}"))
+    key, chest, door = ITEMS['key'], ITEMS['chest'], ITEMS['door']
+    return {
+        # (weakness, message when the player loses, message when the monster is defeated)
+        'monsters': tuple(monster_rules),
+        'chests': tuple(chest_rules),  # (sword type, message)
+        'key': f"You found the {key['name']}! {key['description']}",
+        'chest_locked': f"You need a key to open the {chest['name']}!",
+        'door_locked': f"Defeat the monster before using the {door['name']}!",
+        'door_open': f"{door['name']} activated! {door['description']}",
+        'wall_hint': "You can't walk through walls!",
+        # Packs hold any number of levels and monsters, so the count is left out
+        'victory': "Good Job! You have defeated all the elemental monsters! GG!",
+    }
+
+RULES = compile_rules()
+
+def is_wall(game_state, x, y):
+    """Check if a cell is blocked by a wall on the current level"""
+    return game_state.grid.is_blocked(x, y)
+
+def move_player(game_state, action, events):
+    dx, dy = MOVES[action]
+    new_x = game_state.player_x + dx
+    new_y = game_state.player_y + dy
+    if not game_state.grid.in_bounds(new_x, new_y):
+        return
+
+    # Walls are checked before the move is applied
+    if is_wall(game_state, new_x, new_y):
+        if game_state.level.wall_hint:
+            game_state.show_message(RULES['wall_hint'])
+            game_state.message_timer = 1000
+        events.append(('blocked', (new_x, new_y)))
+        return
+
+    game_state.prev_player_x = game_state.player_x
+    game_state.prev_player_y = game_state.player_y
+    game_state.player_x = new_x
+    game_state.player_y = new_y
+    events.append(('moved', (new_x, new_y)))
+
+def check_key(game_state, events, key):
+    # Player collects a key
+    events.append(('key_collected', game_state.entities.get_position(key)))
+    game_state.remove_entity(key)
+    game_state.has_key = True
+    game_state.show_message(RULES['key'])
+    game_state.message_timer = 3000  # Set message display time to 3 seconds
+
+def check_chest(game_state, events, chest):
+    # Player tries to open a chest
+    position = game_state.entities.get_position(chest)
+    if not game_state.has_key:
+        game_state.show_message(RULES['chest_locked'])
+        game_state.message_timer = 2000  # Set message display time to 2 seconds
+        events.append(('chest_locked', position))
+    else:
+        game_state.chest_opened = True
+        game_state.remove_entity(chest)
+        # The chest holds the sword of its element
+        sword_type, message = RULES['chests'][game_state.entities.elements[chest]]
+        game_state.swords.add(sword_type)
+        game_state.show_message(message)
+        game_state.message_timer = 3000  # Set message display time to 3 seconds
+        events.append(('chest_opened', position))
+        events.append(('sword_collected', sword_type))
+
+def check_enemy(game_state, events, monster):
+    # Player and a monster meet
+    weakness, lose_message, defeat_message = RULES['monsters'][game_state.entities.elements[monster]]
+    position = game_state.entities.get_position(monster)
+
+    if weakness not in game_state.swords:
+        game_state.show_message(lose_message)
+        game_state.message_timer = 2000
+        game_state.game_over = True
+        game_state.victory = False
+        events.append(('player_defeated', position))
+        return
+
+    events.append(('enemy_defeated', position))
+    game_state.remove_entity(monster)
+    game_state.show_message(defeat_message)
+    game_state.message_timer = 2000
+    if game_state.is_final_level() and not game_state.entities.count(ENEMY):
+        win_game(game_state, events)
+
+def win_game(game_state, events):
+    game_state.show_message(RULES['victory'])
+    game_state.message_timer = 2000
+    game_state.game_over = True
+    game_state.victory = True
+    events.append(('victory', None))
+
+def check_door(game_state, events, door):
+    # Player reaches a door
+    if game_state.entities.count(ENEMY):  # Monsters still alive
+        game_state.show_message(RULES['door_locked'])
+        game_state.message_timer = 2000
+        events.append(('door_locked', game_state.entities.get_position(door)))
+    elif game_state.is_final_level():  # There is no next level, the door ends the game
+        win_game(game_state, events)
+    else:  # All monsters defeated
+        game_state.show_message(RULES['door_open'])
+        game_state.message_timer = 3000
+        game_state.next_level()
+        events.append(('level_changed', game_state.current_level))
+
+def check_button(game_state, events, button):
+    # Player is on a button, which removes the gate (the level 2 center wall)
+    if game_state.wall_active:
+        game_state.set_wall_active(False)
+        game_state.show_message("The wall disappears!")
+        game_state.message_timer = 2000
+        events.append(('wall_removed', game_state.entities.get_position(button)))
+
+# Handler of each entity kind, in the order the entities of one cell interact:
+# a key is picked up before the chest under it is tried
+HANDLERS = (
+    (KEY, check_key),
+    (CHEST, check_chest),
+    (ENEMY, check_enemy),
+    (DOOR, check_door),
+    (BUTTON, check_button),
+)
+
+def compile_cell_handler(flags):
+    """The interactions of a cell with these grid flags as one function, None if it has none"""
+    handlers = tuple((kind, handler) for kind, handler in HANDLERS if flags & kind)
+    if flags & DOOR:
+        # A door starts the next level, so a button under it is never pressed
+        handlers = tuple((kind, handler) for kind, handler in handlers if kind != BUTTON)
+    if not handlers:
+        return None
+
+    def interact(game_state, events, x, y):
+        entities = game_state.entities
+        layout_id = game_state.layout_id
+        for kind, handler in handlers:
+            for entity in entities.at(x, y, kind):
+                handler(game_state, events, entity)
+                # Stop once the game ended or the entities belong to a new level
+                if game_state.game_over or game_state.layout_id != layout_id:
+                    return
+    return interact
+
+# Every combination of cell flags, compiled once: stepping onto a cell is one
+# lookup and one call, whatever the cell holds
+CELL_HANDLERS = tuple(compile_cell_handler(flags) for flags in range(256))
+
+def move_monsters(game_state, events):
+    # Hunting monsters follow the distance field one step towards the player;
+    # walking into the player is the same fight as the player walking into them
+    if not game_state.entities.count(ENEMY) or game_state.tick % MONSTER_STEP_TICKS:
+        return
+    field = game_state.get_distance_field()
+    player = (game_state.player_x, game_state.player_y)
+    for monster in game_state.entities.of_kind(ENEMY):
+        next_cell = field.next_step(*game_state.entities.get_position(monster))
+        if next_cell is None:
+            continue
+        game_state.move_entity(monster, *next_cell)
+        events.append(('enemy_moved', (monster, next_cell)))
+        if next_cell == player:
+            check_enemy(game_state, events, monster)
+            if game_state.game_over:
+                return
+
+def step(game_state, action=None):
+    """Apply one action to the game state and return the state with the events it caused"""
+    events = []
+    if not game_state.game_started or game_state.game_over:
+        return game_state, events
+    game_state.tick += 1
+    layout_id = game_state.layout_id
+
+    if action is not None:
+        move_player(game_state, action, events)
+
+    # One lookup of the player's cell gives everything it interacts with
+    x, y = game_state.player_x, game_state.player_y
+    interact = CELL_HANDLERS[game_state.grid.get_flags(x, y)]
+    if interact:
+        interact(game_state, events, x, y)
+
+    if game_state.hunting_monsters and not game_state.game_over and game_state.layout_id == layout_id:
+        move_monsters(game_state, events)
+    return game_state, events
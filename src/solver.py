@@ -0,0 +1,385 @@
+# Finds the fewest moves that finish a level, by breadth first search over
+# every (player cell, inventory) state, and reports levels that can not be
+# finished. Plain Python over a bytearray of states, so it needs no NumPy and
+# handles mazes of 512x512 and more. Monsters are taken to stand still.
+# Usage: python -m src.solver [pack_path] [--maze SIZE] [--seeds N] [--no-softlocks]
+import argparse
+import sys
+import time
+from .entities import get_sword_type
+from .grid_index import WALL
+from .levels import ELEMENTS, LevelPack, get_default_pack
+from .simulation import ACTIONS, RULES
+
+# A state is flags * cells + cell, over the level with a wall border around it
+# (so moves need no bounds checks). The flags hold one bit each for the key,
+# every sword type a chest holds, the gate being open and every monster being
+# defeated; they are only ever set, so states never lead back to fewer flags.
+HAS_KEY = 1
+MAX_STATES = 1 << 28  # Larger searches are refused, the visited array is a byte per state
+
+# Cell codes: bit 0 floor, bit 1 gate (open only once the gate bit is set),
+# bit 2 entities to enter
+FLOOR = 1
+GATE = 2
+ENTITIES = 4
+
+# Visited byte of a state: how it was reached (low 3 bits: action index + 1,
+# or START) and which of its cell's gain bits entering it set (high 5 bits),
+# enough to step back to the previous state without storing it
+START = 7
+MAX_GAINS = 5
+
+# Entering a cell ends the game or finishes the level instead of giving a state
+DEAD = -1
+FINISHED = -2
+
+class SolveResult:
+    # Outcome of a search; moves is None when the level can not be finished
+    def __init__(self, level, moves, states, unreachable, softlocked, elapsed):
+        self.level = level
+        self.moves = moves
+        self.states = states  # States reached from the start
+        self.unreachable = unreachable  # (kind, x, y) of entities the player never gets onto
+        self.softlocked = softlocked  # Reached states the level can not be finished from, None if not checked
+        self.elapsed = elapsed
+
+    @property
+    def solvable(self):
+        return self.moves is not None
+
+    def describe(self):
+        name = f"Level {self.level.number} ({self.level.variant})"
+        if self.solvable:
+            text = f"{name}: {len(self.moves)} moves"
+        else:
+            text = f"{name}: CAN NOT BE FINISHED"
+        text += f", {self.states:,} states in {self.elapsed * 1000:.0f} ms"
+        if self.unreachable:
+            text += "; never reached: " + ', '.join(f"{kind} at {x},{y}" for kind, x, y in self.unreachable)
+        if self.softlocked:
+            text += f"; {self.softlocked:,} softlocked states"
+        return text
+
+class LevelSolver:
+    def __init__(self, level, final=False):
+        self.level = level
+        self.final = final  # Defeating the last monster wins, instead of a door finishing the level
+        width = level.width
+        self.padded_width = padded_width = width + 2
+        self.cell_count = cell_count = (level.height + 2) * padded_width
+        self.offsets = (-padded_width, padded_width, -1, 1)  # In the order of ACTIONS
+
+        self.cells = cells = bytearray(cell_count)
+        open_codes = bytes(0 if flags & WALL else FLOOR for flags in range(256))
+        for y in range(level.height):
+            row = (y + 1) * padded_width + 1
+            cells[row:row + width] = bytes(level.cells[y * width:(y + 1) * width]).translate(open_codes)
+        for index in level.gate_cells:
+            cells[self.get_index(index % width, index // width)] = GATE
+
+        # Flag bits: key, one per sword type found in chests, gate, monsters
+        next_bit = HAS_KEY << 1
+        self.sword_bits = {}
+        for x, y, element in level.chests:
+            sword_type = get_sword_type(element)
+            if sword_type not in self.sword_bits:
+                self.sword_bits[sword_type] = next_bit
+                next_bit <<= 1
+        self.gate_bit = 0
+        if level.gate_cells:
+            self.gate_bit = next_bit
+            next_bit <<= 1
+        self.monster_bits = 0
+        self.cell_rules = {}  # Cell -> [key, sword bits, monsters (bit, weakness bit), door, button]
+        for kind in ('keys', 'chests', 'monsters', 'doors', 'buttons'):
+            for x, y, element in getattr(level, kind):
+                if not (0 <= x < width and 0 <= y < level.height):
+                    continue  # Parked off the map
+                index = self.get_index(x, y)
+                if cells[index]:
+                    cells[index] |= ENTITIES  # One on a wall is never entered
+                rule = self.cell_rules.setdefault(index, [False, 0, [], False, False])
+                if kind == 'keys':
+                    rule[0] = True
+                elif kind == 'chests':
+                    rule[1] |= self.sword_bits[get_sword_type(element)]
+                elif kind == 'monsters':
+                    weakness = RULES['monsters'][ELEMENTS.index(element)][0]
+                    rule[2].append((next_bit, self.sword_bits.get(weakness, 0)))
+                    self.monster_bits |= next_bit
+                    next_bit <<= 1
+                elif kind == 'doors':
+                    rule[3] = True
+                else:
+                    rule[4] = True
+        self.flag_count = next_bit
+        if self.flag_count * cell_count > MAX_STATES:
+            raise ValueError(f"Level {level.number} ({level.variant}) has too many states to search "
+                             f"({self.flag_count} inventories x {cell_count} cells)")
+
+        # The bits entering each cell with entities can set, in a fixed order
+        self.gain_bits = {}
+        for index, (key, swords, monsters, door, button) in self.cell_rules.items():
+            bits = [HAS_KEY] if key else []
+            bits += [bit for bit in self.sword_bits.values() if swords & bit]
+            bits += [self.gate_bit] if button and not door else []
+            bits += [bit for bit, weakness in monsters]
+            if len(bits) > MAX_GAINS:
+                raise ValueError(f"Too many entities on cell {self.get_position(index)}")
+            self.gain_bits[index] = bits
+
+    def get_index(self, x, y):
+        return (y + 1) * self.padded_width + x + 1
+
+    def get_position(self, index):
+        return index % self.padded_width - 1, index // self.padded_width - 1
+
+    def enter(self, index, flags):
+        """Flags after entering a cell with entities, DEAD or FINISHED (same order as simulation.step)"""
+        key, swords, monsters, door, button = self.cell_rules[index]
+        if key:
+            flags |= HAS_KEY
+        if swords and flags & HAS_KEY:
+            flags |= swords
+        for bit, weakness in monsters:
+            if not flags & bit:
+                if not flags & weakness:
+                    return DEAD
+                flags |= bit
+                if self.final and flags & self.monster_bits == self.monster_bits:
+                    return FINISHED
+        if door:
+            if flags & self.monster_bits == self.monster_bits:
+                return FINISHED
+        elif button:
+            flags |= self.gate_bit
+        return flags
+
+    def is_open(self, index, flags):
+        cell = self.cells[index]
+        return cell & FLOOR or cell & GATE and flags & self.gate_bit
+
+    def solve(self, check_softlocks=True):
+        """Search every state reachable from the start; the first move found
+        that finishes the level ends a shortest solution"""
+        start_time = time.perf_counter()
+        level = self.level
+        cell_count = self.cell_count
+        cells = self.cells
+        gate_bit = self.gate_bit
+        moves = tuple((offset, action + 1) for action, offset in enumerate(self.offsets))
+        visited = bytearray(self.flag_count * cell_count)
+        finish = None  # (state, action) of the first move that finishes the level
+        entered = set()  # Cells with entities the player got onto, whatever happened there
+
+        # The start cell is checked on the first tick, before any move
+        start = self.get_index(*level.player)
+        flags = self.enter(start, 0) if start in self.cell_rules else 0
+        if flags == FINISHED:
+            return SolveResult(level, [], 1, [], 0, time.perf_counter() - start_time)
+        frontier = []
+        if flags != DEAD:
+            entered.add(start)
+            visited[flags * cell_count + start] = START
+            frontier.append(flags * cell_count + start)
+        while frontier:
+            next_frontier = []
+            append = next_frontier.append
+            for state in frontier:
+                index = state % cell_count
+                for offset, code in moves:
+                    cell = cells[index + offset]
+                    if cell == FLOOR:
+                        # Plain floor, the inventory stays the same
+                        reached = state + offset
+                        if not visited[reached]:
+                            visited[reached] = code
+                            append(reached)
+                        continue
+                    if not cell:
+                        continue
+                    flags = state // cell_count
+                    if cell & GATE and not flags & gate_bit:
+                        continue
+                    neighbor = index + offset
+                    if cell & ENTITIES:
+                        entered.add(neighbor)
+                        new_flags = self.enter(neighbor, flags)
+                        if new_flags < 0:
+                            if new_flags == FINISHED and finish is None:
+                                finish = (state, code - 1)
+                            continue
+                        gained = new_flags & ~flags
+                        for position, bit in enumerate(self.gain_bits[neighbor]):
+                            if gained & bit:
+                                code |= 8 << position
+                        reached = new_flags * cell_count + neighbor
+                    else:
+                        reached = state + offset
+                    if not visited[reached]:
+                        visited[reached] = code
+                        append(reached)
+            frontier = next_frontier
+
+        solution = None
+        softlocked = None
+        if finish:
+            solution = self.get_path(visited, finish[0]) + [ACTIONS[finish[1]]]
+            if check_softlocks:
+                softlocked = self.count_softlocked(visited)
+        states = len(visited) - visited.count(0)
+        return SolveResult(level, solution, states, self.get_unreachable(entered), softlocked,
+                           time.perf_counter() - start_time)
+
+    def get_path(self, visited, state):
+        # Actions from the start to a state, stepping back through the visited codes
+        cell_count = self.cell_count
+        actions = []
+        while True:
+            code = visited[state]
+            how = code & 7
+            if how == START:
+                break
+            flags, index = divmod(state, cell_count)
+            if code >> 3:
+                for position, bit in enumerate(self.gain_bits[index]):
+                    if code & 8 << position:
+                        flags &= ~bit
+            actions.append(ACTIONS[how - 1])
+            state = flags * cell_count + index - self.offsets[how - 1]
+        actions.reverse()
+        return actions
+
+    def get_unreachable(self, entered):
+        # Entities on cells the player never got onto
+        unreachable = []
+        for kind in ('keys', 'chests', 'monsters', 'doors', 'buttons'):
+            for x, y, element in getattr(self.level, kind):
+                if 0 <= x < self.level.width and 0 <= y < self.level.height and self.get_index(x, y) not in entered:
+                    unreachable.append((kind[:-1], x, y))
+        return unreachable
+
+    def count_softlocked(self, visited):
+        """Reached states from which no sequence of moves finishes the level.
+
+        Runs the search backwards over the reached states, starting from those
+        next to a cell whose entities can finish the level. Moves can be undone,
+        so a cell's neighbors are also the cells a move onto it comes from."""
+        cell_count = self.cell_count
+        can_finish = bytearray(len(visited))
+        queue = []
+        for index, (key, swords, monsters, door, button) in self.cell_rules.items():
+            if not door and not (monsters and self.final):
+                continue
+            for flags in range(self.flag_count):
+                if self.enter(index, flags) != FINISHED:
+                    continue
+                for offset in self.offsets:
+                    state = flags * cell_count + index + offset
+                    if visited[state] and not can_finish[state]:
+                        can_finish[state] = 1
+                        queue.append(state)
+
+        cells = self.cells
+        offsets = self.offsets
+        for state in queue:
+            flags, index = divmod(state, cell_count)
+            if cells[index] == FLOOR:
+                # Plain floor, the previous state had the same flags
+                for offset in offsets:
+                    previous = state + offset
+                    if visited[previous] and not can_finish[previous]:
+                        can_finish[previous] = 1
+                        queue.append(previous)
+                continue
+            # Flags the previous state could have had: entering this cell may have set some
+            candidates = [flags]
+            if index in self.cell_rules:
+                bits = [bit for bit in self.gain_bits[index] if flags & bit]
+                for subset in range(1, 1 << len(bits)):
+                    previous = flags
+                    for position, bit in enumerate(bits):
+                        if subset >> position & 1:
+                            previous &= ~bit
+                    candidates.append(previous)
+            for previous_flags in candidates:
+                if not self.is_open(index, previous_flags):
+                    continue
+                if index in self.cell_rules and self.enter(index, previous_flags) != flags:
+                    continue
+                for offset in self.offsets:
+                    previous = previous_flags * cell_count + index + offset
+                    if visited[previous] and not can_finish[previous]:
+                        can_finish[previous] = 1
+                        queue.append(previous)
+        return len(visited) - visited.count(0) - can_finish.count(1)
+
+def solve_level(level, final=False, check_softlocks=True):
+    return LevelSolver(level, final).solve(check_softlocks)
+
+def solve_game_state(game_state, check_softlocks=True):
+    """Solve the level a GameState is on, e.g. after reset_game() or next_level()"""
+    return solve_level(game_state.level, game_state.is_final_level(), check_softlocks)
+
+def check_moves(level_pack, level, moves):
+    """Play moves through simulation.step() on a fresh GameState; True if they finish the level"""
+    from .game_state import GameState
+    from .simulation import step
+    game_state = GameState(level_pack=level_pack, seed=0)
+    game_state.load_level(level.number, level.variant)
+    game_state.game_started = True
+    layout_id = game_state.layout_id
+    for action in [None] + moves:
+        step(game_state, action)
+        if game_state.game_over or game_state.layout_id != layout_id:
+            break
+    return game_state.victory or game_state.layout_id != layout_id and not game_state.game_over
+
+def validate_pack(level_pack, check_softlocks=True, verify=True):
+    """Solve every level of a pack, returns (results, problems)"""
+    results = []
+    problems = []
+    for number in sorted(level_pack.variants):
+        final = not level_pack.has_level(number + 1)
+        for variant in level_pack.get_variants(number):
+            level = level_pack.get_level(number, variant)
+            result = solve_level(level, final, check_softlocks)
+            results.append(result)
+            name = f"Level {number} ({variant})"
+            if not result.solvable:
+                problems.append(f"{name} can not be finished")
+            elif verify and not check_moves(level_pack, level, result.moves):
+                problems.append(f"{name}: the solution does not finish the level in the game")
+            if result.softlocked:
+                problems.append(f"{name} has {result.softlocked} softlocked states")
+    return results, problems
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Check that every level can be finished")
+    parser.add_argument('pack', nargs='?', help="compiled level pack, the game's levels by default")
+    parser.add_argument('--maze', type=int, metavar='SIZE', help="check generated SIZExSIZE mazes instead")
+    parser.add_argument('--seeds', type=int, default=1, help="number of mazes (seeds 0 to N-1)")
+    parser.add_argument('--no-softlocks', action='store_true', help="skip the softlock search")
+    options = parser.parse_args(args)
+
+    if options.maze:
+        from .maze import build_maze_pack
+        packs = [build_maze_pack(seed, options.maze, options.maze) for seed in range(options.seeds)]
+    else:
+        packs = [(LevelPack.open(options.pack) if options.pack else get_default_pack(), [])]
+
+    failed = False
+    for level_pack, compile_problems in packs:
+        results, problems = validate_pack(level_pack, not options.no_softlocks)
+        problems = compile_problems + problems
+        for result in results:
+            if not options.maze or result.level.variant.startswith('maze'):
+                print(result.describe())
+        for problem in problems:
+            print(f"Error: {problem}")
+        failed |= bool(problems)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,251 @@
+# Balance sweep: plays thousands of seeded games with the solver on every CPU
+# core and streams one row per level into a columnar results file.
+# Usage: python -m src.sweep [--seeds N] [--first SEED] [--source maze|game] [--size SIZE]
+#                            [--workers W] [--chunk C] [--output FILE]
+#        python -m src.sweep --summary FILE
+# 'game' plays the shipped levels, with the level 2 layout picked by the
+# GameState seed; 'maze' plays one generated SIZExSIZE maze per seed.
+import argparse
+import json
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from .constants import SWEEP_RESULTS_PATH
+from .game_state import GameState
+from .grid_index import WALL
+from .levels import LevelPack, get_default_pack
+from .simulation import step
+from .solver import solve_game_state
+
+# Columns of the results file: name and array typecode. Step columns are -1
+# when it did not happen.
+COLUMNS = (
+    ('seed', 'Q'),
+    ('level', 'B'),
+    ('variant', 'B'),  # Index into LevelPack.get_variants(level)
+    ('broken', 'B'),  # The level compiler reported problems, e.g. an unreachable key (a generator bug for mazes)
+    ('solved', 'B'),  # The solver found a way to finish the level
+    ('completed', 'B'),  # Playing the solution through simulation.step() finished it
+    ('moves', 'i'),  # Length of the shortest solution, -1 if there is none
+    ('dead_ends', 'I'),  # Open cells with a single open neighbor
+    ('to_key', 'i'),  # Moves into the solution when the key was collected
+    ('to_chest', 'i'),
+    ('to_monster', 'i'),  # ... when the first monster was defeated
+    ('states', 'I'),  # States the solver reached
+    ('solve_us', 'I'),
+)
+
+# File: magic, length of a JSON header naming the columns (and the variant
+# names of each level, when known), the header, then blocks of rows. A block
+# is its row count followed by each column in turn as a packed array, so rows
+# can be appended as they come in and every column is read without touching
+# the others.
+RESULTS_MAGIC = b'BESW'
+RESULTS_HEADER = struct.Struct('<4sI')
+BLOCK_HEADER = struct.Struct('<I')
+# NumPy type of each array typecode used in the columns
+DTYPES = {'B': '<u1', 'H': '<u2', 'I': '<u4', 'Q': '<u8', 'b': '<i1', 'h': '<i2', 'i': '<i4', 'q': '<i8'}
+
+class ResultsWriter:
+    def __init__(self, path, columns=COLUMNS, variants=None):
+        self.columns = columns
+        self.rows = 0
+        self.file = open(path, 'wb')
+        header = json.dumps({'columns': columns, 'variants': variants or {}}).encode()
+        self.file.write(RESULTS_HEADER.pack(RESULTS_MAGIC, len(header)) + header)
+
+    def write_block(self, block):
+        """Append rows given as a dict of column name -> array"""
+        count = len(block[self.columns[0][0]])
+        self.file.write(BLOCK_HEADER.pack(count))
+        for name, typecode in self.columns:
+            self.file.write(block[name].tobytes())
+        self.file.flush()
+        self.rows += count
+
+    def close(self):
+        self.file.close()
+
+def read_header(data, path):
+    magic, header_size = RESULTS_HEADER.unpack_from(data, 0)
+    if magic != RESULTS_MAGIC:
+        raise ValueError(f"{path} is not a sweep results file")
+    header = json.loads(data[RESULTS_HEADER.size:RESULTS_HEADER.size + header_size])
+    return header, RESULTS_HEADER.size + header_size
+
+def read_variants(path):
+    """Variant names of each level number of a results file, {} if it does not name them"""
+    with open(path, 'rb') as f:
+        data = f.read(RESULTS_HEADER.size)
+        data += f.read(RESULTS_HEADER.unpack_from(data, 0)[1])
+    header, _ = read_header(data, path)
+    return {int(number): names for number, names in header.get('variants', {}).items()}
+
+def read_results(path):
+    """Columns of a results file as NumPy arrays, by name"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    header, offset = read_header(data, path)
+    columns = header['columns']
+    parts = {name: [] for name, typecode in columns}
+    while offset < len(data):
+        (count,) = BLOCK_HEADER.unpack_from(data, offset)
+        offset += BLOCK_HEADER.size
+        for name, typecode in columns:
+            dtype = np.dtype(DTYPES[typecode])
+            parts[name].append(np.frombuffer(data, dtype, count, offset))
+            offset += count * dtype.itemsize
+    return {name: np.concatenate(parts[name]) if parts[name] else np.array([], DTYPES[typecode])
+            for name, typecode in columns}
+
+def count_dead_ends(level):
+    """Open cells with exactly one open neighbor (the gate counted as open)"""
+    open_cells = np.zeros((level.height + 2, level.width + 2), dtype=np.int8)
+    cells = np.frombuffer(level.cells, dtype=np.uint8).reshape(level.height, level.width)
+    open_cells[1:-1, 1:-1] = (cells & WALL) == 0
+    neighbors = (open_cells[:-2, 1:-1] + open_cells[2:, 1:-1] + open_cells[1:-1, :-2] + open_cells[1:-1, 2:])
+    return int(np.count_nonzero((open_cells[1:-1, 1:-1] == 1) & (neighbors == 1)))
+
+def play_level(game_state, row, broken=False):
+    """Solve the level a GameState is on and play the solution; fills row, returns
+    False when the game can not go on"""
+    level = game_state.level
+    result = solve_game_state(game_state, check_softlocks=False)
+    row['level'] = level.number
+    row['variant'] = game_state.level_pack.get_variants(level.number).index(level.variant)
+    row['broken'] = broken
+    row['solved'] = result.solvable
+    row['moves'] = len(result.moves) if result.solvable else -1
+    row['dead_ends'] = count_dead_ends(level)
+    row['states'] = result.states
+    row['solve_us'] = int(result.elapsed * 1e6)
+    row['to_key'] = row['to_chest'] = row['to_monster'] = -1
+    row['completed'] = False
+    if not result.solvable:
+        return False
+
+    # The first tick re-checks the start cell, like the game loop does
+    firsts = {'key_collected': 'to_key', 'chest_opened': 'to_chest', 'enemy_defeated': 'to_monster'}
+    layout_id = game_state.layout_id
+    for move, action in enumerate([None] + result.moves):
+        _, events = step(game_state, action)
+        for kind, data in events:
+            column = firsts.get(kind)
+            if column and row[column] < 0:
+                row[column] = move
+        if game_state.game_over or game_state.layout_id != layout_id:
+            break
+    row['completed'] = game_state.victory or game_state.layout_id != layout_id and not game_state.game_over
+    return row['completed'] and not game_state.game_over
+
+def build_maze_game(seed, size):
+    # A one level game on a generated maze, and the problems the compiler found in it
+    from .level_compiler import compile_pack
+    from .maze import generate_maze_level
+    pack, problems = compile_pack([generate_maze_level(size, size, seed, level=1)])
+    return GameState(level_pack=LevelPack(pack), seed=seed), problems
+
+def run_seeds(seeds, source, size):
+    """Rows of a range of seeds, as a dict of column arrays (runs in a worker process)"""
+    block = {name: array(typecode) for name, typecode in COLUMNS}
+    for seed in seeds:
+        if source == 'maze':
+            game_state, problems = build_maze_game(seed, size)
+        else:
+            game_state, problems = GameState(seed=seed), []  # The shipped levels are checked when they load
+        game_state.game_started = True
+        while True:
+            row = {'seed': seed}
+            going_on = play_level(game_state, row, bool(problems))
+            for name, typecode in COLUMNS:
+                block[name].append(int(row[name]))
+            if not going_on:
+                break
+    return block
+
+def sweep(seeds, source='game', size=21, workers=None, chunk=250, output=SWEEP_RESULTS_PATH):
+    """Run the seeds over a process pool, writing each finished chunk as a block; returns rows written"""
+    # Maze variants are named after their seed, so only the shipped levels have names worth keeping
+    variants = get_default_pack().variants if source == 'game' else None
+    writer = ResultsWriter(output, variants=variants)
+    start = time.perf_counter()
+    done = 0
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {executor.submit(run_seeds, seeds[i:i + chunk], source, size): len(seeds[i:i + chunk])
+                       for i in range(0, len(seeds), chunk)}
+            for future in as_completed(futures):
+                writer.write_block(future.result())
+                done += futures[future]
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{len(seeds)} seeds, {done / elapsed:,.0f} seeds/s", end='', file=sys.stderr)
+    finally:
+        writer.close()
+    print(file=sys.stderr)
+    return writer.rows
+
+def describe(values):
+    if not values.size:
+        return "-"
+    p50, p90 = np.percentile(values, (50, 90))
+    return f"mean {values.mean():.1f}, p50 {p50:.0f}, p90 {p90:.0f}, max {values.max()}"
+
+def summarize(columns, variants=None):
+    """Lines of aggregate statistics per level; variants gives the variant names
+    of each level number (see read_variants), else variants are shown by index.
+    Broken levels are counted apart, they say nothing about balance."""
+    variants = variants or {}
+    lines = [f"{np.unique(columns['seed']).size} seeds, {columns['seed'].size} levels played"]
+    broken = columns['broken'] == 1
+    if broken.any():
+        lines.append(f"{broken.sum()} levels left out: the compiler found problems in them (generator bugs), "
+                     f"first at seed {columns['seed'][broken].min()}")
+    for number in np.unique(columns['level']):
+        rows = (columns['level'] == number) & ~broken
+        if not rows.any():
+            continue
+        solved = rows & (columns['solved'] == 1)
+        lines.append(f"Level {number}: {rows.sum()} played, {solved.sum() / rows.sum():.1%} solvable, "
+                     f"{(rows & (columns['completed'] == 1)).sum() / rows.sum():.1%} completed")
+        indices, counts = np.unique(columns['variant'][rows], return_counts=True)
+        if indices.size > 1:
+            names = variants.get(int(number), [])
+            lines.append("  variants: " + ', '.join(f"{names[index] if index < len(names) else index}: {count}"
+                                                    for index, count in zip(indices, counts)))
+        lines.append(f"  moves: {describe(columns['moves'][solved])}")
+        lines.append(f"  dead ends: {describe(columns['dead_ends'][rows])}")
+        for name in ('to_key', 'to_chest', 'to_monster'):
+            happened = solved & (columns[name] >= 0)
+            lines.append(f"  {name.replace('_', ' ')}: {describe(columns[name][happened])}")
+        lines.append(f"  solver: {describe(columns['states'][rows])} states, "
+                     f"{columns['solve_us'][rows].mean() / 1000:.2f} ms mean")
+    return lines
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Play many seeded games and collect balance statistics")
+    parser.add_argument('--seeds', type=int, default=1000, help="number of seeds")
+    parser.add_argument('--first', type=int, default=0, help="first seed")
+    parser.add_argument('--source', choices=('game', 'maze'), default='game')
+    parser.add_argument('--size', type=int, default=21, help="maze width and height")
+    parser.add_argument('--workers', type=int, help="processes, all cores by default")
+    parser.add_argument('--chunk', type=int, default=250, help="seeds per task")
+    parser.add_argument('--output', default=SWEEP_RESULTS_PATH)
+    parser.add_argument('--summary', metavar='FILE', help="only print the statistics of a results file")
+    options = parser.parse_args(args)
+
+    if not options.summary:
+        start = time.perf_counter()
+        seeds = range(options.first, options.first + options.seeds)
+        rows = sweep(seeds, options.source, options.size, options.workers, options.chunk, options.output)
+        print(f"{rows} rows from {options.seeds} seeds in {time.perf_counter() - start:.1f} s, "
+              f"written to {options.output}")
+    path = options.summary or options.output
+    for line in summarize(read_results(path), read_variants(path)):
+        print(line)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,23 @@
+from collections import OrderedDict
+from .constants import MAX_CACHED_TEXTS
+from .profiler import counters
+
+# Rendered text keyed by (font, text, color, antialias), least recently used first
+_text_cache = OrderedDict()
+
+def render_text(font, text, color, antialias=True):
+    """Render text once and reuse the surface until it falls out of the cache"""
+    key = (font, text, color, antialias)
+    surface = _text_cache.get(key)
+    if surface is None:
+        surface = font.render(text, antialias, color)
+        counters.texts += 1
+        _text_cache[key] = surface
+        if len(_text_cache) > MAX_CACHED_TEXTS:
+            _text_cache.popitem(last=False)
+    else:
+        _text_cache.move_to_end(key)
+    return surface
+
+def clear_text_cache():
+    _text_cache.clear()
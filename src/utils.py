@@ -1,15 +1,5 @@
-import os
-import pygame
 import random
-from .constants import CELL_SIZE, GRID_SIZE
-
-def load_image(name, size=(CELL_SIZE, CELL_SIZE)):
-    try:
-        image = pygame.image.load(os.path.join('assets', name))
-        return pygame.transform.scale(image, size)
-    except:
-        print(f"Error loading image: {name}")
-        return None
+from .constants import GRID_SIZE
 
 def get_random_position():
     while True:
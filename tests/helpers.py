@@ -0,0 +1,26 @@
+# Small level packs built in memory for the tests
+from src.levels import ELEMENTS
+from src.level_compiler import compile_pack
+from src.levels import LevelPack
+
+def make_source(level, tiles, player, element='grass', variant='default', **entities):
+    """A level source; entities are lists of [x, y] or [x, y, element] by kind"""
+    return dict(level=level, variant=variant, width=len(tiles[0]), height=len(tiles), element=element,
+                tiles=tiles, player=player, **entities)
+
+def make_pack(*sources, allow_problems=False):
+    pack, problems = compile_pack(sources)
+    assert allow_problems or not problems, problems
+    return LevelPack(pack)
+
+def random_source(rng, number, variant='default', max_size=5):
+    """A small random level (walls, gate and entities of every kind and
+    element, several can share a cell); it may well be impossible to finish"""
+    width, height = rng.randint(2, max_size), rng.randint(1, max_size - 1)
+    tiles = [''.join(rng.choice('....#G') for _ in range(width)) for _ in range(height)]
+    player = [rng.randrange(width), rng.randrange(height)]
+    tiles[player[1]] = tiles[player[1]][:player[0]] + '.' + tiles[player[1]][player[0] + 1:]
+    entities = {kind: [[rng.randrange(width), rng.randrange(height), rng.choice(ELEMENTS)]
+                       for _ in range(rng.randint(0, most))]
+                for kind, most in (('keys', 2), ('chests', 4), ('monsters', 4), ('doors', 2), ('buttons', 2))}
+    return make_source(number, tiles, player, rng.choice(ELEMENTS), variant, **entities)
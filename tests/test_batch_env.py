@@ -0,0 +1,85 @@
+import random
+import numpy as np
+from src.batch_env import BatchEnv, ACTION_NAMES
+from src.game_state import GameState
+from src.grid_index import ENEMY
+from src.levels import ELEMENTS, get_default_pack
+from src.simulation import step
+from .helpers import make_pack, make_source, random_source
+
+def random_pack(rng):
+    # Up to three levels of different sizes, some with two variants
+    sources = [random_source(rng, number, variant)
+               for number in range(1, rng.randint(1, 3) + 1)
+               for variant in rng.choice((['default'], ['left', 'right']))]
+    return make_pack(*sources, allow_problems=True)
+
+def get_observation(game_state):
+    observation = {
+        'player_x': game_state.player_x,
+        'player_y': game_state.player_y,
+        'current_level': game_state.current_level,
+        'has_key': game_state.has_key,
+        'monsters_left': game_state.entities.count(ENEMY),
+        'wall_active': game_state.wall_active,
+        'done': game_state.game_over,
+        'victory': game_state.victory,
+    }
+    for element in ELEMENTS:
+        observation[f'has_{element}_sword'] = game_state.has_sword(f'{element}_sword')
+    return observation
+
+def check_parity(level_pack, num_envs, steps, seed, auto_reset=False):
+    # Every game of the batch against a GameState given the same actions; the
+    # variant a door leads to is random in both, so the GameState follows the batch
+    env = BatchEnv(num_envs, seed=seed, auto_reset=auto_reset, level_pack=level_pack)
+    games = []
+    for i in range(num_envs):
+        game_state = GameState(level_pack=level_pack, seed=i)
+        game_state.hunting_monsters = False
+        game_state.game_started = True
+        games.append(game_state)
+    rng = np.random.default_rng(seed)
+    finished = 0
+    for _ in range(steps):
+        actions = rng.integers(0, 5, num_envs)
+        observations, rewards, dones = env.step(actions)
+        for i, game_state in enumerate(games):
+            if game_state.game_over and auto_reset:
+                # Restarted at level 1, and the action is ignored
+                game_state.reset_game()
+                game_state.game_started = True
+                reward = 0.0
+            else:
+                was_over = game_state.game_over
+                layout_id = game_state.layout_id
+                step(game_state, ACTION_NAMES[actions[i]])
+                if game_state.layout_id != layout_id:
+                    game_state.load_level(*env.layouts['names'][env.layout[i]])
+                reward = 0.0 if was_over or not game_state.game_over else 1.0 if game_state.victory else -1.0
+            expected = get_observation(game_state)
+            assert {name: observations[name][i] for name in expected} == expected
+            assert (rewards[i], dones[i]) == (reward, game_state.game_over)
+            finished += reward != 0
+    return finished
+
+def test_default_pack_matches_simulation():
+    assert check_parity(get_default_pack(), 32, 300, seed=0) > 0
+
+def test_random_packs_match_simulation():
+    rng = random.Random(0)
+    for seed in range(60):
+        check_parity(random_pack(rng), 8, 40, seed)
+
+def test_auto_reset_matches_simulation():
+    # Games finished before the last step were restarted and played on
+    assert check_parity(get_default_pack(), 32, 300, seed=1, auto_reset=True) > 0
+    rng = random.Random(1)
+    for seed in range(30):
+        check_parity(random_pack(rng), 8, 40, seed, auto_reset=True)
+
+def test_door_on_final_level_wins():
+    env = BatchEnv(1, level_pack=make_pack(make_source(1, ['...'], [0, 0], doors=[[2, 0]])))
+    env.step([env.encode_actions(['right'])[0]])
+    observations, rewards, dones = env.step(env.encode_actions(['right']))
+    assert dones[0] and observations['victory'][0] and rewards[0] == 1.0
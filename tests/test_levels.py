@@ -0,0 +1,25 @@
+import json
+import pytest
+from src.levels import compile_default_pack
+from src.maze import build_maze_pack
+from .helpers import make_source
+
+def test_shipped_levels_compile():
+    level_pack = compile_default_pack()
+    assert sorted(level_pack.variants) == [1, 2, 3]
+
+def test_broken_level_source_is_an_error(tmp_path):
+    # The key is walled off from the player
+    source = make_source(1, ['..#.'], [0, 0], keys=[[3, 0]])
+    (tmp_path / 'level1.json').write_text(json.dumps(source))
+    with pytest.raises(ValueError, match="keys at 3,0 can not be reached"):
+        compile_default_pack(str(tmp_path))
+
+def test_maze_pack_reports_problems(tmp_path):
+    level_pack, problems = build_maze_pack(0, 9, 9)
+    assert problems == [] and level_pack.get_variants(3) == ['maze-0']
+    # The other levels come from the sources, broken ones included
+    source = make_source(1, ['..#.'], [0, 0], keys=[[3, 0]])
+    (tmp_path / 'level1.json').write_text(json.dumps(source))
+    level_pack, problems = build_maze_pack(0, 9, 9, source_dir=str(tmp_path))
+    assert any("keys at 3,0 can not be reached" in problem for problem in problems)
@@ -0,0 +1,21 @@
+from src.game_state import GameState
+from src.replay import Recorder, Recording, get_state_digest, replay
+from src.simulation import step
+
+def test_replay_restores_hunting_monsters(tmp_path):
+    # Monsters that chase the player only end up in the same place when the
+    # replay hunts too
+    game_state = GameState(seed=3)
+    game_state.hunting_monsters = True
+    recorder = Recorder(game_state)
+    recorder.command('start')
+    game_state.game_started = True
+    for action in [None] * 120 + ['right', 'down'] * 20:
+        recorder.tick(action)
+        step(game_state, action)
+    path = tmp_path / 'session.rec'
+    recorder.save(path, game_state)
+
+    replayed = replay(Recording.load(path))
+    assert replayed.hunting_monsters
+    assert get_state_digest(replayed) == get_state_digest(game_state)
@@ -0,0 +1,77 @@
+import asyncio
+from src.levels import ELEMENTS
+from src.server import (GameServer, GameClient, WAIT, LEVEL, PLAYER, KEY_TAKEN, CHEST_OPENED, SWORD,
+                        MONSTER_DEFEATED)
+from src.replay import START, RESET
+from src.simulation import ACTIONS
+from .helpers import make_pack, make_source
+
+RIGHT = ACTIONS.index('right')
+
+def corridor_pack():
+    # Key, chest, monster and door in a row; the door leads to a small level 2
+    return make_pack(make_source(1, ['......'], [0, 0], keys=[[1, 0]], chests=[[2, 0]],
+                                 monsters=[[3, 0]], doors=[[5, 0]]),
+                     make_source(2, ['..'], [1, 0]))
+
+def run_session(check, **options):
+    # A server on a free port and one client connected to it, for check(client)
+    async def session():
+        server = GameServer(seed=0, **options)
+        host, port = await server.start(port=0)
+        client = await GameClient.connect(host, port)
+        try:
+            await check(client)
+        finally:
+            client.close()
+            server.close()
+    asyncio.run(session())
+
+async def receive(client):
+    return await asyncio.wait_for(client.frames.get(), 5)
+
+def test_opening_frame_and_moves():
+    level_pack = corridor_pack()
+
+    async def check(client):
+        assert await receive(client) == [(LEVEL, 1, 0, 0), (PLAYER, 0, 0, 0)]
+        client.send(START, RIGHT)
+        assert await receive(client) == []  # START changes nothing the client sees
+        assert await receive(client) == [(PLAYER, 1, 0, 0), (KEY_TAKEN, 1, 0, 0)]
+        client.send(ACTIONS.index('up'))
+        assert await receive(client) == []  # Off the grid: blocked, and not sent
+    run_session(check, level_pack=level_pack)
+
+def test_scripted_route_through_the_level():
+    level_pack = corridor_pack()
+    sword = ELEMENTS.index(level_pack.get_level(1).chests[0][2])
+
+    async def check(client):
+        await receive(client)
+        client.send(START, *[RIGHT] * 5)
+        frames = [await receive(client) for _ in range(6)]
+        assert frames[1] == [(PLAYER, 1, 0, 0), (KEY_TAKEN, 1, 0, 0)]
+        assert frames[2] == [(PLAYER, 2, 0, 0), (CHEST_OPENED, 2, 0, 0), (SWORD, 0, 0, sword)]
+        assert frames[3] == [(PLAYER, 3, 0, 0), (MONSTER_DEFEATED, 3, 0, 0)]
+        assert frames[4] == [(PLAYER, 4, 0, 0)]
+        # The door loads level 2, sent as its snapshot
+        assert frames[5][-2:] == [(LEVEL, 2, 0, 0), (PLAYER, 1, 0, 0)]
+    run_session(check, level_pack=level_pack)
+
+def test_reset_sends_the_level_again():
+    async def check(client):
+        opening = await receive(client)
+        client.send(START, RIGHT, RIGHT, RESET)
+        frames = [await receive(client) for _ in range(4)]
+        assert frames[1][0] == (PLAYER, 1, 0, 0)
+        assert frames[3] == opening
+    run_session(check, level_pack=corridor_pack())
+
+def test_invalid_input_closes_the_connection():
+    async def check(client):
+        await receive(client)
+        client.send(WAIT, 200, WAIT)
+        assert await receive(client) == []  # Inputs before the invalid one are answered
+        await asyncio.wait_for(client.closed, 5)
+        assert client.frames.empty()
+    run_session(check)
@@ -0,0 +1,37 @@
+from src.game_state import GameState
+from src.simulation import step
+from .helpers import make_pack, make_source
+
+def start_game(level_pack):
+    game_state = GameState(level_pack=level_pack, seed=0)
+    game_state.game_started = True
+    return game_state
+
+def test_door_on_final_level_wins():
+    game_state = start_game(make_pack(make_source(1, ['...'], [0, 0], doors=[[2, 0]])))
+    step(game_state, 'right')
+    _, events = step(game_state, 'right')
+    assert game_state.game_over and game_state.victory
+    assert ('victory', None) in events
+
+def test_door_on_final_level_stays_locked_while_a_monster_lives():
+    game_state = start_game(make_pack(make_source(1, ['....'], [0, 0], doors=[[1, 0]], monsters=[[3, 0]])))
+    _, events = step(game_state, 'right')
+    assert ('door_locked', (1, 0)) in events
+    assert not game_state.game_over
+
+def test_door_leads_to_the_next_level():
+    game_state = start_game(make_pack(make_source(1, ['..'], [0, 0], doors=[[1, 0]]),
+                                      make_source(2, ['..'], [1, 0], monsters=[[0, 0]])))
+    _, events = step(game_state, 'right')
+    assert ('level_changed', 2) in events
+    assert game_state.current_level == 2 and not game_state.game_over
+
+def test_wall_hint_comes_from_the_level():
+    for wall_hint in (False, True):
+        source = make_source(1, ['.#'], [0, 0])
+        source['wall_hint'] = wall_hint
+        game_state = start_game(make_pack(source, make_source(2, ['.'], [0, 0])))
+        _, events = step(game_state, 'right')
+        assert ('blocked', (1, 0)) in events
+        assert (game_state.message == "You can't walk through walls!") == wall_hint
@@ -0,0 +1,175 @@
+import random
+import struct
+import pytest
+from src.game_state import GameState
+from src.grid_index import WALL, BUTTON
+from src.levels import LevelPack, PACK_HEADER, PACK_VERSION, get_default_pack
+from src.simulation import ACTIONS, step
+from src.solver import LevelSolver, DEAD, FINISHED, check_moves, solve_level, validate_pack
+from .helpers import make_pack, make_source, random_source
+
+def play(level_pack, level, moves):
+    # A fresh game on the level with moves played; the first tick re-checks the start cell
+    game_state = GameState(level_pack=level_pack, seed=0)
+    game_state.hunting_monsters = False
+    game_state.load_level(level.number, level.variant)
+    game_state.game_started = True
+    layout_id = game_state.layout_id
+    for action in [None] + moves:
+        step(game_state, action)
+        if game_state.game_over or game_state.layout_id != layout_id:
+            break
+    finished = game_state.victory or game_state.layout_id != layout_id and not game_state.game_over
+    return game_state, finished
+
+def get_state_key(game_state):
+    return (game_state.player_x, game_state.player_y, game_state.has_key, frozenset(game_state.swords),
+            bytes(game_state.entities.alive), game_state.wall_active)
+
+def brute_force(level_pack, level):
+    """Shortest solution length and the number of reached states the level can
+    not be finished from, by breadth first search over the game's own state
+    (every path is played from the start through simulation.step())"""
+    start, finished = play(level_pack, level, [])
+    if finished:
+        return 0, 0
+    if start.game_over:
+        return None, 0
+    paths = {get_state_key(start): []}
+    edges = {}  # State -> states one move away
+    finishing = set()  # States with a move that finishes the level
+    shortest = None
+    frontier = [get_state_key(start)]
+    while frontier:
+        next_frontier = []
+        for key in frontier:
+            edges[key] = set()
+            for action in ACTIONS:
+                moves = paths[key] + [action]
+                game_state, finished = play(level_pack, level, moves)
+                if finished:
+                    finishing.add(key)
+                    if shortest is None:
+                        shortest = len(moves)
+                    continue
+                if game_state.game_over:
+                    continue
+                reached = get_state_key(game_state)
+                edges[key].add(reached)
+                if reached not in paths:
+                    paths[reached] = moves
+                    next_frontier.append(reached)
+        frontier = next_frontier
+    if shortest is None:
+        return None, 0
+
+    # States that can reach a finishing move, searched backwards
+    sources = {key: set() for key in edges}
+    for key, reached in edges.items():
+        for other in reached:
+            sources[other].add(key)
+    can_finish = set(finishing)
+    queue = list(finishing)
+    for key in queue:
+        for previous in sources[key]:
+            if previous not in can_finish:
+                can_finish.add(previous)
+                queue.append(previous)
+    return shortest, len(edges) - len(can_finish)
+
+def test_shortest_solution_of_a_corridor():
+    # Key, chest, monster and door in a row: every cell has to be walked
+    level_pack = make_pack(make_source(1, ['......'], [0, 0], keys=[[1, 0]], chests=[[2, 0]],
+                                       monsters=[[3, 0]], doors=[[5, 0]]),
+                           make_source(2, ['..'], [0, 0]))
+    result = solve_level(level_pack.get_level(1))
+    assert result.moves == ['right'] * 5
+    assert result.softlocked == 0 and result.unreachable == []
+    assert check_moves(level_pack, level_pack.get_level(1), result.moves)
+
+def test_monster_without_its_sword_is_dead():
+    level_pack = make_pack(make_source(1, ['...'], [0, 0], monsters=[[1, 0]], doors=[[2, 0]]))
+    solver = LevelSolver(level_pack.get_level(1), final=True)
+    assert solver.enter(solver.get_index(1, 0), 0) == DEAD
+    result = solver.solve()
+    assert not result.solvable
+    assert result.unreachable == [('door', 2, 0)]  # The monster was met, the door never
+
+def test_last_monster_of_the_final_level_finishes_it():
+    level_pack = make_pack(make_source(1, ['....'], [0, 0], keys=[[1, 0]], chests=[[2, 0]], monsters=[[3, 0]]))
+    solver = LevelSolver(level_pack.get_level(1), final=True)
+    flags = solver.enter(solver.get_index(1, 0), 0)  # The key
+    flags = solver.enter(solver.get_index(2, 0), flags)  # The chest, with the monster's sword
+    assert solver.enter(solver.get_index(3, 0), flags) == FINISHED
+    assert solver.solve().moves == ['right'] * 3
+
+def test_door_on_final_level_finishes_it():
+    # The game wins through such a door as well (it used to crash on the missing next level)
+    level_pack = make_pack(make_source(1, ['...'], [0, 0], doors=[[2, 0]]))
+    level = level_pack.get_level(1)
+    result = solve_level(level, final=True)
+    assert result.moves == ['right', 'right']
+    assert check_moves(level_pack, level, result.moves)
+    results, problems = validate_pack(level_pack)
+    assert problems == []
+
+def test_matches_brute_force_on_random_levels():
+    rng = random.Random(0)
+    checked = solvable = 0
+    while checked < 150:
+        final = rng.random() < 0.5
+        sources = [random_source(rng, 1, max_size=4)]
+        if not final:
+            sources.append(make_source(2, ['.'], [0, 0]))
+        level_pack = make_pack(*sources, allow_problems=True)
+        level = level_pack.get_level(1)
+        try:
+            result = solve_level(level, final)
+        except ValueError:
+            continue  # More entities on one cell than the solver takes
+        shortest, softlocked = brute_force(level_pack, level)
+        assert (len(result.moves) if result.solvable else None) == shortest
+        if result.solvable:
+            assert result.softlocked == softlocked
+            assert play(level_pack, level, result.moves)[1]
+            solvable += 1
+        checked += 1
+    assert solvable > 20
+
+def test_validate_pack_reports_levels_that_can_not_be_finished():
+    # The door needs the monster defeated, and there is no sword for it
+    level_pack = make_pack(make_source(1, ['...'], [0, 0], monsters=[[2, 0]], doors=[[1, 0]]),
+                           make_source(2, ['..'], [0, 0], doors=[[1, 0]]))
+    results, problems = validate_pack(level_pack)
+    assert problems == ["Level 1 (default) can not be finished"]
+
+def test_shipped_levels_validate():
+    results, problems = validate_pack(get_default_pack())
+    assert problems == []
+    assert [len(result.moves) for result in results] == [19, 21, 21, 30]
+
+def test_pack_round_trip():
+    level_pack = make_pack(make_source(1, ['.#G', '...'], [0, 1], 'fire', keys=[[2, 1]],
+                                       chests=[[1, 1, 'water']], monsters=[[0, 0], [0, 0, 'grass']],
+                                       buttons=[[1, 1]]),
+                           make_source(2, ['.'], [0, 0], variant='left'),
+                           make_source(2, ['.'], [0, 0], variant='right'))
+    assert level_pack.get_variants(2) == ['left', 'right']
+    assert not level_pack.has_level(3)
+    level = level_pack.get_level(1)
+    assert (level.width, level.height, level.element, level.player) == (3, 2, 'fire', (0, 1))
+    assert level.keys == [(2, 1, 'fire')]
+    assert level.chests == [(1, 1, 'water')]
+    assert level.monsters == [(0, 0, 'fire'), (0, 0, 'grass')]
+    assert level.doors == []
+    assert level.gate_cells == (2,)
+    assert bytes(level.cells) == bytes([0, WALL, 0, 0, BUTTON, 0])
+    assert level.is_reachable(0, 0) and not level.is_reachable(2, 0)
+    assert level.is_reachable(2, 0, gate_open=True)
+
+def test_pack_of_another_version_is_refused():
+    pack = bytearray(make_pack(make_source(1, ['.'], [0, 0])).buffer)
+    struct.pack_into('<H', pack, 4, PACK_VERSION - 1)
+    with pytest.raises(ValueError):
+        LevelPack(bytes(pack))
+    assert PACK_HEADER.size == 8